@@ -1,134 +1,418 @@
 # import config.settings
-import time 
+import time
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 import ssl
-import json
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from backend.codecs import CodecRegistry
 # HiveMQ Cloud credentials
 BROKER_URL = "broker_url"
 BROKER_PORT = 8883
 USERNAME = "username"
 PASSWORD = "password"
 
-def start_listening(device_id):
-    topic = f"devices/{device_id}/control"
-    
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
-            print("✅ Connected to broker!")
-            client.subscribe(topic)
-            print(f"📡 Subscribed to topic: {topic}")
-        else:
-            print(f"❌ Connection failed with code {rc}")
+DEVICE_ID = "4"
+MQTT_PROTOCOL = mqtt.MQTTv5  # HiveMQ Cloud speaks v5; needed for correlation data
 
-    def on_message(client, userdata, msg):
-        print(f"📨 Message from {msg.topic}: {msg.payload.decode()}")
-        try:
-            payload = json.loads(msg.payload.decode())
-            action = payload.get("action")
-            if action:
-                userdata.put(action)  # Pass action to queue
-        except Exception as e:
-            print("❌ Failed to parse payload:", e)
+# Optional batching: the journal flusher (backend/database.py) coalesces
+# requests for BATCH_WINDOW seconds or until BATCH_MAX_EVENTS are queued,
+# then publishes them as one batch message. Needs a backend that consumes
+# attendance/{method}/request/batch and answers {"responses": [...]}.
+BATCH_MODE = False
+BATCH_WINDOW = 0.25
+BATCH_MAX_EVENTS = 50
 
-    import queue
-    action_queue = queue.Queue()
+# Payload codec per topic filter, e.g. {"attendance/+/request/#": "msgpack"}.
+# Unlisted topics use JSON; see backend/codecs.py. Switch a topic only if
+# benchmarks/bench_codecs.py shows the codec beating JSON on its messages.
+TOPIC_CODECS = {}
 
-    client = mqtt.Client(userdata=action_queue)
-    client.tls_set(tls_version=ssl.PROTOCOL_TLS)
-    client.username_pw_set(USERNAME, PASSWORD)
-    client.on_connect = on_connect
-    client.on_message = on_message
-    client.connect(BROKER_URL, BROKER_PORT)
 
-    client.loop_start()  # Use loop_start instead of blocking loop_forever
+def request_topic(method):
+    return f"attendance/{method}/request"
 
-    # Generator loop
-    while True:
-        action = action_queue.get()
-        yield action
 
+def response_topic(method, device_id=DEVICE_ID):
+    return f"attendance/{method}/response/${device_id}"
 
 
-def send_student_data(method, id):
-    topic = f"attendance/{method}/request"
+def batch_request_topic(method):
+    return f"attendance/{method}/request/batch"
+
+
+def build_batch(payloads, device_id=DEVICE_ID):
+    """Wrap request payloads (each with its correlation_id) in one batch message"""
+    return {"device_id": device_id, "batch_id": uuid.uuid4().hex, "events": list(payloads)}
+
+
+def split_batch_response(body):
+    """Per-event replies of a decoded batch response, or None for a single reply"""
+    if isinstance(body, dict) and isinstance(body.get("responses"), list):
+        return body["responses"]
+    return None
+
+
+def build_payload(method, id, device_id=DEVICE_ID):
+    """Build the attendance request payload for a check-in/check-out"""
     if (method=="check-in"):
-        payload = {
+        return {
             "rfid_tag": id,
-            "device_id" : "4",
+            "device_id" : device_id,
             "marked_by" : "rfid"
         }
     elif(method=="check-out"):
-        payload = {
-
+        return {
             "student_id": id,
-            "device_id" : "4",
-            "marked_by" : "face_recognition"     
+            "device_id" : device_id,
+            "marked_by" : "face_recognition"
         }
+    raise ValueError(f"Unknown attendance method: {method}")
+
 
-    def on_connect(client, userdata, flags, rc):
+def request_properties(method, correlation_id, device_id=DEVICE_ID):
+    """MQTT v5 ResponseTopic/CorrelationData properties for a request"""
+    properties = Properties(PacketTypes.PUBLISH)
+    properties.ResponseTopic = response_topic(method, device_id)
+    properties.CorrelationData = correlation_id.encode()
+    return properties
+
+
+def create_mqtt_client(client_id="", userdata=None, protocol=mqtt.MQTTv311):
+    """Create a paho client using the classic (v1) callback signatures"""
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        return mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id,
+                           userdata=userdata, protocol=protocol)
+    return mqtt.Client(client_id=client_id, userdata=userdata, protocol=protocol)
+
+
+class MQTTClientManager:
+    """
+    Owns one long-lived MQTT connection shared by the GUI, the RFID
+    path and FaceRecognizer.
+
+    The connection is opened once (TLS handshake included) and paho's
+    network thread reconnects automatically. Subscriptions are kept in a
+    registry and re-applied on every (re)connect, so response topics stay
+    subscribed for the lifetime of the process. All public methods are
+    thread-safe and never block on the network.
+    """
+    def __init__(self, broker_url=BROKER_URL, broker_port=BROKER_PORT,
+                 username=USERNAME, password=PASSWORD, use_tls=True,
+                 ca_certs=None, client_id="", keepalive=60, protocol=mqtt.MQTTv311,
+                 topic_codecs=None):
+        self.broker_url = broker_url
+        self.broker_port = broker_port
+        self.keepalive = keepalive
+        self.protocol = protocol
+        self.codecs = CodecRegistry(topic_codecs)
+        self.lock = threading.RLock()
+        self.connected = threading.Event()
+        self.subscriptions = {}  # topic filter -> list of handlers
+        self.pending = {}  # response topic -> deque of waiting futures
+        self.unclaimed = {}  # response topic -> replies nobody waited for
+        self.reply_hooks = []  # callables offered each reply before the FIFO waiters
+        self.subacked = {}  # topic filter -> Event set once the broker confirmed it
+        self.after_suback = {}  # topic filter -> callbacks waiting for that SUBACK
+        self.suback_mids = {}  # SUBSCRIBE message id -> topic filter
+        self.early_subacks = set()  # SUBACKs that beat suback_mids bookkeeping
+        self.started = False
+
+        self.client = create_mqtt_client(client_id=client_id, protocol=protocol)
+        if use_tls:
+            self.client.tls_set(ca_certs=ca_certs, tls_version=ssl.PROTOCOL_TLS)
+        if username:
+            self.client.username_pw_set(username, password)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client.max_inflight_messages_set(100)  # lets a journal backlog drain quickly
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.on_subscribe = self._on_subscribe
+
+    def start(self):
+        """Connect in the background and start the network loop"""
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        self.client.connect_async(self.broker_url, self.broker_port, keepalive=self.keepalive)
+        self.client.loop_start()
+
+    def stop(self):
+        """Disconnect and stop the network loop"""
+        with self.lock:
+            if not self.started:
+                return
+            self.started = False
+        self.client.disconnect()
+        self.client.loop_stop()
+        self.connected.clear()
+
+    def wait_connected(self, timeout=None):
+        """Block until the broker connection is up"""
+        return self.connected.wait(timeout)
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
-            print("Connected to broker (publisher)")
-            client.publish(topic, json.dumps(payload))
-            print(f"Sent to {topic}: {payload}")
-            client.disconnect()
+            print("✅ Connected to broker!")
+            self.connected.set()
+            with self.lock:
+                topics = list(self.subscriptions)
+            for topic in topics:
+                self._send_subscribe(topic)
         else:
-            print("Failed to connect, return code:", rc)
+            print(f"❌ Connection failed with code {rc}")
 
-    client = mqtt.Client()
-    client.tls_set(tls_version=ssl.PROTOCOL_TLS)
-    client.username_pw_set(USERNAME, PASSWORD)
-    client.on_connect = on_connect
+    def _on_disconnect(self, client, userdata, rc, properties=None):
+        self.connected.clear()
+        with self.lock:
+            for event in self.subacked.values():
+                event.clear()  # re-confirmed after the reconnect
+        if rc != 0:
+            print(f"⚠️ Disconnected from broker (code {rc}), reconnecting...")
 
-    import json
-    print("Publishing action...")
-    client.connect(BROKER_URL, BROKER_PORT)
-    client.loop_forever()
+    def _on_message(self, client, userdata, msg):
+        with self.lock:
+            handlers = [
+                handler
+                for topic, topic_handlers in self.subscriptions.items()
+                if mqtt.topic_matches_sub(topic, msg.topic)
+                for handler in topic_handlers
+            ]
+        for handler in handlers:
+            try:
+                handler(msg)
+            except Exception as e:
+                print(f"❌ Handler error on {msg.topic}: {e}")
 
+    def _send_subscribe(self, topic):
+        with self.lock:
+            self.subacked.setdefault(topic, threading.Event()).clear()
+        rc, mid = self.client.subscribe(topic, qos=1)
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            return  # not connected; _on_connect subscribes again
+        with self.lock:
+            if mid in self.early_subacks:
+                self.early_subacks.discard(mid)
+            else:
+                self.suback_mids[mid] = topic
+                return
+        self._confirm_subscription(topic)
 
+    def _on_subscribe(self, client, userdata, mid, granted_qos, properties=None):
+        with self.lock:
+            topic = self.suback_mids.pop(mid, None)
+            if topic is None:
+                self.early_subacks.add(mid)
+                return
+        self._confirm_subscription(topic)
 
+    def _confirm_subscription(self, topic):
+        print(f"📡 Subscribed to topic: {topic}")
+        with self.lock:
+            self.subacked.setdefault(topic, threading.Event()).set()
+            callbacks = self.after_suback.pop(topic, [])
+        for callback in callbacks:
+            callback()
 
-def get_attendance_response(method,device_id, timeout=10):
-    response = None
-    topic = f"attendance/{method}/response/${device_id}"
-    done = False  # A flag to break immediately when response comes
+    def subscribe(self, topic, handler):
+        """Register handler for topic; the subscription survives reconnects"""
+        with self.lock:
+            handlers = self.subscriptions.setdefault(topic, [])
+            new_topic = not handlers
+            handlers.append(handler)
+            self.subacked.setdefault(topic, threading.Event())
+        if new_topic and self.connected.is_set():
+            self._send_subscribe(topic)
+
+    def when_subscribed(self, topic, callback):
+        """Run callback once the broker has acknowledged topic (now, if it has)"""
+        with self.lock:
+            event = self.subacked.get(topic)
+            if event is None or not event.is_set():
+                self.after_suback.setdefault(topic, []).append(callback)
+                return
+        callback()
 
-    def on_message(client, userdata, msg):
-        nonlocal response, done
-        response = msg.payload.decode()
+    def wait_subscribed(self, topic, timeout=None):
+        """Block until the broker has acknowledged topic"""
+        with self.lock:
+            event = self.subacked.setdefault(topic, threading.Event())
+        return event.wait(timeout)
+
+    def unsubscribe(self, topic, handler):
+        with self.lock:
+            handlers = self.subscriptions.get(topic, [])
+            if handler in handlers:
+                handlers.remove(handler)
+            empty = not handlers
+            if empty:
+                self.subscriptions.pop(topic, None)
+                self.subacked.pop(topic, None)
+                self.after_suback.pop(topic, None)
+        if empty and self.connected.is_set():
+            self.client.unsubscribe(topic)
+
+    def publish(self, topic, payload, qos=1, properties=None):
+        """Queue a message for publishing and return immediately"""
+        if not isinstance(payload, (bytes, bytearray)):
+            payload, codec = self.codecs.encode(topic, payload)
+            if self.supports_properties and codec is not self.codecs.json:
+                if properties is None:
+                    properties = Properties(PacketTypes.PUBLISH)
+                properties.ContentType = codec.content_type
+        return self.client.publish(topic, payload, qos=qos, properties=properties)
+
+    @staticmethod
+    def _content_type(msg):
+        properties = getattr(msg, "properties", None)
+        return getattr(properties, "ContentType", None) if properties else None
+
+    def decode(self, msg):
+        """Decoded message body using the topic's codec (None if undecodable)"""
+        try:
+            return self.codecs.decode(msg.topic, msg.payload, self._content_type(msg))
+        except Exception:
+            return None
+
+    def text(self, msg):
+        """Message body as display text"""
+        return self.codecs.text(msg.topic, msg.payload, self._content_type(msg))
+
+    @property
+    def supports_properties(self):
+        """True when the connection is MQTT v5 (response topic, correlation data)"""
+        return self.protocol == mqtt.MQTTv5
+
+    def add_reply_hook(self, hook):
+        """Offer every reply to hook(msg) first; a truthy return claims it"""
+        with self.lock:
+            self.reply_hooks.append(hook)
+
+    def watch_responses(self, method, device_id=DEVICE_ID):
+        """Keep the response topic for method subscribed"""
+        self._ensure_response_topic(response_topic(method, device_id))
+
+    def publish_request(self, method, payload, device_id=DEVICE_ID, properties=None):
+        """
+        Publish an attendance request once its response topic is confirmed
+        by SUBACK, so a fast reply can never arrive before we listen for it.
+        """
+        self.watch_responses(method, device_id)
+        self.when_subscribed(
+            response_topic(method, device_id),
+            lambda: self.publish(request_topic(method), payload, properties=properties),
+        )
+
+    def _ensure_response_topic(self, topic):
+        with self.lock:
+            if topic in self.pending:
+                return
+            self.pending[topic] = deque()
+            self.unclaimed[topic] = deque(maxlen=16)
+        self.subscribe(topic, self._on_response)
+
+    def _on_response(self, msg):
+        with self.lock:
+            hooks = list(self.reply_hooks)
+        for hook in hooks:
+            if hook(msg):
+                return
+        response = self.text(msg)
         print(f"✅ Received message on topic {msg.topic}: {response}")
-        done = True  # Set the flag to True to break the waiting loop
-        client.disconnect()  # Disconnect immediately
+        with self.lock:
+            waiters = self.pending.get(msg.topic)
+            future = None
+            while waiters:
+                future = waiters.popleft()
+                if future.set_running_or_notify_cancel():
+                    break  # claimed; cancel() can no longer race us
+                future = None
+            if future is None:
+                self.unclaimed.setdefault(msg.topic, deque(maxlen=16)).append(response)
+                return
+        future.set_result(response)
 
-    client = mqtt.Client()
+    def expect_response(self, method, device_id=DEVICE_ID):
+        """Return a future resolved by the next reply on the response topic"""
+        topic = response_topic(method, device_id)
+        self._ensure_response_topic(topic)
+        future = Future()
+        with self.lock:
+            unclaimed = self.unclaimed[topic]
+            if unclaimed:
+                future.set_result(unclaimed.popleft())
+            else:
+                self.pending[topic].append(future)
+        return future
 
-    # Authentication
-    client.username_pw_set(USERNAME, PASSWORD)
-    
-    # Enable TLS encryption
-    client.tls_set(tls_version=ssl.PROTOCOL_TLS)
-    
-    client.on_message = on_message
+    def discard_stale_responses(self, method, device_id=DEVICE_ID):
+        """Subscribe to the response topic and drop replies nobody claimed"""
+        topic = response_topic(method, device_id)
+        self._ensure_response_topic(topic)
+        with self.lock:
+            self.unclaimed[topic].clear()
 
-    try:
-        client.connect(BROKER_URL, BROKER_PORT, keepalive=60)
-    except Exception as e:
-        print("❌ Error connecting to the broker:", e)
-        return None
+    def request(self, method, id, device_id=DEVICE_ID):
+        """Publish an attendance request and return a future for its reply"""
+        self.discard_stale_responses(method, device_id)
+        future = self.expect_response(method, device_id)
+        self.publish_request(method, build_payload(method, id, device_id), device_id)
+        return future
 
-    client.subscribe(topic)
-    print(f"📡 Subscribed to {topic}. Waiting for response...")
 
-    client.loop_start()
+_client_manager = None
+_client_manager_lock = threading.Lock()
 
-    elapsed = 0
-    interval = 0.1  # Shorter interval = faster reaction
 
-    while not done and elapsed < timeout:
-        time.sleep(interval)
-        elapsed += interval
+def get_client():
+    """Return the shared, already started MQTTClientManager"""
+    global _client_manager
+    with _client_manager_lock:
+        if _client_manager is None:
+            _client_manager = MQTTClientManager(protocol=MQTT_PROTOCOL, topic_codecs=TOPIC_CODECS)
+            _client_manager.start()
+        return _client_manager
 
-    client.loop_stop()
 
-    if not done:
+def start_listening(device_id):
+    """Yield control actions for device_id ("+" for all) from the shared control plane"""
+    from backend.control import get_control_plane
+
+    yield from get_control_plane().listen(device_id)
+
+
+
+def send_student_data(method, id):
+    """Journal an attendance request; the journal flusher publishes it (non-blocking)"""
+    from backend.database import get_journal
+
+    client = get_client()
+    client.discard_stale_responses(method)
+    event_id = get_journal().record(method, id)
+    print(f"Queued {method} for {id} (event {event_id[:8]})")
+
+
+
+
+def get_attendance_response(method,device_id, timeout=10):
+    """Wait for the next reply; woken directly by on_message, no polling"""
+    deadline = time.monotonic() + timeout
+    topic = response_topic(method, device_id)
+    client = get_client()
+    future = client.expect_response(method, device_id)
+    if not client.wait_subscribed(topic, timeout):
+        print(f"❌ Subscription to {topic} was not confirmed")
+    else:
+        print(f"📡 Subscribed to {topic}. Waiting for response...")
+
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        future.cancel()
         print("⌛ No response received within timeout period.")
-    return response
+        return None
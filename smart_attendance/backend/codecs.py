@@ -0,0 +1,162 @@
+"""
+Payload codecs for attendance messages.
+
+JSON stays the default. The "msgpack" codec is a compact binary format:
+MessagePack with the message's top-level attendance keys (device_id,
+marked_by, ...) and marked_by values interned as small integers, and its
+correlation or batch ID packed as 16 raw bytes. Nested values (a batch's
+events, a batch reply's responses) are plain MessagePack. Codecs are chosen per topic filter; on MQTT v5 the
+codec's content type travels with each message, and a JSON body is
+always recognised on decode, so a backend that has not switched yet
+keeps working.
+"""
+
+import json
+
+try:
+    import msgpack
+except ImportError:  # optional; only needed when a topic is set to "msgpack"
+    msgpack = None
+
+import paho.mqtt.client as mqtt
+
+# Wire ids for keys that repeat in every message. Append only: the backend
+# decoder uses the same table.
+KEY_IDS = {
+    "rfid_tag": 1, "student_id": 2, "device_id": 3, "marked_by": 4,
+    "correlation_id": 5, "scanned_at": 6, "status": 7, "id": 8, "message": 9,
+    "events": 10, "responses": 11, "batch_id": 12, "action": 13,
+}
+KEY_NAMES = {v: k for k, v in KEY_IDS.items()}
+MARKED_BY_IDS = {"rfid": 1, "face_recognition": 2}
+MARKED_BY_NAMES = {v: k for k, v in MARKED_BY_IDS.items()}
+HEX_KEYS = ("correlation_id", "batch_id")
+HEX_KEY_IDS = tuple(KEY_IDS[name] for name in HEX_KEYS)
+MARKED_BY_KEY = KEY_IDS["marked_by"]
+
+
+class JSONCodec:
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, obj):
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    def decode(self, payload):
+        return json.loads(payload)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    content_type = "application/vnd.attendance+msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("the msgpack codec needs the 'msgpack' package")
+        self.packer = msgpack.Packer(use_bin_type=True)
+
+    def encode(self, obj):
+        return self.packer.pack(self._pack(obj) if isinstance(obj, dict) else obj)
+
+    def decode(self, payload):
+        obj = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return self._unpack(obj) if isinstance(obj, dict) else obj
+
+    # Only the message's own fields are rewritten. Nested values, such as
+    # the events of a batch, are packed as plain MessagePack: rewriting each
+    # of them in Python cost more time than MessagePack saves over JSON.
+
+    @staticmethod
+    def _pack(fields):
+        packed = {KEY_IDS.get(k, k): v for k, v in fields.items()}
+        marked_by = packed.get(MARKED_BY_KEY)
+        if marked_by in MARKED_BY_IDS:
+            packed[MARKED_BY_KEY] = MARKED_BY_IDS[marked_by]
+        for key in HEX_KEY_IDS:
+            value = packed.get(key)
+            if type(value) is str and len(value) == 32:
+                try:
+                    packed[key] = bytes.fromhex(value)
+                except ValueError:
+                    pass
+        return packed
+
+    @staticmethod
+    def _unpack(fields):
+        unpacked = {KEY_NAMES.get(k, k): v for k, v in fields.items()}
+        marked_by = unpacked.get("marked_by")
+        if type(marked_by) is int:
+            unpacked["marked_by"] = MARKED_BY_NAMES.get(marked_by, marked_by)
+        for name in HEX_KEYS:
+            value = unpacked.get(name)
+            if type(value) is bytes:
+                unpacked[name] = value.hex()
+        return unpacked
+
+
+CODECS = {"json": JSONCodec}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec
+
+
+def looks_like_json(payload):
+    return payload[:1] in (b"{", b"[", b'"')
+
+
+class CodecRegistry:
+    """
+    Maps topic filters to codecs. topic_codecs is {topic filter: codec name};
+    topics that match no filter use JSON.
+    """
+    def __init__(self, topic_codecs=None):
+        self.json = JSONCodec()
+        self.by_name = {"json": self.json}
+        self.by_content_type = {self.json.content_type: self.json}
+        self.topic_codecs = []
+        for topic_filter, name in (topic_codecs or {}).items():
+            self.set_codec(topic_filter, name)
+
+    def set_codec(self, topic_filter, name):
+        """Use codec `name` for topics matching topic_filter"""
+        if name not in self.by_name:
+            if name not in CODECS:
+                raise ValueError(f"Unknown or unavailable codec: {name}")
+            codec = CODECS[name]()
+            self.by_name[name] = codec
+            self.by_content_type[codec.content_type] = codec
+        self.topic_codecs = [(f, n) for f, n in self.topic_codecs if f != topic_filter]
+        self.topic_codecs.append((topic_filter, name))
+
+    def codec_for(self, topic):
+        for topic_filter, name in self.topic_codecs:
+            if mqtt.topic_matches_sub(topic_filter, topic):
+                return self.by_name[name]
+        return self.json
+
+    def encode(self, topic, obj):
+        """Encode obj for topic; returns (payload bytes, codec)"""
+        codec = self.codec_for(topic)
+        if isinstance(obj, str):
+            if codec is self.json:
+                return obj.encode(), codec
+            obj = json.loads(obj)  # already-serialised JSON (e.g. from the journal)
+        return codec.encode(obj), codec
+
+    def decode(self, topic, payload, content_type=None):
+        """Decode a message body; JSON bodies are accepted on any topic"""
+        codec = self.by_content_type.get(content_type) if content_type else None
+        if codec is None:
+            codec = self.json if looks_like_json(payload) else self.codec_for(topic)
+        return codec.decode(payload)
+
+    def text(self, topic, payload, content_type=None):
+        """Reply as display text: JSON/plain bodies verbatim, binary ones as JSON"""
+        codec = self.by_content_type.get(content_type) if content_type else None
+        if codec is None:
+            codec = self.json if looks_like_json(payload) else self.codec_for(topic)
+        if codec is self.json:
+            return payload.decode()
+        try:
+            return json.dumps(codec.decode(payload))
+        except Exception:
+            return payload.decode(errors="replace")
@@ -0,0 +1,159 @@
+"""
+Control-plane multiplexer for devices/{device_id}/control.
+
+One subscription on the shared connection serves every device ID this Pi
+handles (a gateway can run several rooms). Messages are routed to the
+handlers registered for their device ID, plus any registered for "+"
+(all devices). Consumers can register callbacks, iterate actions with
+`async for`, or use the blocking listen() generator.
+"""
+
+import asyncio
+import queue
+import threading
+
+from backend.api_client import get_client
+
+ALL_DEVICES = "+"
+_CLOSED = object()
+
+
+def control_topic(device_id=ALL_DEVICES):
+    return f"devices/{device_id}/control"
+
+
+class ActionStream:
+    """Async iterator over actions for one device ID (or "+")"""
+    def __init__(self, plane, device_id, loop):
+        self.plane = plane
+        self.device_id = device_id
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        plane.register(device_id, self._push)
+
+    def _push(self, device_id, action, payload):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, action)
+
+    def close(self):
+        """Stop the stream; a pending __anext__ ends the iteration"""
+        self.plane.unregister(self.device_id, self._push)
+        with self.plane.lock:
+            self.plane.streams.discard(self)
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, _CLOSED)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        action = await self.queue.get()
+        if action is _CLOSED:
+            raise StopAsyncIteration
+        return action
+
+    async def aclose(self):
+        self.close()
+
+
+class ControlPlane:
+    """
+    Routes control messages to registered handlers.
+
+    Handlers are called as handler(device_id, action, payload) on the MQTT
+    network thread, so they should hand work off (e.g. to a queue) rather
+    than touch Tk widgets directly.
+    """
+    def __init__(self, manager=None):
+        self.manager = manager or get_client()
+        self.lock = threading.Lock()
+        self.handlers = {}  # device id or "+" -> list of handlers
+        self.streams = set()
+        self.running = False
+
+    def start(self):
+        """Subscribe to the control topic of every device (once)"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        self.manager.subscribe(control_topic(), self._on_message)
+
+    def stop(self):
+        """Unsubscribe and end every open action stream"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            streams = list(self.streams)
+            self.streams.clear()
+        self.manager.unsubscribe(control_topic(), self._on_message)
+        for stream in streams:
+            stream.close()
+
+    def register(self, device_id, handler):
+        """Call handler for actions addressed to device_id ("+" for all)"""
+        with self.lock:
+            self.handlers.setdefault(device_id, []).append(handler)
+        return handler
+
+    def unregister(self, device_id, handler):
+        with self.lock:
+            handlers = self.handlers.get(device_id, [])
+            if handler in handlers:
+                handlers.remove(handler)
+            if not handlers:
+                self.handlers.pop(device_id, None)
+
+    def handler_count(self):
+        with self.lock:
+            return sum(len(handlers) for handlers in self.handlers.values())
+
+    def _on_message(self, msg):
+        device_id = msg.topic.split("/")[1]
+        payload = self.manager.decode(msg)
+        print(f"📨 Message from {msg.topic}: {payload}")
+        action = payload.get("action") if isinstance(payload, dict) else None
+        if not action:
+            print("❌ Control message without an action:", msg.payload[:80])
+            return
+        with self.lock:
+            handlers = self.handlers.get(device_id, []) + self.handlers.get(ALL_DEVICES, [])
+        for handler in handlers:
+            try:
+                handler(device_id, action, payload)
+            except Exception as e:
+                print(f"❌ Control handler error: {e}")
+
+    def stream(self, device_id=ALL_DEVICES):
+        """Async iterator of actions; call from inside the running event loop"""
+        stream = ActionStream(self, device_id, asyncio.get_running_loop())
+        with self.lock:
+            self.streams.add(stream)
+        return stream
+
+    def listen(self, device_id=ALL_DEVICES, stop_event=None, poll=0.5):
+        """Blocking generator of actions; unregisters when closed or stopped"""
+        actions = queue.Queue()
+        handler = self.register(device_id, lambda _device, action, _payload: actions.put(action))
+        try:
+            while stop_event is None or not stop_event.is_set():
+                try:
+                    yield actions.get(timeout=poll)
+                except queue.Empty:
+                    continue
+        finally:
+            self.unregister(device_id, handler)
+
+
+_control_plane = None
+_control_plane_lock = threading.Lock()
+
+
+def get_control_plane():
+    """Return the shared, started ControlPlane"""
+    global _control_plane
+    with _control_plane_lock:
+        if _control_plane is None:
+            _control_plane = ControlPlane()
+            _control_plane.start()
+        return _control_plane
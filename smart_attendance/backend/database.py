@@ -1,2 +1,330 @@
 #  (Optional) Handles local DB storage
+"""
+Offline store-and-forward journal for attendance events.
 
+Every check-in/check-out is written to a local SQLite database (WAL mode)
+with a device-side timestamp before anything touches the network. A
+background JournalFlusher drains pending events to the broker in batches,
+marks them acknowledged once the broker PUBACKs them, and retries the rest
+with exponential backoff. Delivery is at-least-once; each event carries a
+stable "correlation_id" the backend can use to drop duplicates.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from config.settings import journal_path
+from backend.api_client import (
+    BATCH_MAX_EVENTS, BATCH_MODE, BATCH_WINDOW, DEVICE_ID, batch_request_topic, build_batch,
+    build_payload, get_client, request_properties, request_topic, response_topic,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_id TEXT NOT NULL UNIQUE,
+    method TEXT NOT NULL,
+    device_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    acked_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_pending
+    ON attendance_events (next_attempt, id) WHERE acked_at IS NULL;
+"""
+
+
+class AttendanceJournal:
+    """
+    Durable queue of attendance events backed by SQLite.
+
+    WAL mode with synchronous=NORMAL keeps commits off the fsync path
+    (only checkpoints sync), and the bulk paths run one transaction per
+    batch, which is what lets the Pi's SD card take thousands of events
+    per second.
+    """
+    def __init__(self, path=journal_path):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.on_record = None  # called after new events are stored
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    @staticmethod
+    def _event_row(method, id, event_id=None, device_id=DEVICE_ID, scanned_at=None):
+        event_id = event_id or uuid.uuid4().hex
+        scanned_at = scanned_at or time.time()
+        payload = build_payload(method, id, device_id)
+        payload["correlation_id"] = event_id
+        payload["scanned_at"] = datetime.fromtimestamp(scanned_at, timezone.utc).isoformat()
+        return (event_id, method, device_id, json.dumps(payload), scanned_at)
+
+    def record(self, method, id, event_id=None, device_id=DEVICE_ID):
+        """Store one scan and return its event id"""
+        row = self._event_row(method, id, event_id, device_id)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO attendance_events "
+                "(event_id, method, device_id, payload, scanned_at) VALUES (?, ?, ?, ?, ?)",
+                row,
+            )
+        if self.on_record:
+            self.on_record()
+        return row[0]
+
+    def record_many(self, events):
+        """Store (method, id) pairs in a single transaction; returns event ids"""
+        rows = [self._event_row(method, id) for method, id in events]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO attendance_events "
+                "(event_id, method, device_id, payload, scanned_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.execute("COMMIT")
+        if self.on_record:
+            self.on_record()
+        return [row[0] for row in rows]
+
+    def pending(self, limit=200):
+        """Oldest unacknowledged events that are due for (re)sending"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, event_id, method, device_id, payload FROM attendance_events "
+                "WHERE acked_at IS NULL AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit),
+            ).fetchall()
+
+    def ack(self, row_ids):
+        """Mark events delivered, in one transaction"""
+        if not row_ids:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "UPDATE attendance_events SET acked_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(now, row_id) for row_id in row_ids],
+            )
+            self.conn.execute("COMMIT")
+
+    def retry_later(self, row_ids, base_delay=2.0, max_delay=60.0):
+        """Back off failed events: base_delay * 2**attempts, capped at max_delay"""
+        if not row_ids:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "UPDATE attendance_events SET attempts = attempts + 1, "
+                "next_attempt = ? + MIN(?, ? * (1 << MIN(attempts, 16))) WHERE id = ?",
+                [(now, max_delay, base_delay, row_id) for row_id in row_ids],
+            )
+            self.conn.execute("COMMIT")
+
+    def purge(self, older_than=7 * 24 * 3600):
+        """Delete acknowledged events older than older_than seconds"""
+        with self.lock:
+            return self.conn.execute(
+                "DELETE FROM attendance_events WHERE acked_at IS NOT NULL AND acked_at < ?",
+                (time.time() - older_than,),
+            ).rowcount
+
+    def counts(self):
+        with self.lock:
+            pending, acked = self.conn.execute(
+                "SELECT COUNT(*) - COUNT(acked_at), COUNT(acked_at) FROM attendance_events"
+            ).fetchone()
+        return {"pending": pending, "acked": acked}
+
+
+class JournalFlusher:
+    """
+    Background thread that publishes pending journal events over the
+    shared connection in batches and acknowledges them on PUBACK.
+
+    With batch_window set, new events are coalesced for that many seconds
+    (or until max_batch_events arrive) and go out as batch messages of up
+    to max_batch_events each instead of one message per event.
+
+    Every purge_interval seconds, acknowledged events older than
+    retention seconds are deleted so the journal does not grow forever
+    on the SD card.
+    """
+    def __init__(self, journal, manager=None, batch_size=200, ack_timeout=10,
+                 idle_interval=5, retry_delay=2.0, max_retry_delay=60.0,
+                 batch_window=None, max_batch_events=BATCH_MAX_EVENTS,
+                 retention=7 * 24 * 3600, purge_interval=3600):
+        self.journal = journal
+        self.manager = manager or get_client()
+        self.batch_size = batch_size
+        self.ack_timeout = ack_timeout
+        self.idle_interval = idle_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.batch_window = batch_window
+        self.max_batch_events = max_batch_events
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.last_purge = None
+        self.recorded = 0  # events recorded since the last flush
+        self.batch_full = threading.Event()
+        self.wakeup = threading.Event()
+        self.running = threading.Event()
+        self.thread = None
+        self.counters = {"published": 0, "messages": 0, "acked": 0, "retried": 0, "purged": 0}
+
+    def start(self):
+        if self.running.is_set():
+            return
+        self.running.set()
+        self.journal.on_record = self.wake
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.wake()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def wake(self):
+        """Ask the flusher to look at the journal now"""
+        self.recorded += 1
+        if self.recorded >= self.max_batch_events:
+            self.batch_full.set()
+        self.wakeup.set()
+
+    def purge(self):
+        """Delete acknowledged events past the retention window if a purge is due"""
+        now = time.monotonic()
+        if self.last_purge is not None and now - self.last_purge < self.purge_interval:
+            return 0
+        self.last_purge = now
+        purged = self.journal.purge(self.retention)
+        self.counters["purged"] += purged
+        return purged
+
+    def _run(self):
+        while self.running.is_set():
+            try:
+                self.purge()
+            except Exception as e:
+                print(f"❌ Journal purge error: {e}")
+            # Offline: events stay journaled and the backlog drains as soon as
+            # paho has reconnected
+            if not self.manager.wait_connected(self.idle_interval):
+                continue
+            if self.batch_window:
+                self.batch_full.wait(self.batch_window)  # coalescing window
+            self.wakeup.clear()
+            self.batch_full.clear()
+            self.recorded = 0
+            try:
+                while self.running.is_set() and self.flush_once():
+                    pass
+            except Exception as e:
+                print(f"❌ Journal flush error: {e}")
+            self.wakeup.wait(self.idle_interval)
+
+    def flush_once(self):
+        """Publish one batch; returns the number of events acknowledged"""
+        rows = self.journal.pending(self.batch_size)
+        if not rows:
+            return 0
+        sent, failed = [], []
+        for row_ids, method, device_id, topic, payload, properties in self._messages(rows):
+            self.manager.watch_responses(method, device_id)
+            if not self.manager.wait_subscribed(response_topic(method, device_id), self.ack_timeout):
+                failed.extend(row_ids)
+                continue
+            info = self.manager.publish(topic, payload, properties=properties)
+            sent.append((row_ids, info))
+        self.counters["messages"] += len(sent)
+        self.counters["published"] += sum(len(row_ids) for row_ids, _ in sent)
+
+        acked = []
+        deadline = time.monotonic() + self.ack_timeout
+        for row_ids, info in sent:
+            try:
+                info.wait_for_publish(max(0.0, deadline - time.monotonic()))
+            except (RuntimeError, ValueError):
+                pass
+            (acked if info.is_published() else failed).extend(row_ids)
+        self.journal.ack(acked)
+        self.journal.retry_later(failed, self.retry_delay, self.max_retry_delay)
+        self.counters["acked"] += len(acked)
+        self.counters["retried"] += len(failed)
+        if failed:
+            print(f"⚠️ {len(failed)} journaled events not acknowledged, will retry")
+        return len(acked)
+
+    def _messages(self, rows):
+        """(row ids, method, device id, topic, payload, properties) to publish for rows"""
+        if not self.batch_window:
+            for row_id, event_id, method, device_id, payload in rows:
+                properties = None
+                if self.manager.supports_properties:
+                    properties = request_properties(method, event_id, device_id)
+                yield [row_id], method, device_id, request_topic(method), payload, properties
+            return
+        groups = {}
+        for row_id, event_id, method, device_id, payload in rows:
+            groups.setdefault((method, device_id), []).append((row_id, payload))
+        for (method, device_id), items in groups.items():
+            for i in range(0, len(items), self.max_batch_events):
+                chunk = items[i:i + self.max_batch_events]
+                batch = build_batch([json.loads(payload) for _, payload in chunk], device_id)
+                yield ([row_id for row_id, _ in chunk], method, device_id,
+                       batch_request_topic(method), batch, None)
+
+
+_journal = None
+_flusher = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """
+    Return the shared journal, starting its flusher on first use. The app
+    calls it (through get_rpc) at startup, so events journaled before a
+    restart are delivered without waiting for the next scan.
+    """
+    global _journal, _flusher
+    with _journal_lock:
+        if _journal is None:
+            _journal = AttendanceJournal(journal_path)
+            _flusher = JournalFlusher(_journal, batch_window=BATCH_WINDOW if BATCH_MODE else None)
+            _flusher.start()
+        return _journal
+
+
+def set_journal(journal, flusher=None):
+    """
+    Use `journal` (and its flusher, started here) instead of the one at
+    journal_path, e.g. a temporary journal for benchmarks, so synthetic
+    scans never reach the production database. Stops the previous flusher.
+    """
+    global _journal, _flusher
+    with _journal_lock:
+        if _flusher is not None and _flusher is not flusher:
+            _flusher.stop()
+        _journal, _flusher = journal, flusher
+        if flusher is not None:
+            flusher.start()
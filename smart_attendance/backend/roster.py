@@ -0,0 +1,228 @@
+"""
+On-device roster cache: RFID tag -> student ID -> display name/enrollment.
+
+The backend keeps a retained snapshot on devices/{device_id}/roster and
+publishes incremental updates on devices/{device_id}/roster/delta:
+
+    snapshot: {"version": 12, "students": [{"student_id": .., "rfid_tag": ..,
+               "name": .., "enrolled": true}, ...]}
+    delta:    {"version": 13, "upsert": [<student>, ...], "remove": [<student_id>, ...]}
+
+A delta that skips a version triggers a resync request on
+devices/{device_id}/roster/request. The cache is persisted to disk so a
+restart serves lookups immediately, before the broker is reachable.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from config.settings import roster_path
+from backend.api_client import DEVICE_ID, get_client
+
+Student = namedtuple("Student", "student_id rfid_tag name enrolled")
+
+
+def _student(entry):
+    return Student(
+        str(entry["student_id"]),
+        str(entry["rfid_tag"]) if entry.get("rfid_tag") else None,
+        entry.get("name") or str(entry["student_id"]),
+        bool(entry.get("enrolled", True)),
+    )
+
+
+class RosterCache:
+    """
+    In-memory roster index with delta sync over MQTT and a disk copy.
+    Lookups are plain dict reads; hit/miss counts and lookup latency are
+    kept for stats(), updated under the lock like the sync counters.
+    """
+    def __init__(self, path=roster_path, device_id=DEVICE_ID, save_delay=1.0):
+        self.path = path
+        self.device_id = device_id
+        self.save_delay = save_delay
+        self.lock = threading.Lock()
+        self.version = 0
+        self.students = {}  # student id -> Student
+        self.by_tag = {}  # rfid tag -> student id
+        self.manager = None
+        self.save_timer = None
+        self.counters = {"hits": 0, "misses": 0, "lookups": 0, "lookup_ns": 0, "max_lookup_ns": 0,
+                         "snapshots": 0, "deltas": 0, "resyncs": 0}
+        self.load()
+
+    # --- lookups -------------------------------------------------------
+
+    def _count(self, student, started):
+        elapsed = time.perf_counter_ns() - started
+        counters = self.counters
+        with self.lock:
+            counters["lookups"] += 1
+            counters["lookup_ns"] += elapsed
+            if elapsed > counters["max_lookup_ns"]:
+                counters["max_lookup_ns"] = elapsed
+            counters["hits" if student else "misses"] += 1
+        return student
+
+    def lookup_tag(self, rfid_tag):
+        """Student for an RFID tag, or None"""
+        started = time.perf_counter_ns()
+        student_id = self.by_tag.get(str(rfid_tag))
+        return self._count(self.students.get(student_id) if student_id else None, started)
+
+    def lookup_student(self, student_id):
+        """Student for a student ID (or recognizer label), or None"""
+        started = time.perf_counter_ns()
+        return self._count(self.students.get(str(student_id)), started)
+
+    def agrees(self, student, response):
+        """True unless the backend reply names a different student or an error"""
+        try:
+            body = json.loads(response)
+        except (TypeError, ValueError):
+            return student.name in str(response) or student.student_id in str(response)
+        if not isinstance(body, dict):
+            return False
+        if str(body.get("status", "ok")).lower() in ("error", "failed", "rejected"):
+            return False
+        for key in ("student_id", "id"):
+            if key in body and str(body[key]) not in (student.student_id, student.rfid_tag):
+                return False
+        return True
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        lookups = counters["lookups"] or 1
+        counters["hit_rate"] = counters["hits"] / lookups
+        counters["avg_lookup_us"] = counters["lookup_ns"] / lookups / 1000
+        counters["max_lookup_us"] = counters["max_lookup_ns"] / 1000
+        counters["students"] = len(self.students)
+        counters["version"] = self.version
+        return counters
+
+    # --- sync ------------------------------------------------------------
+
+    def start_sync(self, manager=None):
+        """Subscribe to the retained snapshot and the delta stream"""
+        self.manager = manager or get_client()
+        self.manager.subscribe(f"devices/{self.device_id}/roster", self._on_snapshot)
+        self.manager.subscribe(f"devices/{self.device_id}/roster/delta", self._on_delta)
+
+    def _request_resync(self):
+        with self.lock:
+            self.counters["resyncs"] += 1
+        if self.manager:
+            self.manager.publish(f"devices/{self.device_id}/roster/request",
+                                 {"device_id": self.device_id, "since": self.version})
+
+    def _on_snapshot(self, msg):
+        body = self.manager.decode(msg)
+        if not isinstance(body, dict):
+            return
+        self.apply_snapshot(body)
+
+    def _on_delta(self, msg):
+        body = self.manager.decode(msg)
+        if not isinstance(body, dict):
+            return
+        if not self.apply_delta(body):
+            self._request_resync()
+
+    def apply_snapshot(self, snapshot, persist=True):
+        if int(snapshot.get("version", 0)) < self.version:
+            return  # older than what deltas already brought us
+        students = {}
+        by_tag = {}
+        for entry in snapshot.get("students", []):
+            student = _student(entry)
+            students[student.student_id] = student
+            if student.rfid_tag:
+                by_tag[student.rfid_tag] = student.student_id
+        with self.lock:
+            # Swap whole dicts so lock-free readers never see a half-built index
+            self.students, self.by_tag = students, by_tag
+            self.version = int(snapshot.get("version", 0))
+            self.counters["snapshots"] += 1
+        print(f"📇 Roster snapshot v{self.version}: {len(students)} students")
+        if persist:
+            self._schedule_save()
+
+    def apply_delta(self, delta):
+        """Apply an incremental update; False if it does not follow our version"""
+        version = int(delta.get("version", 0))
+        with self.lock:
+            if version <= self.version:
+                return True  # already have it
+            if version != self.version + 1:
+                return False
+            students = dict(self.students)
+            by_tag = dict(self.by_tag)
+            for student_id in delta.get("remove", []):
+                old = students.pop(str(student_id), None)
+                if old and old.rfid_tag:
+                    by_tag.pop(old.rfid_tag, None)
+            for entry in delta.get("upsert", []):
+                student = _student(entry)
+                old = students.get(student.student_id)
+                if old and old.rfid_tag:
+                    by_tag.pop(old.rfid_tag, None)
+                students[student.student_id] = student
+                if student.rfid_tag:
+                    by_tag[student.rfid_tag] = student.student_id
+            self.students, self.by_tag = students, by_tag
+            self.version = version
+            self.counters["deltas"] += 1
+        self._schedule_save()
+        return True
+
+    # --- persistence -----------------------------------------------------
+
+    def load(self):
+        """Warm start from the on-disk copy, if any"""
+        try:
+            with open(self.path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.apply_snapshot(snapshot, persist=False)
+        return True
+
+    def _schedule_save(self):
+        with self.lock:
+            if self.save_timer is None:
+                self.save_timer = threading.Timer(self.save_delay, self.save)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def save(self):
+        """Write the roster atomically (temp file + rename)"""
+        with self.lock:
+            self.save_timer = None
+            snapshot = {"version": self.version,
+                        "students": [s._asdict() for s in self.students.values()]}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save roster cache: {e}")
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_roster():
+    """Return the shared roster cache, loaded from disk and syncing"""
+    global _roster
+    with _roster_lock:
+        if _roster is None:
+            _roster = RosterCache()
+            _roster.start_sync()
+        return _roster
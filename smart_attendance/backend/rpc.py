@@ -0,0 +1,206 @@
+"""
+Correlated request/response RPC on top of the shared MQTT connection.
+
+Every request carries a correlation ID, so several scans can be in flight
+at once and each reply resolves exactly the future that asked for it.
+On MQTT v5 the ID travels as CorrelationData next to a ResponseTopic
+property; it is always copied into the JSON payload as "correlation_id"
+too, for backends that only read the body.
+
+With a journal attached (as get_rpc does), requests are written to the
+offline journal and published by its flusher, so a scan made while the
+broker is unreachable is delivered later (its reply then counts as late).
+The flusher is also the one batching layer: with BATCH_MODE it coalesces
+requests into batch messages, and the batch reply is split back to each
+caller here by correlation ID.
+"""
+
+import heapq
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from backend.api_client import (
+    DEVICE_ID, build_payload, get_client, request_properties, response_topic, split_batch_response,
+)
+from backend.database import get_journal
+
+CORRELATION_FIELD = "correlation_id"
+
+
+class _Call:
+    __slots__ = ("correlation_id", "method", "future", "deadline", "sent_at")
+
+    def __init__(self, correlation_id, method, future, deadline):
+        self.correlation_id = correlation_id
+        self.method = method
+        self.future = future
+        self.deadline = deadline
+        self.sent_at = time.monotonic()
+
+
+class AttendanceRPC:
+    """
+    Issues attendance requests and matches replies by correlation ID.
+
+    call() returns a concurrent.futures.Future that resolves to the reply
+    text, or fails with concurrent.futures.TimeoutError once the request's
+    timeout passes. Replies that arrive after their request timed out are
+    counted as late and handed to on_late_reply(correlation_id, response)
+    if it is set.
+    """
+    def __init__(self, manager=None, device_id=DEVICE_ID, timeout=10, remember_expired=256,
+                 journal=None):
+        self.manager = manager or get_client()
+        self.journal = journal
+        self.device_id = device_id
+        self.timeout = timeout
+        self.on_late_reply = None
+        self.lock = threading.Condition()
+        self.inflight = OrderedDict()  # correlation id -> _Call, in send order
+        self.deadlines = []  # heap of (deadline, correlation id)
+        self.expired = OrderedDict()  # recently timed out ids, to tell late from unknown
+        self.remember_expired = remember_expired
+        self.counters = {"sent": 0, "resolved": 0, "timed_out": 0,
+                         "late_replies": 0, "unknown_replies": 0}
+        self.watched = set()
+        self.manager.add_reply_hook(self._on_reply)
+        threading.Thread(target=self._expire_loop, daemon=True).start()
+
+    @property
+    def in_flight(self):
+        with self.lock:
+            return len(self.inflight)
+
+    def stats(self):
+        """Snapshot of request counters and the current in-flight count"""
+        with self.lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self.inflight)
+        return stats
+
+    def call(self, method, id, timeout=None):
+        """Publish a correlated attendance request and return its future"""
+        if method not in self.watched:
+            self.manager.watch_responses(method, self.device_id)
+            self.watched.add(method)
+        correlation_id = uuid.uuid4().hex
+        future = Future()
+        future.set_running_or_notify_cancel()  # only resolved by us, never cancelled
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        call = _Call(correlation_id, method, future, deadline)
+
+        with self.lock:
+            self.inflight[correlation_id] = call
+            heapq.heappush(self.deadlines, (deadline, correlation_id))
+            self.counters["sent"] += 1
+            self.lock.notify()
+        if self.journal is not None:
+            self.journal.record(method, id, event_id=correlation_id, device_id=self.device_id)
+            return future
+
+        payload = build_payload(method, id, self.device_id)
+        payload[CORRELATION_FIELD] = correlation_id
+        properties = None
+        if self.manager.supports_properties:
+            properties = request_properties(method, correlation_id, self.device_id)
+        self.manager.publish_request(method, payload, self.device_id, properties)
+        return future
+
+    def request(self, method, id, timeout=None):
+        """Blocking helper: reply text, or None on timeout"""
+        try:
+            return self.call(method, id, timeout).result()
+        except FutureTimeoutError:
+            print("⌛ No response received within timeout period.")
+            return None
+
+    @staticmethod
+    def _correlation_id(msg, body):
+        properties = getattr(msg, "properties", None)
+        data = getattr(properties, "CorrelationData", None) if properties else None
+        if data:
+            return data.decode()
+        if isinstance(body, dict):
+            return body.get(CORRELATION_FIELD)
+        return None
+
+    def _on_reply(self, msg):
+        body = self.manager.decode(msg)
+        replies = split_batch_response(body)
+        if replies is None:
+            return self._resolve(msg.topic, self._correlation_id(msg, body), self.manager.text(msg))
+        claimed = False
+        for reply in replies:
+            correlation_id = reply.get(CORRELATION_FIELD) if isinstance(reply, dict) else None
+            claimed = self._resolve(msg.topic, correlation_id, json.dumps(reply)) or claimed
+        return claimed
+
+    def _resolve(self, topic, correlation_id, response):
+        late = False
+        with self.lock:
+            if correlation_id is None:
+                # Uncorrelated backend: fall back to the oldest request for this topic
+                call = next((c for c in self.inflight.values()
+                             if response_topic(c.method, self.device_id) == topic), None)
+            else:
+                call = self.inflight.get(correlation_id)
+            if call is not None:
+                del self.inflight[call.correlation_id]
+                self.counters["resolved"] += 1
+            elif correlation_id is not None and self.expired.pop(correlation_id, None):
+                self.counters["late_replies"] += 1
+                late = True
+            elif correlation_id is not None:
+                self.counters["unknown_replies"] += 1
+                return False  # not ours, let the plain waiters have it
+            else:
+                return False
+        if call is not None:
+            print(f"✅ Reply for {call.correlation_id[:8]} after "
+                  f"{(time.monotonic() - call.sent_at) * 1000:.0f} ms: {response}")
+            call.future.set_result(response)
+        elif late and self.on_late_reply:
+            self.on_late_reply(correlation_id, response)
+        return True
+
+    def _expire_loop(self):
+        while True:
+            expired = []
+            with self.lock:
+                while not self.deadlines:
+                    self.lock.wait()
+                deadline, correlation_id = self.deadlines[0]
+                now = time.monotonic()
+                if deadline > now:
+                    self.lock.wait(deadline - now)
+                    continue
+                while self.deadlines and self.deadlines[0][0] <= now:
+                    _, correlation_id = heapq.heappop(self.deadlines)
+                    call = self.inflight.pop(correlation_id, None)
+                    if call is None:
+                        continue  # already answered
+                    expired.append(call)
+                    self.expired[correlation_id] = True
+                    if len(self.expired) > self.remember_expired:
+                        self.expired.popitem(last=False)
+                    self.counters["timed_out"] += 1
+            for call in expired:
+                call.future.set_exception(FutureTimeoutError(
+                    f"No reply to {call.method} request {call.correlation_id} in time"))
+
+
+_rpc = None
+_rpc_lock = threading.Lock()
+
+
+def get_rpc():
+    """Return the shared AttendanceRPC bound to the shared connection"""
+    global _rpc
+    with _rpc_lock:
+        if _rpc is None:
+            _rpc = AttendanceRPC(journal=get_journal())
+        return _rpc
@@ -0,0 +1,156 @@
+"""
+LBPH against the cv2.dnn embedding backend on the same faces: accuracy,
+predict latency, model size and load time, and the cost of enrolling one
+more student (train_model.py re-reads and re-writes the whole LBPH XML;
+the embedding model only adds that student's vectors).
+
+The first --enroll photos of each student are enrolled and the rest are
+probes. "correct" is the top-1 label over every probe; "accepted" counts
+the probes under TrackVote's distance threshold (70), right and wrong.
+
+With --dataset, every photo of a folder per student ID is cropped once:
+LBPH gets the equalized grayscale crop train_model.py makes, the
+embedding backend the colour crop of the same box (aligned with
+--aligner), as each backend sees faces in the app. This is the accuracy
+comparison to run on the enrolled dataset before switching backends.
+Without --dataset, synthetic students (bench_model_format) are used,
+which mean nothing to a face network, so only their timings are worth
+reading. The embedding backend needs the network file, e.g.
+face_recognition_sface_2021dec.onnx, and the aligner
+face_detection_yunet_2023mar.onnx, both from the OpenCV model zoo. Run
+from the smart_attendance directory:
+    python -m benchmarks.bench_backends --dataset working_dataset --network sface.onnx --aligner yunet.onnx
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_model_format import PHOTOS_PER_STUDENT, student_photo
+from core.detection import COLOR_MARGIN
+from core.embeddings import EmbeddingModel, EmbeddingNetwork, dataset_faces
+from core.recognizers import model_loader
+
+ACCEPT = 70  # TrackVote's default threshold
+
+
+def load_faces(args):
+    """{label: [(200x200 LBPH face, colour face for the embedding backend)]}"""
+    faces = {}
+    if args.dataset:
+        for label, face, color in dataset_faces(args.dataset):
+            faces.setdefault(label, []).append((face, color))
+    else:
+        border = round(200 * COLOR_MARGIN)
+        for student in range(args.students):
+            photos = [student_photo(student, photo) for photo in range(PHOTOS_PER_STUDENT + args.probes)]
+            faces[student] = [(face, cv2.copyMakeBorder(cv2.cvtColor(face, cv2.COLOR_GRAY2BGR), border, border,
+                                                        border, border, cv2.BORDER_REPLICATE))
+                              for face in photos]
+    return {label: photos for label, photos in faces.items() if len(photos) > args.enroll}
+
+
+def lbph_model(path, faces, labels):
+    # As train_model.py
+    model = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8, threshold=100.0)
+    model.train(faces, np.asarray(labels, np.int32))
+    model.save(path)
+
+
+def lbph_add(path, faces, labels):
+    model = cv2.face.LBPHFaceRecognizer_create()
+    model.read(path)
+    model.update(faces, np.asarray(labels, np.int32))
+    model.save(path)
+
+
+def embedding_model(path, faces, labels, network):
+    model = EmbeddingModel(network=os.path.basename(network.path))
+    embeddings = np.vstack([network.embed(faces[i:i + 16]) for i in range(0, len(faces), 16)])
+    labels = np.asarray(labels)
+    for label in np.unique(labels):
+        model.enroll(label, embeddings[labels == label])
+    model.save(path)
+
+
+def embedding_add(path, faces, labels, network):
+    model = EmbeddingModel.load(path)
+    model.enroll(labels[0], network.embed(faces))
+    model.save(path)
+
+
+def evaluate(name, recognizer, load_seconds, path, probes, truth):
+    started = time.perf_counter()
+    predictions = [recognizer.predict(face) for face in probes]
+    single = (time.perf_counter() - started) / len(probes)
+    line = ""
+    if hasattr(recognizer, "predict_batch"):
+        started = time.perf_counter()
+        recognizer.predict_batch(probes[:8])
+        line = f"  batch of 8 {(time.perf_counter() - started) / 8 * 1000:6.1f} ms/face"
+    correct = sum(label == want for (label, _), want in zip(predictions, truth))
+    accepted = [label == want for (label, distance), want in zip(predictions, truth) if distance < ACCEPT]
+    print(f"{name:<16} correct {correct / len(truth):6.1%}  accepted {sum(accepted):>4} right {len(accepted) - sum(accepted):>4} "
+          f"wrong  predict {single * 1000:6.1f} ms/face{line}  model {os.path.getsize(path) / 1e6:7.2f} MB  "
+          f"load {load_seconds * 1000:6.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", help="one folder of photos per student ID, as train_model.py reads")
+    parser.add_argument("--network", help="face-embedding network for the embedding backend (.onnx)")
+    parser.add_argument("--aligner", help="YuNet face detector (.onnx) that aligns faces for the network")
+    parser.add_argument("--enroll", type=int, default=20, help="photos per student to enroll; the rest are probes")
+    parser.add_argument("--students", type=int, default=40, help="synthetic students (without --dataset)")
+    parser.add_argument("--probes", type=int, default=5, help="probe photos per synthetic student")
+    parser.add_argument("--matcher", default="opencv", choices=["opencv", "numpy"], help="LBPH matcher")
+    args = parser.parse_args()
+
+    faces = load_faces(args)
+    if len(faces) < 2:
+        parser.error(f"need at least two students with more than {args.enroll} photos")
+    newcomer = max(faces)  # enrolled last, to time adding one student
+    enrolled, enrolled_labels, probes, truth = [], [], [], []
+    for label, photos in faces.items():
+        if label != newcomer:
+            enrolled += photos[:args.enroll]
+            enrolled_labels += [label] * args.enroll
+        probes += photos[args.enroll:]
+        truth += [label] * (len(photos) - args.enroll)
+    added, added_labels = faces[newcomer][:args.enroll], [newcomer] * args.enroll
+    print(f"{len(faces)} students, {len(enrolled) + len(added)} enrolled photos, {len(probes)} probes")
+
+    folder = tempfile.mkdtemp()
+    backends = [("lbph", 0, os.path.join(folder, "lbph_model.xml"), lbph_model, lbph_add, ())]
+    if args.network:
+        network = EmbeddingNetwork(args.network, aligner=args.aligner)
+        network.embed([probes[0][1]])  # first forward pass allocates the network's buffers
+        backends.append(("embedding", 1, os.path.join(folder, "embeddings.npz"), embedding_model, embedding_add,
+                         (network,)))
+    else:
+        print("embedding: skipped, no --network")
+
+    for backend, view, path, build, add, extra in backends:  # view: 0 = LBPH crops, 1 = colour crops
+        started = time.perf_counter()
+        build(path, [faces[view] for faces in enrolled], enrolled_labels, *extra)
+        build_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        add(path, [faces[view] for faces in added], added_labels, *extra)
+        add_seconds = time.perf_counter() - started
+        print(f"{backend:<16} enroll {len(enrolled)} photos {build_seconds:6.2f} s, "
+              f"then one more student {add_seconds:6.2f} s")
+
+        loader = model_loader(backend, matcher=args.matcher, network=args.network, aligner=args.aligner)
+        started = time.perf_counter()
+        recognizer = loader(path)
+        load_seconds = time.perf_counter() - started
+        evaluate(backend if backend != "lbph" else f"lbph ({args.matcher})", recognizer, load_seconds,
+                 path, [faces[view] for faces in probes], truth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Throughput of correlated attendance requests through the path the app
+ships: AttendanceRPC records each request in the offline journal and the
+JournalFlusher publishes it, one message per event versus batch messages
+coalesced over --window (BATCH_MODE), against the local broker stand-in.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_batching --events 2000 --window 0.25 --max-events 50
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import wait
+
+from backend.api_client import MQTTClientManager, response_topic
+from backend.database import AttendanceJournal, JournalFlusher
+from backend.rpc import AttendanceRPC
+from benchmarks.bench_mqtt_latency import attendance_backend
+from benchmarks.local_broker import LocalBroker
+
+
+def attendance_batch_backend(topic, payload):
+    """Answer a batch with one correlated entry per event"""
+    method = topic.split("/")[1]
+    batch = json.loads(payload)
+    responses = []
+    for event in batch["events"]:
+        [(_, reply)] = attendance_backend(f"attendance/{method}/request", json.dumps(event))
+        responses.append(json.loads(reply))
+    reply = {"batch_id": batch["batch_id"], "responses": responses}
+    return [(response_topic(method, batch["device_id"]), json.dumps(reply).encode())]
+
+
+def run(manager, path, events, batch_window=None, max_events=50):
+    """(events/s, failed) for `events` calls through a fresh journal at path and its flusher"""
+    journal = AttendanceJournal(path)
+    flusher = JournalFlusher(journal, manager, batch_size=500, batch_window=batch_window,
+                             max_batch_events=max_events)
+    flusher.start()
+    rpc = AttendanceRPC(manager, timeout=30, journal=journal)
+    start = time.perf_counter()
+    futures = [rpc.call("check-in", f"tag-{i}") for i in range(events)]
+    done, not_done = wait(futures, timeout=60)
+    elapsed = time.perf_counter() - start
+    failed = len(not_done) + sum(1 for f in done if f.exception())
+    flusher.stop()
+    journal.close()
+    return events / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--window", type=float, default=0.25)
+    parser.add_argument("--max-events", type=int, default=50)
+    args = parser.parse_args()
+
+    with LocalBroker() as broker, tempfile.TemporaryDirectory() as folder:
+        broker.add_responder("attendance/+/request", attendance_backend)
+        broker.add_responder("attendance/+/request/batch", attendance_batch_backend)
+        manager = MQTTClientManager(broker.host, broker.port, username=None, use_tls=False)
+        manager.start()
+        manager.wait_connected(5)
+
+        with contextlib.redirect_stdout(io.StringIO()):  # per-reply logging skews timing
+            single_rate, single_failed = run(manager, os.path.join(folder, "single.db"), args.events)
+            routed = broker.messages_routed
+            batched_rate, batched_failed = run(manager, os.path.join(folder, "batched.db"), args.events,
+                                               args.window, args.max_events)
+            batch_messages = broker.messages_routed - routed
+        manager.stop()
+
+    print(f"single  {single_rate:10.0f} events/s  failed {single_failed}  "
+          f"messages through broker {routed}")
+    print(f"batched {batched_rate:10.0f} events/s  failed {batched_failed}  "
+          f"messages through broker {batch_messages}  "
+          f"(window {args.window * 1000:.0f} ms / {args.max_events} events)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Codec micro-benchmark: bytes per event and encode/decode operations per
+second for every available codec, after checking that each one round-trips
+the attendance messages exactly (and that JSON bodies still decode on a
+topic switched to a binary codec).
+
+The last rows compare each binary codec with JSON per message; switch a
+topic in TOPIC_CODECS only to a codec that beats JSON on it.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_codecs --iterations 20000
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from backend.api_client import build_batch, build_payload
+from backend.codecs import CODECS, CodecRegistry, JSONCodec
+
+
+def sample_messages():
+    def event(method, id):
+        payload = build_payload(method, id)
+        payload["correlation_id"] = uuid.uuid4().hex
+        payload["scanned_at"] = datetime.now(timezone.utc).isoformat()
+        return payload
+
+    check_in = event("check-in", "83-21-199-4-8")
+    check_out = event("check-out", 20231457)
+    reply = {"status": "ok", "id": 20231457, "correlation_id": check_out["correlation_id"],
+             "message": "Attendance recorded"}
+    batch = build_batch([event("check-in", f"83-21-{i}-4-8") for i in range(50)])
+    return {"check-in": (check_in, 1), "check-out": (check_out, 1),
+            "reply": (reply, 1), "batch of 50": (batch, 50)}
+
+
+def check_round_trips(messages):
+    ok = True
+    for name, codec_class in CODECS.items():
+        codec = codec_class()
+        for label, (message, _) in messages.items():
+            if codec.decode(codec.encode(message)) != message:
+                print(f"FAIL {name}: {label} does not round-trip")
+                ok = False
+    if "msgpack" in CODECS:
+        registry = CodecRegistry({"attendance/#": "msgpack"})
+        message = messages["reply"][0]
+        legacy = JSONCodec().encode(message)  # backend still answering in JSON
+        if registry.decode("attendance/check-out/response/$4", legacy) != message:
+            print("FAIL registry: JSON body not accepted on a msgpack topic")
+            ok = False
+    return ok
+
+
+def ops_per_second(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = sample_messages()
+    if not check_round_trips(messages):
+        sys.exit(1)
+    print("round trips OK for: " + ", ".join(CODECS))
+
+    print(f"{'codec':<8} {'message':<12} {'bytes/event':>11} {'encode/s':>11} {'decode/s':>11}")
+    results = {}
+    for name, codec_class in CODECS.items():
+        codec = codec_class()
+        for label, (message, events) in messages.items():
+            encoded = codec.encode(message)
+            n = max(1, args.iterations // events)
+            encode_rate = ops_per_second(lambda: codec.encode(message), n)
+            decode_rate = ops_per_second(lambda: codec.decode(encoded), n)
+            results[name, label] = (len(encoded), encode_rate, decode_rate)
+            print(f"{name:<8} {label:<12} {len(encoded) / events:11.1f} "
+                  f"{encode_rate:11.0f} {decode_rate:11.0f}")
+
+    # Switch a topic away from JSON (TOPIC_CODECS) only where its codec wins on all three
+    for name in CODECS:
+        if name == "json":
+            continue
+        for label in messages:
+            size, encode_rate, decode_rate = results[name, label]
+            json_size, json_encode, json_decode = results["json", label]
+            wins = size < json_size and encode_rate > json_encode and decode_rate > json_decode
+            print(f"{name} vs json, {label:<12} {size / json_size:5.2f}x bytes  {encode_rate / json_encode:5.2f}x encode  "
+                  f"{decode_rate / json_decode:5.2f}x decode  {'beats JSON' if wins else 'keep JSON'}")
+
+
+if __name__ == "__main__":
+    main()
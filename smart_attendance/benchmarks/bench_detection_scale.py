@@ -0,0 +1,140 @@
+"""
+Accuracy versus speed of downscaled face detection.
+
+For each detection scale and cascade pyramid step the cascade runs on
+the shrunk frame, the boxes are mapped back and the face is cropped from
+the full-resolution frame as the recognizer does. Reported per setting:
+cascade ms per frame, speed-up, frames with a face, box agreement with
+full-resolution detection at the first step (IoU >= 0.5) and, with
+--model, LBPH accuracy against the clip labels.
+
+detectMultiScale already skips pyramid levels smaller than minSize, so
+downscaling mostly saves the large first levels; the step is the other
+lever and is reported alongside.
+
+The clip set is laid out like the training dataset, one directory per
+student ID holding videos and/or frames:
+    clips/20231457/entrance.mp4
+    clips/20231458/frame_0001.jpg ...
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_detection_scale --clips clips --model "core/lbph_model (4).xml"
+    python -m benchmarks.bench_detection_scale --image student.jpg
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+
+from benchmarks.bench_tracking import panned_frames
+from core.detection import FaceDetector
+from core.tracking import iou
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".h264")
+
+
+def read_clip(path, stride, limit):
+    frames = []
+    capture = cv2.VideoCapture(path)
+    index = 0
+    while len(frames) < limit:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if index % stride == 0:
+            frames.append(frame)
+        index += 1
+    capture.release()
+    return frames
+
+
+def load_clip_set(root, stride, limit):
+    """[(label or None, gray frame)] from a labelled clip directory"""
+    samples = []
+    for label in sorted(os.listdir(root)):
+        directory = os.path.join(root, label)
+        if not os.path.isdir(directory):
+            continue
+        frames = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                frames.extend(read_clip(path, stride, limit - len(frames)))
+            else:
+                frame = cv2.imread(path)
+                if frame is not None:
+                    frames.append(frame)
+            if len(frames) >= limit:
+                break
+        samples.extend((int(label) if label.isdigit() else label, frame) for frame in frames[:limit])
+    return [(label, cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+            for label, frame in samples]
+
+
+def evaluate(detector, samples, recognizer, threshold):
+    boxes = []
+    correct = 0
+    cascade_time = 0.0
+    for label, gray in samples:
+        started = time.perf_counter()
+        faces = detector.detect(gray)
+        cascade_time += time.perf_counter() - started
+        box = faces[0] if faces else None
+        boxes.append(box)
+        if box is not None and recognizer is not None:
+            x, y, w, h = box
+            predicted, confidence = recognizer.predict(cv2.resize(gray[y:y+h, x:x+w], (200, 200)))
+            correct += predicted == label and confidence < threshold
+    return boxes, cascade_time, correct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", help="directory of <student id>/<videos or frames>")
+    parser.add_argument("--image", help="still photo panned across synthetic frames (unlabelled)")
+    parser.add_argument("--model", help="LBPH model to measure recognition accuracy with")
+    parser.add_argument("--scales", default="1,2,3,4")
+    parser.add_argument("--scale-factors", default="1.1,1.2", help="cascade pyramid steps to try")
+    parser.add_argument("--per-clip", type=int, default=100, help="max frames per student")
+    parser.add_argument("--stride", type=int, default=3, help="use every n-th video frame")
+    parser.add_argument("--threshold", type=float, default=70, help="LBPH acceptance distance")
+    args = parser.parse_args()
+
+    if args.clips:
+        samples = load_clip_set(args.clips, args.stride, args.per_clip)
+    elif args.image:
+        samples = [(None, cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+                   for frame in panned_frames(cv2.imread(args.image), args.per_clip)]
+    else:
+        parser.error("pass --clips or --image")
+    if not samples:
+        parser.error("no frames found")
+    recognizer = None
+    if args.model:
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(args.model)
+
+    height, width = samples[0][1].shape
+    print(f"{len(samples)} frames of {width}x{height}")
+    print(f"{'scale':>5} {'step':>5} {'ms/frame':>9} {'speed-up':>8} {'faces':>6} {'agree':>6} {'accuracy':>8}")
+    reference = None
+    base_time = None
+    combinations = [(float(scale), float(step)) for step in args.scale_factors.split(",")
+                    for scale in args.scales.split(",")]
+    for scale, step in combinations:
+        detector = FaceDetector(scale_factor=step, scale=scale)
+        boxes, cascade_time, correct = evaluate(detector, samples, recognizer, args.threshold)
+        if reference is None:
+            reference, base_time = boxes, cascade_time
+        both = [(a, b) for a, b in zip(reference, boxes) if a is not None]
+        agree = sum(b is not None and iou(a, b) >= 0.5 for a, b in both) / len(both) if both else 0.0
+        found = sum(box is not None for box in boxes)
+        accuracy = f"{correct / len(samples):8.0%}" if recognizer else f"{'-':>8}"
+        print(f"{scale:5g} {step:5g} {cascade_time / len(samples) * 1000:9.2f} {base_time / cascade_time:7.1f}x "
+              f"{found:6d} {agree:6.0%} {accuracy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Attendance journal throughput: single inserts, bulk inserts, bulk acks,
+how long a post-outage backlog takes to drain through a local broker, and
+two checks: the flusher's purge removes acknowledged events, and a
+journal written before a restart is delivered by the app's startup path
+(get_rpc) with no new scan.
+
+Run from the smart_attendance directory (point --db at the SD card to
+measure the Pi's storage rather than tmpfs):
+    python -m benchmarks.bench_journal --events 5000 --db /home/pi5/bench_journal.db
+
+--db must not exist yet: the benchmark deletes that file (and its -wal
+/-shm files) when it is done.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from backend import api_client, database, rpc
+from backend.api_client import MQTTClientManager
+from backend.database import AttendanceJournal, JournalFlusher
+from benchmarks.local_broker import LocalBroker
+
+
+def rate(label, count, seconds):
+    print(f"{label:<26} {count / seconds:10.0f} events/s   ({count} in {seconds * 1000:.0f} ms)")
+
+
+def startup_drain(folder, events=50, timeout=30):
+    """True if get_rpc() at startup delivers events journaled before the restart"""
+    path = os.path.join(folder, "restart.db")
+    journal = AttendanceJournal(path)
+    journal.record_many(("check-in", f"restart-{i}") for i in range(events))
+    journal.close()
+    with LocalBroker() as broker:
+        manager = MQTTClientManager(broker.host, broker.port, username=None, use_tls=False)
+        manager.start()
+        api_client._client_manager = manager  # the shared connection, on the local broker
+        database.journal_path = path
+        try:
+            journal = rpc.get_rpc().journal  # what gui.main_gui.start_delivery calls
+            deadline = time.monotonic() + timeout
+            while journal.counts()["pending"] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            counts = journal.counts()
+        finally:
+            database.set_journal(None)  # stops the flusher
+            rpc._rpc = None
+            manager.stop()
+        journal.close()
+    print(f"restart with {events} journaled events: {counts}")
+    return counts["pending"] == 0 and counts["acked"] == events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--db", default=None,
+                        help="new journal file, deleted afterwards (default: temp dir); an existing file is refused")
+    parser.add_argument("--batch-window", type=float, default=None,
+                        help="drain as batch messages coalesced over this many seconds")
+    args = parser.parse_args()
+    if args.db and any(os.path.exists(args.db + suffix) for suffix in ("", "-wal", "-shm")):
+        parser.error(f"{args.db} already exists; the benchmark deletes its journal, so give it a new path")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "journal.db")
+        journal = AttendanceJournal(path)
+        n = args.events
+
+        start = time.perf_counter()
+        for i in range(min(n, 2000)):
+            journal.record("check-in", f"tag-{i}")
+        rate("record() one at a time", min(n, 2000), time.perf_counter() - start)
+
+        start = time.perf_counter()
+        journal.record_many(("check-in", f"tag-{i}") for i in range(n))
+        rate("record_many()", n, time.perf_counter() - start)
+
+        rows = journal.pending(limit=n + 2000)
+        start = time.perf_counter()
+        journal.ack([row[0] for row in rows])
+        rate("ack() bulk", len(rows), time.perf_counter() - start)
+
+        # Backlog after an outage: n events queued while offline, then the broker returns
+        journal.record_many(("check-out", f"student-{i}") for i in range(n))
+        with LocalBroker() as broker:
+            manager = MQTTClientManager(broker.host, broker.port, username=None, use_tls=False)
+            flusher = JournalFlusher(journal, manager, batch_size=500, batch_window=args.batch_window)
+            start = time.perf_counter()
+            manager.start()
+            flusher.start()
+            while journal.counts()["pending"]:
+                time.sleep(0.01)
+            rate("backlog drain to broker", n, time.perf_counter() - start)
+            print(f"{flusher.counters['messages']} messages for {flusher.counters['published']} events")
+            flusher.stop()
+            manager.stop()
+        print(journal.counts())
+
+        # Purge: with no retention every acknowledged event goes on the next pass
+        flusher.retention, flusher.last_purge = 0, None
+        start = time.perf_counter()
+        purged = flusher.purge()
+        rate("purge of acked events", max(purged, 1), time.perf_counter() - start)
+        counts = journal.counts()
+        purge_ok = purged > 0 and counts["acked"] == 0
+        print(f"{counts}: {'PASS' if purge_ok else 'FAIL (acknowledged events were not purged)'}")
+        journal.close()
+
+        drain_ok = startup_drain(tmp)
+        print("PASS" if drain_ok else "FAIL (events journaled before the restart were not sent)")
+        if args.db:  # created by this run (an existing path was refused above)
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    sys.exit(0 if purge_ok and drain_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
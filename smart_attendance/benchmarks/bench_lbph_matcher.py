@@ -0,0 +1,76 @@
+"""
+Predict latency against gallery size: OpenCV's LBPHFaceRecognizer.predict,
+core.lbph_matcher.LBPHMatcher over every photo, and LBPHMatcher with
+--prototypes centroids per student.
+
+Each probe is an unseen photo of an enrolled synthetic student (25 photos
+per student, as bench_model_format trains them). "agree" is how many
+probes the matcher gives the same label as OpenCV, with the largest
+distance difference; "correct" is how many it gives the right student.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_lbph_matcher --sizes 100,1000,5000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_model_format import PHOTOS_PER_STUDENT, student_photo, train
+from core.lbph_matcher import LBPHMatcher
+from core.lbph_model import LBPHModel
+
+
+def run(predict, probes, repeat):
+    """(best ms per predict, predictions)"""
+    best, predictions = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        predictions = [predict(face) for face in probes]
+        best = min(best, (time.perf_counter() - started) / len(probes))
+    return best * 1000, predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,5000", help="gallery sizes (training photos)")
+    parser.add_argument("--probes", type=int, default=20)
+    parser.add_argument("--prototypes", type=int, default=3, help="centroids per student")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = sorted(int(n) for n in args.sizes.split(","))
+    full = train(sizes[-1])
+    print(f"{'gallery':>8} {'':<22} {'ms/predict':>8} {'speedup':>8}  {'agree':>6}  {'correct':>7}")
+    for size in sizes:
+        model = LBPHModel(full.stored[:size], full.labels[:size], full.radius, full.neighbors,
+                          full.grid_x, full.grid_y, full.threshold)
+        students = (size + PHOTOS_PER_STUDENT - 1) // PHOTOS_PER_STUDENT
+        rng = np.random.default_rng(size)
+        truth = rng.integers(students, size=args.probes)
+        probes = [student_photo(int(student), PHOTOS_PER_STUDENT + i) for i, student in enumerate(truth)]
+
+        recognizer = model.to_recognizer()
+        opencv_ms, expected = run(recognizer.predict, probes, args.repeat)
+        del recognizer
+        rows = [("opencv", opencv_ms, expected)]
+        started = time.perf_counter()
+        matcher = LBPHMatcher(model)
+        build = time.perf_counter() - started
+        rows.append((f"numpy ({build * 1000:.0f} ms)", *run(matcher.predict, probes, args.repeat)))
+        started = time.perf_counter()
+        matcher = LBPHMatcher(model, prototypes=args.prototypes)
+        build = time.perf_counter() - started
+        rows.append((f"proto={args.prototypes} ({build:.1f} s)", *run(matcher.predict, probes, args.repeat)))
+
+        for name, ms, predictions in rows:
+            same = sum(label == want for (label, _), (want, _) in zip(predictions, expected))
+            worst = max(abs(distance - want) for (_, distance), (_, want) in zip(predictions, expected))
+            correct = sum(label == student for (label, _), student in zip(predictions, truth))
+            print(f"{size:>8} {name:<22} {ms:8.2f} {opencv_ms / ms:7.1f}x  {same:>3}/{len(probes)}  "
+                  f"{correct:>3}/{len(probes)}" + (f"  max distance diff {worst:.2e}" if name != "opencv" else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+LBPH model files: size on disk and load time at 100, 1,000 and 10,000
+training samples for OpenCV's XML text (what train_model.py writes), the
+base64 YAML OpenCV can also read, and the .npz container of
+core.lbph_model in each quantization.
+
+For the .npz files, "load" is LBPHModel.load (histograms memory-mapped),
+"arrays" is reading every histogram back as float32 (what a custom
+matcher does) and "recognizer" is the full rebuild of an OpenCV
+recognizer. "agree" compares the rebuilt recognizer's predictions on
+--probes unseen photos with the recognizer read from the XML: same label,
+and the largest distance difference.
+
+The model is trained once, 25 photos per synthetic student, and each size
+is a prefix of it. Run from the smart_attendance directory:
+    python -m benchmarks.bench_model_format --sizes 100,1000,10000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from core.lbph_model import QUANTIZATIONS, LBPHModel
+
+PHOTOS_PER_STUDENT = 25
+
+
+def student_photo(student, photo):
+    """200x200 stand-in face: a fixed pattern per student, shifted and noised per photo"""
+    base = np.random.default_rng(student).integers(0, 256, (220, 220), dtype=np.uint8)
+    rng = np.random.default_rng((student, photo))
+    dx, dy = rng.integers(0, 20, 2)
+    face = base[dy:dy + 200, dx:dx + 200].astype(np.int16) + rng.integers(-20, 21, (200, 200))
+    return cv2.GaussianBlur(np.clip(face, 0, 255).astype(np.uint8), (5, 5), 0)
+
+
+def train(samples, chunk=500):
+    recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8, threshold=100.0)
+    for start in range(0, samples, chunk):
+        indices = range(start, min(samples, start + chunk))
+        faces = [student_photo(i // PHOTOS_PER_STUDENT, i % PHOTOS_PER_STUDENT) for i in indices]
+        labels = np.array([i // PHOTOS_PER_STUDENT for i in indices], np.int32)
+        (recognizer.update if start else recognizer.train)(faces, labels)
+    return LBPHModel.from_recognizer(recognizer)
+
+
+def timed(fn, repeat):
+    """(best seconds, last result)"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        result = None  # let the previous result go before building the next one
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def read_opencv(path):
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(path)
+    return recognizer
+
+
+def agreement(reference, recognizer, probes):
+    """(share of probes given the same label, largest distance difference)"""
+    same, worst = 0, 0.0
+    for face in probes:
+        label, distance = reference.predict(face)
+        other_label, other_distance = recognizer.predict(face)
+        same += label == other_label
+        worst = max(worst, abs(distance - other_distance))
+    return same / len(probes), worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="training samples per model")
+    parser.add_argument("--probes", type=int, default=10, help="unseen photos for the agreement check")
+    parser.add_argument("--repeat", type=int, default=3, help="loads per file (best is reported)")
+    parser.add_argument("--dir", help="where to write the model files (default: a temporary directory)")
+    args = parser.parse_args()
+
+    sizes = sorted(int(n) for n in args.sizes.split(","))
+    folder = args.dir or tempfile.mkdtemp()
+    os.makedirs(folder, exist_ok=True)
+    started = time.perf_counter()
+    full = train(sizes[-1])
+    print(f"trained {sizes[-1]} samples in {time.perf_counter() - started:.1f} s, "
+          f"{full.stored.shape[1]} bins per histogram, files in {folder}")
+
+    try:
+        for size in sizes:
+            model = LBPHModel(full.stored[:size], full.labels[:size], full.radius, full.neighbors,
+                              full.grid_x, full.grid_y, full.threshold)
+            students = (size + PHOTOS_PER_STUDENT - 1) // PHOTOS_PER_STUDENT
+            rng = np.random.default_rng(size)
+            probes = [student_photo(int(rng.integers(students)), PHOTOS_PER_STUDENT + i) for i in range(args.probes)]
+            repeat = args.repeat if size <= 1000 else 1
+            print(f"\n{size} samples ({students} students)")
+
+            xml_path = os.path.join(folder, f"lbph_{size}.xml")
+            model.write_opencv(xml_path, base64=False)
+            seconds, reference = timed(lambda: read_opencv(xml_path), repeat)
+            xml_size = os.path.getsize(xml_path)
+            print(f"  {'xml':<14} {xml_size / 1e6:8.1f} MB  read {seconds * 1000:8.0f} ms")
+            os.remove(xml_path)
+
+            yml_path = os.path.join(folder, f"lbph_{size}.yml")
+            model.write_opencv(yml_path, base64=True)
+            seconds, _ = timed(lambda: read_opencv(yml_path), repeat)
+            print(f"  {'yml base64':<14} {os.path.getsize(yml_path) / 1e6:8.1f} MB  read {seconds * 1000:8.0f} ms")
+            os.remove(yml_path)
+
+            for quantization in QUANTIZATIONS:
+                path = os.path.join(folder, f"lbph_{size}_{quantization}.npz")
+                model.save(path, quantization)
+                file_size = os.path.getsize(path)
+                load, loaded = timed(lambda: LBPHModel.load(path), repeat)
+                arrays, _ = timed(lambda: loaded.histograms().sum(), repeat)
+                rebuild, recognizer = timed(loaded.to_recognizer, repeat)
+                same, worst = agreement(reference, recognizer, probes)
+                print(f"  npz {quantization:<10} {file_size / 1e6:8.1f} MB  load {load * 1000:6.1f} ms  "
+                      f"arrays {arrays * 1000:7.1f} ms  recognizer {rebuild * 1000:7.0f} ms  "
+                      f"({xml_size / file_size:4.1f}x smaller)  agree {same:4.0%}, max distance diff {worst:.4f}")
+                del loaded, recognizer
+                os.remove(path)
+            del reference
+    finally:
+        if not args.dir:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
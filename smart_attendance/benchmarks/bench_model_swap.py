@@ -0,0 +1,147 @@
+"""
+Frame stalls while a retrained model is picked up: the pipeline runs at
+--fps on synthetic frames while the model file is replaced, first with
+the hot swap (ModelManager notices the new file and loads it on its own
+thread) and then the old way, stopping and restarting the camera so the
+model is read again.
+
+A stall is a gap between two rendered frames of more than --stall-factor
+frame periods. The hot swap should show none.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_model_swap --image student.jpg --samples 500
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_tracking import load_frames
+from core.camera import SyntheticYUVSource
+from core.model_manager import ModelManager
+
+
+def write_model(path, samples, seed):
+    rng = np.random.default_rng(seed)
+    faces = [cv2.GaussianBlur(rng.integers(0, 256, (200, 200), dtype=np.uint8), (5, 5), 0)
+             for _ in range(samples)]
+    model = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8, threshold=100.0)
+    model.train(faces, np.arange(samples, dtype=np.int32) % 50)
+    model.write(path)
+
+
+class FrameClock:
+    """Timestamps every frame the pipeline renders, as the GUI would consume them"""
+    def __init__(self, output):
+        self.output = output
+        self.stamps = []
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.output.get(timeout=0.05)
+            except Exception:
+                continue
+            self.stamps.append(time.monotonic())
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def wait_first(self, after, timeout=60):
+        """Time of the first frame rendered after `after`"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            stamp = next((t for t in self.stamps if t > after), None)
+            if stamp:
+                return stamp
+            time.sleep(0.01)
+        return None
+
+    def gaps(self, start, end):
+        stamps = [t for t in self.stamps if start <= t <= end]
+        return np.diff(stamps) if len(stamps) > 1 else np.array([0.0])
+
+
+def report(name, gaps, period, factor):
+    stalls = int((gaps > factor * period).sum())
+    print(f"{name:<22} frames {len(gaps) + 1:>4}  max gap {gaps.max() * 1000:7.1f} ms  "
+          f"p99 gap {np.percentile(gaps, 99) * 1000:6.1f} ms  stalls {stalls}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images", help="directory of frames, read in name order")
+    parser.add_argument("--image", help="still photo of a student, panned across synthetic frames")
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--samples", type=int, default=500, help="training samples in the model")
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--settle", type=float, default=3.0, help="seconds to run before and after the swap")
+    parser.add_argument("--stall-factor", type=float, default=3.0)
+    args = parser.parse_args()
+
+    import core.face_recognition as face_recognition
+
+    frames = load_frames(args) if (args.video or args.images or args.image) else None
+    folder = tempfile.mkdtemp()
+    model_file = os.path.join(folder, "lbph_model.xml")
+    retrained = [os.path.join(folder, f"retrained{i}.xml") for i in range(2)]
+    write_model(model_file, args.samples, 0)
+    for i, path in enumerate(retrained):
+        write_model(path, args.samples + 25, i + 1)
+    face_recognition.model_path = model_file
+    print(f"model: {args.samples} samples, {os.path.getsize(model_file) / 1e6:.1f} MB")
+
+    recognizer = face_recognition.FaceRecognizer()
+    recognizer._send_attendance_backend = lambda student_id, track: None
+    recognizer.models = ModelManager(model_file, on_swap=recognizer._use_model, poll_interval=0.2)
+    source = SyntheticYUVSource(frames, fps=args.fps)
+    period = 1 / args.fps
+    clock = FrameClock(recognizer.queue)
+
+    # Hot swap: replace the file and let the watcher pick it up
+    recognizer.start(source)
+    clock.wait_first(0)
+    time.sleep(args.settle)
+    swapped_at = time.monotonic()
+    os.replace(retrained[0], model_file)
+    while recognizer.models.counters["swaps"] == 0 and time.monotonic() - swapped_at < 60:
+        time.sleep(0.01)
+    swap_seconds = time.monotonic() - swapped_at
+    time.sleep(args.settle)
+    end = time.monotonic()
+    print(f"hot swap: new model in use {swap_seconds:.2f} s after the file was replaced "
+          f"(load {recognizer.models.last_load_seconds:.2f} s)")
+    report("before swap", clock.gaps(swapped_at - args.settle, swapped_at), period, args.stall_factor)
+    report("during/after swap", clock.gaps(swapped_at, end), period, args.stall_factor)
+
+    # Restart: stop the camera, read the model again, start it
+    os.replace(retrained[1], model_file)
+    restarted_at = time.monotonic()
+    recognizer.stop()
+    stopped_at = time.monotonic()
+    recognizer.models.stop()
+    recognizer.models = None
+    recognizer.recognizer = None
+    recognizer.start(source)
+    resumed_at = clock.wait_first(stopped_at)
+    time.sleep(args.settle)
+    end = time.monotonic()
+    print(f"restart: camera back {resumed_at - restarted_at:.2f} s after the file was replaced")
+    report("restart", clock.gaps(restarted_at - period, end), period, args.stall_factor)
+
+    recognizer.stop()
+    clock.stop()
+
+
+if __name__ == "__main__":
+    main()
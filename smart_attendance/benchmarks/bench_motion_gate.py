@@ -0,0 +1,116 @@
+"""
+Motion-gated idle mode on a recorded clip: CPU use while the hallway is
+empty versus while a student is in view, compared with running detection
+on every frame, and how late detection wakes up once someone arrives.
+
+The clip is replayed on its own timeline (--fps): while the gate is idle
+only one frame per --idle-interval is looked at, as the camera loop does.
+"Arrival" is the first frame in which always-on detection finds a face.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_motion_gate --video hallway.mp4 --fps 30
+    python -m benchmarks.bench_motion_gate --image student.jpg
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_tracking import load_frames, panned_frames
+from core.detection import FaceDetector
+from core.motion import MotionGate
+from core.tracking import FaceTracks
+
+
+def hallway_frames(photo, empty, present, size=(800, 600)):
+    """empty frames of sensor noise, the student panning through, then empty again"""
+    width, height = size
+    rng = np.random.default_rng(1)
+
+    def still():
+        frame = np.full((height, width, 3), 90, np.uint8)
+        return np.clip(frame + rng.integers(-6, 7, frame.shape, dtype=np.int16), 0, 255).astype(np.uint8)
+
+    return ([still() for _ in range(empty)] + panned_frames(photo, present, size)
+            + [still() for _ in range(empty)])
+
+
+def replay(frames, fps, gate, idle_interval, redetect):
+    """Per-frame phase ('idle'/'active'/'skipped') and CPU seconds spent in each phase"""
+    tracks = FaceTracks(FaceDetector(scale=2).detect, "template", redetect)
+    phases = []
+    cpu = {"idle": 0.0, "active": 0.0}
+    next_idle_frame = 0.0
+    for i, frame in enumerate(frames):
+        now = i / fps
+        idle = gate is not None and gate.idle(now) and not tracks.visible()
+        if idle and now < next_idle_frame:
+            phases.append("skipped")
+            continue
+        started = time.process_time()
+        if gate is not None:
+            gate.moving(frame, now)
+            idle = gate.idle(now) and not tracks.visible()
+        if not idle:
+            gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            tracks.update(gray)
+        cpu["idle" if idle else "active"] += time.process_time() - started
+        phases.append("idle" if idle else "active")
+        next_idle_frame = now + idle_interval
+    return phases, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images", help="directory of frames, read in name order")
+    parser.add_argument("--image", help="still photo; builds empty / student / empty footage")
+    parser.add_argument("--frames", type=int, default=900)
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--idle-after", type=float, default=5.0)
+    parser.add_argument("--idle-interval", type=float, default=0.2)
+    parser.add_argument("--redetect", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.image and not (args.video or args.images):
+        third = args.frames // 3
+        frames = hallway_frames(cv2.imread(args.image), third, args.frames - 2 * third)
+    elif args.video or args.images:
+        frames = load_frames(args)
+    else:
+        frames = []
+    if not frames:
+        parser.error("no frames: pass --video, --images or --image")
+
+    detector = FaceDetector(scale=2)
+    arrival = next((i for i, frame in enumerate(frames)
+                    if detector.detect(cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))), None)
+    duration = len(frames) / args.fps
+    print(f"{len(frames)} frames, {duration:.0f} s at {args.fps:g} fps, "
+          f"first face at frame {arrival}")
+
+    always, always_cpu = replay(frames, args.fps, None, args.idle_interval, args.redetect)
+    gated, gated_cpu = replay(frames, args.fps, MotionGate(idle_after=args.idle_after),
+                              args.idle_interval, args.redetect)
+
+    idle_frames = sum(phase != "active" for phase in gated)
+    idle_seconds = idle_frames / args.fps
+    active_seconds = duration - idle_seconds
+    print(f"always on:   {sum(always_cpu.values()) / duration:6.1%} of a core")
+    print(f"gated:       {sum(gated_cpu.values()) / duration:6.1%} of a core "
+          f"(idle {idle_seconds:.1f} s at {gated_cpu['idle'] / max(idle_seconds, 1e-9):6.1%}, "
+          f"active {active_seconds:.1f} s at {gated_cpu['active'] / max(active_seconds, 1e-9):6.1%})")
+    print(f"detection skipped on {idle_frames}/{len(frames)} frames")
+    if arrival is not None:
+        woke = next((i for i in range(arrival, len(frames)) if gated[i] == "active"), None)
+        if woke is None:
+            print("wake-up: detection never resumed after the first face")
+        else:
+            print(f"wake-up: {woke - arrival} frames ({(woke - arrival) / args.fps * 1000:.0f} ms) "
+                  f"after the first face")
+
+
+if __name__ == "__main__":
+    main()
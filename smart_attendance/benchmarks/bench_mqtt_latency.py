@@ -0,0 +1,134 @@
+"""
+Per-scan latency: connect-per-call (the old api_client behaviour) versus
+the shared MQTTClientManager connection.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_mqtt_latency --scans 50 --tls
+"""
+
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+
+from backend.api_client import (
+    MQTTClientManager, build_payload, create_mqtt_client, request_topic, response_topic,
+)
+from benchmarks.local_broker import LocalBroker
+
+
+def attendance_backend(topic, payload):
+    """Answer every attendance request the way the real backend does"""
+    method = topic.split("/")[1]
+    request = json.loads(payload)
+    reply = {"status": "ok", "id": request.get("rfid_tag") or request.get("student_id")}
+    if "correlation_id" in request:
+        reply["correlation_id"] = request["correlation_id"]
+    return [(response_topic(method, request["device_id"]), json.dumps(reply).encode())]
+
+
+def make_certificate(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost",
+         "-keyout", keyfile, "-out", certfile],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return certfile, keyfile
+
+
+def legacy_scan(host, port, ca_certs, method, id, timeout):
+    """The pre-manager send_student_data + get_attendance_response flow"""
+    def new_client():
+        client = create_mqtt_client()
+        if ca_certs:
+            client.tls_set(ca_certs=ca_certs, tls_version=ssl.PROTOCOL_TLS)
+        return client
+
+    def on_connect(client, userdata, flags, rc):
+        client.publish(request_topic(method), json.dumps(build_payload(method, id)))
+        client.disconnect()
+
+    publisher = new_client()
+    publisher.on_connect = on_connect
+    publisher.connect(host, port)
+    publisher.loop_forever()
+
+    response = None
+
+    def on_message(client, userdata, msg):
+        nonlocal response
+        response = msg.payload.decode()
+        client.disconnect()
+
+    subscriber = new_client()
+    subscriber.on_message = on_message
+    subscriber.connect(host, port, keepalive=60)
+    subscriber.subscribe(response_topic(method))
+    subscriber.loop_start()
+    elapsed = 0
+    while response is None and elapsed < timeout:
+        time.sleep(0.1)
+        elapsed += 0.1
+    subscriber.loop_stop()
+    return response
+
+
+def summarize(name, samples, misses):
+    samples_ms = sorted(s * 1000 for s in samples) or [float("nan")]
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    print(f"{name:<18} median {statistics.median(samples_ms):8.2f} ms   "
+          f"p95 {p95:8.2f} ms   missed replies {misses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scans", type=int, default=30)
+    parser.add_argument("--backend-delay", type=float, default=0.2,
+                        help="seconds the stand-in backend takes to answer")
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--tls", action="store_true", help="serve the broker over TLS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile = keyfile = None
+        if args.tls:
+            certfile, keyfile = make_certificate(tmp)
+        host = "localhost"
+        with LocalBroker(certfile=certfile, keyfile=keyfile) as broker:
+            broker.add_responder("attendance/+/request", attendance_backend, delay=args.backend_delay)
+
+            samples, misses = [], 0
+            for i in range(args.scans):
+                start = time.perf_counter()
+                if legacy_scan(host, broker.port, certfile, "check-in", f"tag-{i}", args.timeout):
+                    samples.append(time.perf_counter() - start)
+                else:
+                    misses += 1
+            summarize("connect-per-call", samples, misses)
+
+            manager = MQTTClientManager(host, broker.port, username=None,
+                                        use_tls=args.tls, ca_certs=certfile)
+            manager.start()
+            manager.wait_connected(5)
+            samples, misses = [], 0
+            for i in range(args.scans):
+                start = time.perf_counter()
+                try:
+                    manager.request("check-in", f"tag-{i}").result(timeout=args.timeout)
+                    samples.append(time.perf_counter() - start)
+                except Exception:
+                    misses += 1
+            manager.stop()
+            summarize("shared connection", samples, misses)
+            print(f"(backend delay {args.backend_delay * 1000:.0f} ms included in both)")
+
+
+if __name__ == "__main__":
+    main()
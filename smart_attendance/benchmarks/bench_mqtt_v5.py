@@ -0,0 +1,158 @@
+"""
+MQTT v5 paths of MQTTClientManager and AttendanceRPC against the local
+broker stand-in, as the app connects to HiveMQ (MQTT_PROTOCOL = v5).
+
+The stand-in backend answers on the request's ResponseTopic, copies its
+CorrelationData and ContentType, and leaves correlation_id out of the
+reply body, so a call only resolves if the v5 properties made the round
+trip. Checked:
+  direct    AttendanceRPC publishing each request itself
+  journal   AttendanceRPC with the offline journal, sent by its flusher
+  3.1.1     a 3.1.1 client on the same broker: bare messages, body correlation
+  unsubscribe  handlers stop receiving and the v5 connection stays up
+Requests use the msgpack codec when it is installed, so ContentType is
+exercised too.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_mqtt_v5 --calls 200
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import wait
+
+import paho.mqtt.client as mqtt
+
+from backend.api_client import MQTTClientManager, response_topic
+from backend.codecs import CodecRegistry, msgpack
+from backend.database import AttendanceJournal, JournalFlusher
+from backend.rpc import CORRELATION_FIELD, AttendanceRPC
+from benchmarks.local_broker import LocalBroker
+
+CODECS = {"attendance/+/request": "msgpack", "attendance/+/response/#": "msgpack"} if msgpack else {}
+
+
+class V5Backend:
+    """Broker responder answering the way a v5 backend does; counts what the requests carried"""
+    def __init__(self):
+        self.codecs = CodecRegistry(CODECS)
+        self.lock = threading.Lock()
+        self.requests = self.with_properties = self.content_types = 0
+
+    def __call__(self, topic, payload, properties):
+        content_type = properties.get("ContentType")
+        request = self.codecs.decode(topic, payload, content_type)
+        with self.lock:
+            self.requests += 1
+            self.with_properties += "ResponseTopic" in properties and "CorrelationData" in properties
+            self.content_types += content_type is not None
+        reply = {"status": "ok", "id": request.get("rfid_tag") or request.get("student_id")}
+        if "CorrelationData" not in properties:  # 3.1.1 client: correlate in the body
+            reply[CORRELATION_FIELD] = request[CORRELATION_FIELD]
+            return [(response_topic(topic.split("/")[1], request["device_id"]), self.codecs.encode(topic, reply)[0])]
+        reply_properties = {"CorrelationData": properties["CorrelationData"]}
+        if content_type:
+            reply_properties["ContentType"] = content_type
+        reply_topic = properties["ResponseTopic"]
+        return [(reply_topic, self.codecs.encode(reply_topic, reply)[0], reply_properties)]
+
+
+def connect(broker, protocol):
+    manager = MQTTClientManager(broker.host, broker.port, username=None, use_tls=False,
+                                protocol=protocol, topic_codecs=CODECS)
+    manager.start()
+    if not manager.wait_connected(5):
+        raise SystemExit(f"FAIL: no connection to the local broker over protocol {protocol}")
+    return manager
+
+
+def run_calls(rpc, calls):
+    """(failed, p50 ms) for `calls` correlated check-ins"""
+    started, latencies = {}, []
+
+    def done(future, i):
+        if not future.exception():
+            latencies.append((time.perf_counter() - started[i]) * 1000)
+
+    futures = []
+    for i in range(calls):
+        started[i] = time.perf_counter()
+        future = rpc.call("check-in", f"tag-{i}")
+        future.add_done_callback(lambda f, i=i: done(f, i))
+        futures.append(future)
+    finished, not_done = wait(futures, timeout=30)
+    failed = len(not_done) + sum(1 for future in finished if future.exception())
+    latencies.sort()
+    return failed, latencies[len(latencies) // 2] if latencies else float("nan")
+
+
+def check_unsubscribe(manager, broker):
+    """True if a handler stops receiving after unsubscribe and the connection survives the UNSUBACK"""
+    received = threading.Event()
+
+    def handler(msg):
+        received.set()
+
+    manager.subscribe("devices/bench/control", handler)
+    manager.wait_subscribed("devices/bench/control", 5)
+    broker.route("devices/bench/control", b'{"action": "start"}')
+    delivered = received.wait(5)
+    manager.unsubscribe("devices/bench/control", handler)
+    time.sleep(0.2)  # let the UNSUBACK arrive
+    received.clear()
+    broker.route("devices/bench/control", b'{"action": "stop"}')
+    return delivered and not received.wait(0.5) and manager.connected.is_set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    backend = V5Backend()
+    results = {}
+    with LocalBroker() as broker, tempfile.TemporaryDirectory() as folder:
+        broker.add_responder("attendance/+/request", backend, with_properties=True)
+        v5 = connect(broker, mqtt.MQTTv5)
+        v311 = connect(broker, mqtt.MQTTv311)
+        watched = []
+        v311.subscribe("attendance/+/request", watched.append)
+        v311.wait_subscribed("attendance/+/request", 5)
+
+        with contextlib.redirect_stdout(io.StringIO()):  # per-reply logging skews timing
+            results["direct"] = run_calls(AttendanceRPC(v5, timeout=10), args.calls)
+            journal = AttendanceJournal(os.path.join(folder, "journal.db"))
+            flusher = JournalFlusher(journal, v5)
+            flusher.start()
+            results["journal"] = run_calls(AttendanceRPC(v5, timeout=10, journal=journal), args.calls)
+            flusher.stop()
+            journal.close()
+            results["3.1.1"] = run_calls(AttendanceRPC(v311, timeout=10), args.calls)
+        unsubscribed = check_unsubscribe(v5, broker)
+        v5.stop()
+        v311.stop()
+
+    v5_requests = 2 * args.calls
+    for name, (failed, p50) in results.items():
+        print(f"{name:<8} {args.calls} calls  failed {failed}  round trip p50 {p50:.2f} ms")
+    print(f"requests with ResponseTopic + CorrelationData {backend.with_properties}/{v5_requests}, "
+          f"with ContentType {backend.content_types} ({'msgpack' if msgpack else 'JSON, no ContentType'})")
+    leaked = sum(1 for msg in watched if getattr(msg, "properties", None) and msg.properties.json())
+    print(f"3.1.1 subscriber saw {len(watched)} requests, {leaked} with properties")
+    print(f"unsubscribe on v5: {'ok' if unsubscribed else 'broken'}")
+
+    ok = (not any(failed for failed, _ in results.values()) and backend.with_properties == v5_requests
+          and (backend.content_types == v5_requests if msgpack else True)
+          and len(watched) == 3 * args.calls and not leaked and unsubscribed)
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cost of the pipeline profiler: per-call cost of a disabled and an enabled
+start()/stop() pair, and per-frame time of FaceRecognizer._process_frame
+with profiling off, on, and on with the overlay drawn. Prints the
+resulting p50/p95/p99 table.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_profiler --image student.jpg --model lbph_model.xml
+"""
+
+import argparse
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_tracking import load_frames
+from core.camera import SyntheticYUVSource
+from core.profiler import Profiler, profiler
+
+
+def call_cost(enabled, calls=200000):
+    """Seconds per start()/stop() pair"""
+    timer = Profiler(enabled=enabled)
+    started = time.perf_counter()
+    for _ in range(calls):
+        timer.stop("section", timer.start())
+    return (time.perf_counter() - started) / calls
+
+
+def frame_times(recognizer, frames, repeat):
+    """Median ms per _process_frame over the frames, best of repeat passes"""
+    passes = []
+    for _ in range(repeat):
+        recognizer.tracking = None
+        times = []
+        for frame in frames:
+            started = time.perf_counter()
+            recognizer._process_frame(frame._replace(image=frame.image.copy()))
+            times.append((time.perf_counter() - started) * 1000)
+        passes.append(statistics.median(times))
+    return min(passes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images", help="directory of frames, read in name order")
+    parser.add_argument("--image", help="still photo of a student, panned across synthetic frames")
+    parser.add_argument("--model", help="LBPH model; an untrained stand-in is used if omitted")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import core.face_recognition as face_recognition
+
+    frames = load_frames(args) if (args.video or args.images or args.image) else None
+    source = SyntheticYUVSource(frames, fps=None, limit=args.frames)
+    source.start()
+    frames = []
+    while (frame := source.read()) is not None:
+        frames.append(frame)
+
+    recognizer = face_recognition.FaceRecognizer()
+    if args.model:
+        face_recognition.model_path = args.model
+        recognizer._initialize_models()
+    else:
+        recognizer.recognizer = cv2.face.LBPHFaceRecognizer_create()
+        rng = np.random.default_rng(0)
+        recognizer.recognizer.train([rng.integers(0, 256, (200, 200), dtype=np.uint8) for _ in range(20)],
+                                    np.arange(20, dtype=np.int32))
+        recognizer.detector = face_recognition.FaceDetector(scale=recognizer.detection_scale)
+    recognizer._send_attendance_backend = lambda student_id, track: None
+
+    off_call, on_call = call_cost(False), call_cost(True)
+    print(f"start()/stop() pair: {off_call * 1e9:.0f} ns disabled, {on_call * 1e9:.0f} ns enabled")
+
+    profiler.disable()
+    off = frame_times(recognizer, frames, args.repeat)
+    profiler.reset()
+    profiler.enable()
+    on = frame_times(recognizer, frames, args.repeat)
+    profiler.enable(overlay=True)
+    overlay = frame_times(recognizer, frames, args.repeat)
+    print(f"_process_frame median: {off:.2f} ms off, {on:.2f} ms on ({on - off:+.2f}), "
+          f"{overlay:.2f} ms with overlay ({overlay - off:+.2f})")
+    print(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
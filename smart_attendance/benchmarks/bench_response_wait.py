@@ -0,0 +1,76 @@
+"""
+Latency from a reply reaching the client to get_attendance_response()
+returning it. The wait is woken by on_message, so this should stay well
+under a millisecond (the old 0.1 s sleep-poll averaged ~50 ms).
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_response_wait --replies 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from backend import api_client
+from backend.api_client import MQTTClientManager, get_attendance_response, send_student_data
+from backend.database import AttendanceJournal, JournalFlusher, set_journal
+from benchmarks.bench_mqtt_latency import attendance_backend
+from benchmarks.local_broker import LocalBroker
+
+LIMIT_MS = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replies", type=int, default=200)
+    parser.add_argument("--backend-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, LocalBroker() as broker:
+        broker.add_responder("attendance/+/request", attendance_backend, delay=args.backend_delay)
+        manager = MQTTClientManager(broker.host, broker.port, username=None, use_tls=False)
+        manager.start()
+        manager.wait_connected(5)
+        api_client._client_manager = manager  # route the module-level API to the local broker
+        # ... and journal the synthetic scans in a throwaway database, never the real one
+        journal = AttendanceJournal(os.path.join(tmp, "journal.db"))
+        set_journal(journal, JournalFlusher(journal, manager))
+
+        arrivals = []
+        manager.add_reply_hook(lambda msg: arrivals.append(time.perf_counter()) and False)
+
+        # The very first request goes out on a brand-new response topic with an
+        # instant backend: it is only answered if we published after SUBACK.
+        broker.responders[0] = ("attendance/+/request", attendance_backend, 0.0, False)
+        send_student_data("check-out", "first")
+        missed_first = get_attendance_response("check-out", api_client.DEVICE_ID, timeout=2) is None
+        broker.responders[0] = ("attendance/+/request", attendance_backend, args.backend_delay, False)
+
+        samples, missed = [], 0
+        for i in range(args.replies):
+            arrivals.clear()
+            send_student_data("check-in", f"tag-{i}")
+            response = get_attendance_response("check-in", api_client.DEVICE_ID, timeout=2)
+            returned = time.perf_counter()
+            if response is None or not arrivals:
+                missed += 1
+                continue
+            samples.append((returned - arrivals[0]) * 1000)
+        set_journal(None)
+        journal.close()
+        manager.stop()
+
+    samples.sort()
+    p50 = samples[len(samples) // 2]
+    p95 = samples[int(len(samples) * 0.95)]
+    print(f"reply arrival -> return: p50 {p50:.3f} ms  p95 {p95:.3f} ms  max {samples[-1]:.3f} ms")
+    print(f"missed replies {missed}, first reply on a fresh topic missed: {missed_first}")
+    ok = p95 < LIMIT_MS and not missed_first and not missed
+    print("PASS" if ok else f"FAIL (p95 must be under {LIMIT_MS} ms with no missed replies)")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
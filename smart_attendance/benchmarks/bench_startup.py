@@ -0,0 +1,161 @@
+"""
+Application startup: time to the home page and time to the first
+recognized frame, each measured in a fresh interpreter.
+
+home         imports what gui.main_gui needs to draw the home page, and
+             lists which heavy modules (cv2, numpy, the recognizer) that
+             pulled in
+home-eager   the same plus core.face_recognition, as when the pages were
+             imported up front
+first-frame  the attendance page is opened --open-after seconds after
+             startup: time from opening it to the first rendered frame and
+             to the first check-in, with the model loaded on demand (cold)
+             or preloaded in the background at startup (preload) by
+             gui.main_gui.preload_vision itself, whose own run time is
+             shown too. The stand-in camera's frames are built before
+             the clock starts, so cv2 and numpy are already imported in
+             both runs; the home rows show that cost
+
+Without customtkinter or Pillow installed, every child imports the
+stand-ins in benchmarks/stub_tk, so the home rows leave out the
+toolkit's own import time and show only what the app's modules pull in.
+
+Run from the smart_attendance directory (the first-frame runs need a
+photo of a student and a model that knows them for the check-in time):
+    python -m benchmarks.bench_startup --image student.jpg --model lbph_model.xml
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+STARTED = time.perf_counter()
+HEAVY = ["cv2", "numpy", "core.face_recognition", "core.camera", "paho.mqtt.client"]
+STUB_TK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_tk")
+
+
+def child_home(eager):
+    import gui.main_gui  # noqa: F401
+    import gui.home_page  # noqa: F401
+    if eager:
+        import core.face_recognition  # noqa: F401
+    return {"seconds": time.perf_counter() - STARTED, "loaded": [name for name in HEAVY if name in sys.modules]}
+
+
+def child_first_frame(args):
+    import config.settings
+    if args.model:
+        config.settings.model_path = args.model
+    from gui.main_gui import preload_vision
+
+    preload = {}
+
+    def timed_preload():
+        started = time.perf_counter()
+        preload_vision()
+        preload["seconds"] = time.perf_counter() - started
+
+    if args.preload:
+        threading.Thread(target=timed_preload, daemon=True).start()
+    # Stand-in for the camera, prepared off the clock
+    from benchmarks.bench_tracking import load_frames
+    from core.camera import SyntheticYUVSource
+    source = SyntheticYUVSource(load_frames(args) if args.image else None, fps=30)
+    time.sleep(args.open_after)
+
+    opened = time.perf_counter()
+    from core.face_recognition import face_recognizer
+
+    published = threading.Event()
+    face_recognizer._send_attendance_backend = lambda student_id, track: published.set()
+    face_recognizer.start(source)
+    try:
+        face_recognizer.queue.get(timeout=60)
+    except queue.Empty:
+        raise SystemExit("no frame rendered within 60 s (see the errors above)")
+    first_frame = time.perf_counter() - opened
+    first_checkin = time.perf_counter() - opened if published.wait(10) else None
+    face_recognizer.stop()
+    return {"first_frame": first_frame, "first_checkin": first_checkin, "preload": preload.get("seconds")}
+
+
+def run_child(argv, env=None):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup"] + argv,
+                             capture_output=True, text=True, env=env)
+    lines = [line for line in process.stdout.splitlines() if line.startswith("{")]
+    if process.returncode or not lines:
+        error = (process.stderr.strip().splitlines() or ["no output"])[-1]
+        return None, error
+    result = json.loads(lines[-1])
+    result["wall"] = time.perf_counter() - started
+    return result, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="still photo of a student, panned across synthetic frames")
+    parser.add_argument("--model", help="LBPH model to load (default: model_path from config.settings)")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--open-after", type=float, default=2.0,
+                        help="seconds on the home page before the attendance page is opened")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=["home", "home-eager", "first-frame"], help=argparse.SUPPRESS)
+    parser.add_argument("--preload", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.video = args.images = None  # for load_frames
+
+    if args.child in ("home", "home-eager"):
+        print(json.dumps(child_home(args.child == "home-eager")))
+        return
+    if args.child == "first-frame":
+        print(json.dumps(child_first_frame(args)))
+        return
+
+    import cv2
+    from config.settings import model_path
+    if not args.image:
+        parser.error("--image is required: a photo of a student the model knows, for the first check-in")
+    if cv2.imread(args.image) is None:
+        parser.error(f"cannot read --image {args.image}")
+    if not os.path.isfile(args.model or model_path):
+        parser.error(f"no model at {args.model or model_path}; pass --model")
+
+    tk_env = None
+    if importlib.util.find_spec("customtkinter") is None or importlib.util.find_spec("PIL") is None:
+        tk_env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [STUB_TK, os.environ.get("PYTHONPATH")])))
+        print("customtkinter or Pillow is not installed: the runs use benchmarks/stub_tk")
+    for mode in ("home", "home-eager"):
+        runs = [run_child(["--child", mode], tk_env) for _ in range(args.repeat)]
+        results = [result for result, _ in runs if result]
+        if not results:
+            print(f"{mode:<22} skipped: {runs[0][1]}")
+            continue
+        best = min(results, key=lambda result: result["wall"])
+        print(f"{mode:<22} {best['wall'] * 1000:7.0f} ms from launch ({best['seconds'] * 1000:.0f} ms of imports), "
+              f"loaded: {', '.join(best['loaded']) or 'none of ' + ', '.join(HEAVY)}")
+
+    common = ["--frames", str(args.frames), "--open-after", str(args.open_after)]
+    common += ["--image", args.image] if args.image else []
+    common += ["--model", args.model] if args.model else []
+    for name, extra in (("first-frame cold", []), ("first-frame preload", ["--preload"])):
+        runs = [run_child(["--child", "first-frame"] + common + extra, tk_env) for _ in range(args.repeat)]
+        results = [result for result, _ in runs if result]
+        if not results:
+            print(f"{name:<22} failed: {runs[0][1]}")
+            continue
+        best = min(results, key=lambda result: result["first_frame"])
+        checkin = best["first_checkin"]
+        preloaded = f", preload_vision took {best['preload'] * 1000:.0f} ms" if best.get("preload") else ""
+        print(f"{name:<22} first frame {best['first_frame'] * 1000:7.0f} ms after opening the page, "
+              f"first check-in {'%.0f ms' % (checkin * 1000) if checkin is not None else 'none'}{preloaded}")
+
+
+if __name__ == "__main__":
+    main()
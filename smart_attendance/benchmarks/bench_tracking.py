@@ -0,0 +1,115 @@
+"""
+Detect-every-frame versus detect-then-track on recorded footage: cascade
+runs per second, wall and CPU time per frame, and how often the tracked
+box agrees with the cascade's (IoU >= 0.5 on frames both found a face).
+
+Run from the smart_attendance directory with a clip from the Pi camera
+(800x600), a directory of frames, or one still photo that is panned
+across a background to fake a slowly moving student:
+    python -m benchmarks.bench_tracking --video entrance.mp4
+    python -m benchmarks.bench_tracking --image student.jpg --frames 300
+"""
+
+import argparse
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from core.camera import open_source
+from core.detection import FaceDetector
+from core.tracking import FaceTracks, available_trackers, iou
+
+
+def load_frames(args):
+    """
+    Frames of --video or --images (read ahead so decoding is not timed), or
+    a panned --image; [] if none was given or it could not be read (never
+    the Pi camera)
+    """
+    if not (args.video or args.images):
+        photo = cv2.imread(args.image) if args.image else None
+        return panned_frames(photo, args.frames) if photo is not None else []
+    source = open_source(args.video or args.images)
+    source.start()
+    frames = []
+    while len(frames) < args.frames:
+        frame = source.read()
+        if frame is None:
+            break
+        frames.append(frame.image)
+    source.stop()
+    return frames
+
+
+def panned_frames(photo, count, size=(800, 600)):
+    """The photo drifting back and forth over a grey background"""
+    width, height = size
+    scale = min(1.0, 0.8 * height / photo.shape[0], 0.6 * width / photo.shape[1])
+    photo = cv2.resize(photo, None, fx=scale, fy=scale)
+    ph, pw = photo.shape[:2]
+    rng = np.random.default_rng(0)
+    frames = []
+    for i in range(count):
+        frame = np.full((height, width, 3), 90, np.uint8)
+        x = int((width - pw) * (0.5 + 0.4 * np.sin(i / 40)))
+        y = int((height - ph) * (0.5 + 0.3 * np.sin(i / 55)))
+        frame[y:y+ph, x:x+pw] = photo
+        noise = rng.integers(-6, 7, frame.shape, dtype=np.int16)
+        frames.append(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def run(frames, find_faces):
+    boxes = []
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for frame in frames:
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        faces = find_faces(gray)
+        boxes.append(faces[0] if len(faces) else None)
+    return boxes, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images", help="directory of frames, read in name order")
+    parser.add_argument("--image", help="still photo to pan across synthetic frames")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--redetect", type=int, default=10, help="frames between cascade runs")
+    parser.add_argument("--trackers", default=",".join(available_trackers()))
+    args = parser.parse_args()
+    if not (args.video or args.images or args.image):
+        parser.error("no frames: pass --video, --images or --image")
+
+    frames = load_frames(args)
+    if not frames:
+        parser.error(f"could not read any frames from {args.video or args.images or args.image}")
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"re-detect every {args.redetect}")
+
+    detector = FaceDetector()
+    baseline, wall, cpu = run(frames, detector.detect)
+    found = sum(box is not None for box in baseline)
+    print(f"{'mode':<10} {'cascade/s':>9} {'ms/frame':>9} {'cpu ms/frame':>12} "
+          f"{'faces':>6} {'agree':>6}")
+    print(f"{'detect':<10} {len(frames) / wall:9.1f} {wall / len(frames) * 1000:9.2f} "
+          f"{cpu / len(frames) * 1000:12.2f} {found:6d} {'-':>6}")
+
+    for kind in args.trackers.split(","):
+        tracking = FaceTracks(detector.detect, kind, args.redetect)
+        boxes, wall, cpu = run(frames, lambda gray: [track.box for track in tracking.update(gray)])
+        both = [(a, b) for a, b in zip(baseline, boxes) if a is not None and b is not None]
+        agree = sum(iou(a, b) >= 0.5 for a, b in both) / len(both) if both else 0.0
+        print(f"{kind:<10} {tracking.counters['detections'] / wall:9.1f} "
+              f"{wall / len(frames) * 1000:9.2f} {cpu / len(frames) * 1000:12.2f} "
+              f"{sum(box is not None for box in boxes):6d} {agree:6.0%}")
+    if found == 0:
+        print("note: the cascade found no faces, so every mode only measured detection")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
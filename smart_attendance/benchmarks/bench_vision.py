@@ -0,0 +1,254 @@
+"""
+Vision benchmark suite: cascade detection time by resolution, LBPH train
+and predict time by gallery size, end-to-end pipeline FPS, time from a
+face coming into view to its check-in being published, and peak RSS.
+
+Results are written as JSON; pass --baseline with an earlier file to flag
+metrics that got worse by more than --tolerance (exit status 1 if any).
+Without --video/--images/--image the input is synthetic, so runs are
+reproducible on any Linux box; pass a real clip of a student to make the
+recognition numbers meaningful.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_vision --image student.jpg --output vision.json
+    python -m benchmarks.bench_vision --image student.jpg --baseline vision.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_tracking import load_frames
+from core.camera import FrameSource, SyntheticYUVSource
+from core.detection import FaceDetector
+
+RESOLUTIONS = [(320, 240), (400, 300), (640, 480), (800, 600)]
+GALLERY_SIZES = [25, 100, 400, 1600]
+
+
+def metric(value, unit, better="lower"):
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+
+def timed(fn, repeat):
+    """Per-call times in ms"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+
+def student_frames(args):
+    if args.video or args.images or args.image:
+        return load_frames(args)
+    source = SyntheticYUVSource(fps=None, limit=args.frames)
+    source.start()
+    frames = []
+    while (frame := source.read()) is not None:
+        frames.append(cv2.cvtColor(frame.image, cv2.COLOR_BGRA2BGR))
+    return frames
+
+
+def bench_detection(frames, repeat):
+    results = {}
+    for width, height in RESOLUTIONS:
+        grays = [cv2.equalizeHist(cv2.cvtColor(cv2.resize(frame, (width, height)), cv2.COLOR_BGR2GRAY))
+                 for frame in frames[:repeat]]
+        scale = width / 800
+        detector = FaceDetector(min_size=(round(100 * scale), round(100 * scale)))
+        times = [timed(lambda: detector.detect(gray), 1)[0] for gray in grays]
+        results[f"detect_{width}x{height}_ms"] = metric(statistics.median(times), "ms")
+    return results
+
+
+def face_crops(frames, count):
+    detector = FaceDetector()
+    crops = []
+    for frame in frames:
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        for x, y, w, h in detector.detect(gray)[:1]:
+            crops.append(cv2.resize(gray[y:y+h, x:x+w], (200, 200)))
+        if len(crops) >= count:
+            break
+    return crops
+
+
+def gallery(crops, size, rng):
+    """size training faces: the student's crops (label 1) padded with other 'students'"""
+    faces, labels = list(crops[:size // 4]), [1] * len(crops[:size // 4])
+    while len(faces) < size:
+        faces.append(cv2.GaussianBlur(rng.integers(0, 256, (200, 200), dtype=np.uint8), (5, 5), 0))
+        labels.append(2 + len(faces) % 50)
+    return faces, np.array(labels, dtype=np.int32)
+
+
+def new_lbph():
+    # Same parameters as train_model/train_model.py
+    return cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8, threshold=100.0)
+
+
+def bench_lbph(crops, repeat):
+    results = {}
+    rng = np.random.default_rng(0)
+    probe = crops[0] if crops else rng.integers(0, 256, (200, 200), dtype=np.uint8)
+    for size in GALLERY_SIZES:
+        faces, labels = gallery(crops, size, rng)
+        model = new_lbph()
+        train_ms = timed(lambda: model.train(faces, labels), 1)[0]
+        predict = timed(lambda: model.predict(probe), repeat)
+        results[f"lbph_train_{size}_ms"] = metric(train_ms, "ms")
+        results[f"lbph_predict_{size}_ms"] = metric(statistics.median(predict), "ms")
+    return results
+
+
+class ArrivalSource(FrameSource):
+    """Wraps a source and notes when the first frame with the student is read"""
+    def __init__(self, source, arrival_index):
+        self.source = source
+        self.arrival_index = arrival_index
+        self.index = 0
+        self.arrived_at = None
+
+    def start(self):
+        self.source.start()
+
+    def read(self):
+        frame = self.source.read()
+        if self.index == self.arrival_index:
+            self.arrived_at = time.monotonic()
+        self.index += 1
+        return frame
+
+    def stop(self):
+        self.source.stop()
+
+
+def bench_pipeline(frames, crops, realtime_fps):
+    """End-to-end FPS (fast playback) and arrival-to-publish latency (real time)"""
+    import core.face_recognition as face_recognition
+
+    model_file = os.path.join(tempfile.mkdtemp(), "bench_lbph.xml")
+    model = new_lbph()
+    model.train(*gallery(crops, 100, np.random.default_rng(1)))
+    model.write(model_file)
+    face_recognition.model_path = model_file
+
+    class BenchRecognizer(face_recognition.FaceRecognizer):
+        """Records the check-in instead of publishing it"""
+        def __init__(self):
+            super().__init__()
+            self.published = []
+            self.published_event = threading.Event()
+
+        def _send_attendance_backend(self, student_id, track):
+            self.published.append((student_id, time.monotonic()))
+            self.published_event.set()
+
+    results = {}
+    recognizer = BenchRecognizer()
+    recognizer.start(SyntheticYUVSource(frames, fps=None, limit=len(frames)))
+    started = time.monotonic()
+    recognizer.thread.join()
+    elapsed = time.monotonic() - started
+    stats = recognizer.stats()
+    results["pipeline_fps"] = metric(stats["render"]["count"] / elapsed, "fps", "higher")
+    results["pipeline_detect_ms"] = metric(stats["detect"]["ms"], "ms")
+
+    if crops:
+        # Empty hallway for a second, then the student
+        empty = [np.full_like(frames[0], 90)] * int(realtime_fps)
+        clip = empty + frames
+        recognizer = BenchRecognizer()
+        face_recognition.scan_filter.forget(("check-in", "1"))
+        source = ArrivalSource(SyntheticYUVSource(clip, fps=realtime_fps, limit=len(clip)), len(empty))
+        recognizer.start(source)
+        if recognizer.published_event.wait(len(clip) / realtime_fps + 5) and source.arrived_at:
+            latency = recognizer.published[0][1] - source.arrived_at
+            results["arrival_to_publish_ms"] = metric(latency * 1000, "ms")
+        recognizer.stop()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Names of metrics that got worse than the baseline by more than tolerance"""
+    regressions = []
+    for name, current in results["metrics"].items():
+        previous = baseline.get("metrics", {}).get(name)
+        if not previous or not previous["value"]:
+            continue
+        change = (current["value"] - previous["value"]) / previous["value"]
+        if current["better"] == "higher":
+            change = -change
+        marker = ""
+        if change > tolerance:
+            regressions.append(name)
+            marker = "  <-- REGRESSION"
+        print(f"{name:<28} {previous['value']:>10.3f} -> {current['value']:>10.3f} "
+              f"{current['unit']:<4} {change:+7.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images", help="directory of frames, read in name order")
+    parser.add_argument("--image", help="still photo of a student, panned across synthetic frames")
+    parser.add_argument("--frames", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--fps", type=float, default=30, help="real-time rate for the latency run")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    frames = student_frames(args)
+    if not frames:
+        parser.error("no frames")
+    crops = face_crops(frames, 100)
+    print(f"{len(frames)} frames, {len(crops)} face crops")
+
+    metrics = {}
+    metrics.update(bench_detection(frames, args.repeat))
+    metrics.update(bench_lbph(crops, args.repeat))
+    metrics.update(bench_pipeline(frames, crops, args.fps))
+    metrics["peak_rss_mb"] = metric(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "MB")
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "input": args.video or args.images or args.image or "synthetic",
+        "frames": len(frames),
+        "metrics": metrics,
+    }
+    for name, value in metrics.items():
+        print(f"{name:<28} {value['value']:>10.3f} {value['unit']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {args.baseline} ({baseline.get('timestamp')}):")
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
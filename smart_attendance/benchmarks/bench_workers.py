@@ -0,0 +1,115 @@
+"""
+Scaling of the recognition worker pool: frames per second and time to
+result (submit to ordered result) with 1, 2 and 4 worker processes,
+against running the same detect + predict on one in-process thread.
+
+Frames are submitted as fast as the pool accepts them; every frame does
+a full cascade pass and predicts every face, as the pool does.
+
+Run from the smart_attendance directory:
+    python -m benchmarks.bench_workers --image student.jpg --model lbph_model.xml
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_tracking import load_frames
+from core.camera import SyntheticYUVSource
+from core.detection import FaceDetector
+from core.lbph_model import load_recognizer
+from core.workers import RecognitionPool, detect_and_predict
+
+
+def synthetic_model(path):
+    rng = np.random.default_rng(0)
+    model = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8, threshold=100.0)
+    model.train([rng.integers(0, 256, (200, 200), dtype=np.uint8) for _ in range(200)],
+                np.arange(200, dtype=np.int32) % 8)
+    model.write(path)
+
+
+def in_process(frames, model_path, count):
+    detector, recognizer = FaceDetector(), load_recognizer(model_path)
+    started = time.perf_counter()
+    for i in range(count):
+        frame = frames[i % len(frames)]
+        detect_and_predict(detector, recognizer, frame.image, frame.gray, 2, (100, 100))
+    elapsed = time.perf_counter() - started
+    return count / elapsed, elapsed / count
+
+
+def pooled(frames, model_path, workers, count):
+    pool = RecognitionPool(workers, model_path)
+    latencies, order = [], []
+    done = threading.Event()
+
+    def consume():
+        while len(latencies) < count:
+            result = pool.output.get()
+            latencies.append(time.perf_counter() - result.frame.timestamp)
+            order.append(result.frame.timestamp)
+        done.set()
+
+    pool.submit(frames[0]._replace(timestamp=time.perf_counter()))  # start the workers
+    if not pool.wait_ready(60):
+        pool.close()
+        raise SystemExit("the workers could not start (see the errors above)")
+    while pool.stats.count == 0:
+        time.sleep(0.01)
+    pool.output.clear()
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    started = time.perf_counter()
+    submitted = 0
+    while submitted < count:
+        frame = frames[submitted % len(frames)]._replace(timestamp=time.perf_counter())
+        if pool.submit(frame):
+            submitted += 1
+        else:
+            time.sleep(0.001)  # every slot busy
+    done.wait(60)
+    elapsed = time.perf_counter() - started
+    pool.close()
+    assert order == sorted(order), "results out of frame order"
+    return count / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video")
+    parser.add_argument("--images", help="directory of frames, read in name order")
+    parser.add_argument("--image", help="still photo of a student, panned across synthetic frames")
+    parser.add_argument("--model", help="LBPH model; a synthetic 200-sample one if omitted")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--count", type=int, default=200, help="frames per run")
+    parser.add_argument("--workers", default="1,2,4")
+    args = parser.parse_args()
+
+    bgr = load_frames(args) if (args.video or args.images or args.image) else None
+    source = SyntheticYUVSource(bgr, fps=None, limit=args.frames)
+    source.start()
+    frames = []
+    while (frame := source.read()) is not None:
+        frames.append(frame._replace(gray=frame.gray.copy()))
+    model_path = args.model
+    if not model_path:
+        model_path = os.path.join(tempfile.mkdtemp(), "bench_lbph.xml")
+        synthetic_model(model_path)
+    print(f"{len(frames)} frames, {os.cpu_count()} CPUs, {args.count} frames per run")
+
+    fps, seconds = in_process(frames, model_path, args.count)
+    print(f"{'in-process':<12} {fps:6.1f} fps  {seconds * 1000:6.1f} ms per frame")
+    for workers in (int(n) for n in args.workers.split(",")):
+        fps, p50, p95 = pooled(frames, model_path, workers, args.count)
+        print(f"{workers} worker{'s' if workers > 1 else ' '}    {fps:6.1f} fps  "
+              f"time to result p50 {p50 * 1000:6.1f} ms  p95 {p95 * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Minimal in-process MQTT 3.1.1 and 5 broker used as a stand-in for HiveMQ
+in benchmarks. Supports CONNECT, SUBSCRIBE (+/# wildcards), UNSUBSCRIBE,
+PUBLISH at QoS 0/1, retained messages and PINGREQ. Messages are always
+forwarded to subscribers at QoS 0. A v5 publish keeps its properties
+(ResponseTopic, CorrelationData, ContentType, ...) on the way to v5
+subscribers; 3.1.1 subscribers get the bare message. Topic aliases,
+session expiry and reason codes other than success are not implemented.
+Optional TLS makes the handshake cost of connect-per-call clients visible.
+"""
+
+import socket
+import ssl
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+MQTT_V5 = 5
+
+# v5 PUBLISH properties: id -> (name, kind)
+PUBLISH_PROPERTIES = {
+    0x01: ("PayloadFormatIndicator", "byte"),
+    0x02: ("MessageExpiryInterval", "int32"),
+    0x03: ("ContentType", "string"),
+    0x08: ("ResponseTopic", "string"),
+    0x09: ("CorrelationData", "binary"),
+    0x0B: ("SubscriptionIdentifier", "varint"),
+    0x23: ("TopicAlias", "int16"),
+    0x26: ("UserProperty", "pair"),
+}
+PROPERTY_IDS = {name: (property_id, kind) for property_id, (name, kind) in PUBLISH_PROPERTIES.items()}
+
+
+def topic_matches(sub, topic):
+    sub_parts = sub.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(sub_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(sub_parts) == len(topic_parts)
+
+
+def _encode_length(length):
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        out.append(byte)
+        if not length:
+            return bytes(out)
+
+
+def _read_varint(data, offset):
+    multiplier, value = 1, 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            return value, offset
+        multiplier *= 128
+
+
+def _string(value):
+    encoded = value.encode() if isinstance(value, str) else bytes(value)
+    return struct.pack("!H", len(encoded)) + encoded
+
+
+def decode_properties(raw):
+    """{name: value} of v5 PUBLISH properties; UserProperty is a list of (key, value)"""
+    properties, offset = {}, 0
+    while offset < len(raw):
+        property_id = raw[offset]
+        name, kind = PUBLISH_PROPERTIES[property_id]
+        offset += 1
+        if kind == "byte":
+            value, offset = raw[offset], offset + 1
+        elif kind == "int16":
+            (value,), offset = struct.unpack_from("!H", raw, offset), offset + 2
+        elif kind == "int32":
+            (value,), offset = struct.unpack_from("!I", raw, offset), offset + 4
+        elif kind == "varint":
+            value, offset = _read_varint(raw, offset)
+        elif kind == "pair":
+            key, offset = _read_string(raw, offset)
+            value, offset = _read_string(raw, offset)
+            properties.setdefault(name, []).append((key, value))
+            continue
+        else:
+            (size,) = struct.unpack_from("!H", raw, offset)
+            value = raw[offset + 2:offset + 2 + size]
+            value = value.decode() if kind == "string" else bytes(value)
+            offset += 2 + size
+        properties[name] = value
+    return properties
+
+
+def encode_properties(properties):
+    """Inverse of decode_properties"""
+    out = bytearray()
+    for name, value in (properties or {}).items():
+        property_id, kind = PROPERTY_IDS[name]
+        if kind == "pair":
+            for key, item in value:
+                out += bytes([property_id]) + _string(key) + _string(item)
+            continue
+        out.append(property_id)
+        if kind == "byte":
+            out.append(value)
+        elif kind == "int16":
+            out += struct.pack("!H", value)
+        elif kind == "int32":
+            out += struct.pack("!I", value)
+        elif kind == "varint":
+            out += _encode_length(value)
+        else:
+            out += _string(value)
+    return bytes(out)
+
+
+def _packet(packet_type, flags, body):
+    return bytes([(packet_type << 4) | flags]) + _encode_length(len(body)) + body
+
+
+def _read_exact(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("client closed")
+        data += chunk
+    return bytes(data)
+
+
+def _read_packet(sock):
+    header = _read_exact(sock, 1)[0]
+    multiplier, length = 1, 0
+    while True:
+        byte = _read_exact(sock, 1)[0]
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+        multiplier *= 128
+    return header >> 4, header & 0x0F, _read_exact(sock, length) if length else b""
+
+
+def _read_string(data, offset):
+    (size,) = struct.unpack_from("!H", data, offset)
+    offset += 2
+    return data[offset:offset + size].decode(), offset + size
+
+
+def _read_properties(data, offset, version):
+    """Raw property bytes of a v5 packet (b"" before v5) and the offset after them"""
+    if version < MQTT_V5:
+        return b"", offset
+    length, offset = _read_varint(data, offset)
+    return data[offset:offset + length], offset + length
+
+
+class _Session:
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+        self.version = 4  # protocol level from CONNECT: 4 = 3.1.1, 5 = v5
+
+    def send(self, data):
+        with self.lock:
+            self.sock.sendall(data)
+
+
+class LocalBroker:
+    """Threaded MQTT broker bound to localhost on an ephemeral port"""
+    def __init__(self, host="127.0.0.1", port=0, certfile=None, keyfile=None):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(64)
+        self.host, self.port = self.server.getsockname()
+        self.ssl_context = None
+        if certfile:
+            self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.ssl_context.load_cert_chain(certfile, keyfile)
+        self.sessions = set()
+        self.retained = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.messages_routed = 0
+        self.responders = []  # (topic filter, fn, delay, with_properties)
+
+    def add_responder(self, topic_filter, fn, delay=0.0, with_properties=False):
+        """
+        Answer publishes on topic_filter, standing in for the backend.
+
+        fn(topic, payload) returns [(topic, payload)] to route. With
+        with_properties it is called as fn(topic, payload, properties),
+        properties being the request's decode_properties() dict ({} from a
+        3.1.1 client), and may return (topic, payload, properties) replies.
+        """
+        self.responders.append((topic_filter, fn, delay, with_properties))
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        try:
+            self.server.close()
+        except OSError:
+            pass
+        with self.lock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            try:
+                session.sock.close()
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = None
+        try:
+            if self.ssl_context:
+                sock = self.ssl_context.wrap_socket(sock, server_side=True)
+            session = _Session(sock)
+            with self.lock:
+                self.sessions.add(session)
+            while self.running:
+                packet_type, flags, body = _read_packet(sock)
+                if packet_type == CONNECT:
+                    _, offset = _read_string(body, 0)  # protocol name
+                    session.version = body[offset]
+                    # session present 0, return/reason code 0 (+ no v5 properties)
+                    session.send(_packet(CONNACK, 0, b"\x00\x00\x00" if session.version >= MQTT_V5 else b"\x00\x00"))
+                elif packet_type == PUBLISH:
+                    self._handle_publish(session, flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self._handle_subscribe(session, body)
+                elif packet_type == UNSUBSCRIBE:
+                    (mid,) = struct.unpack_from("!H", body)
+                    _, offset = _read_properties(body, 2, session.version)
+                    topics = 0
+                    while offset < len(body):
+                        topic, offset = _read_string(body, offset)
+                        session.subscriptions.discard(topic)
+                        topics += 1
+                    reply = struct.pack("!H", mid)
+                    if session.version >= MQTT_V5:
+                        reply += b"\x00" + bytes(topics)  # no properties, a success code per topic
+                    session.send(_packet(UNSUBACK, 0, reply))
+                elif packet_type == PINGREQ:
+                    session.send(_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError, ssl.SSLError):
+            pass
+        finally:
+            if session:
+                with self.lock:
+                    self.sessions.discard(session)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _handle_subscribe(self, session, body):
+        (mid,) = struct.unpack_from("!H", body)
+        _, offset = _read_properties(body, 2, session.version)
+        granted, topics = bytearray(), []
+        while offset < len(body):
+            topic, offset = _read_string(body, offset)
+            offset += 1  # requested QoS (v5: subscription options)
+            session.subscriptions.add(topic)
+            topics.append(topic)
+            granted.append(0)
+        properties = b"\x00" if session.version >= MQTT_V5 else b""
+        session.send(_packet(SUBACK, 0, struct.pack("!H", mid) + properties + bytes(granted)))
+        with self.lock:
+            retained = list(self.retained.items())
+        for topic, (payload, raw_properties) in retained:
+            if any(topic_matches(sub, topic) for sub in topics):
+                session.send(self._publish_packet(topic, payload, retain=True,
+                                                  properties=raw_properties if session.version >= MQTT_V5 else None))
+
+    def _handle_publish(self, session, flags, body):
+        qos = (flags >> 1) & 0x03
+        retain = flags & 0x01
+        topic, offset = _read_string(body, 0)
+        if qos:
+            (mid,) = struct.unpack_from("!H", body, offset)
+            offset += 2
+            session.send(_packet(PUBACK, 0, struct.pack("!H", mid)))  # v5: no reason code = success
+        raw_properties, offset = _read_properties(body, offset, session.version)
+        payload = body[offset:]
+        if retain:
+            with self.lock:
+                if payload:
+                    self.retained[topic] = (payload, raw_properties)
+                else:
+                    self.retained.pop(topic, None)
+        self.route(topic, payload, raw_properties)
+        for topic_filter, fn, delay, with_properties in self.responders:
+            if topic_matches(topic_filter, topic):
+                if with_properties:
+                    replies = fn(topic, payload, decode_properties(raw_properties)) or []
+                else:
+                    replies = fn(topic, payload) or []
+                if delay:
+                    threading.Timer(delay, self._route_all, args=(replies,)).start()
+                else:
+                    self._route_all(replies)
+
+    def _route_all(self, messages):
+        for topic, payload, *properties in messages:
+            self.route(topic, payload, encode_properties(properties[0]) if properties else b"")
+
+    @staticmethod
+    def _publish_packet(topic, payload, retain=False, properties=None):
+        """PUBLISH at QoS 0; properties is the raw v5 property block, None for 3.1.1"""
+        encoded = topic.encode()
+        body = struct.pack("!H", len(encoded)) + encoded
+        if properties is not None:
+            body += _encode_length(len(properties)) + properties
+        return _packet(PUBLISH, 1 if retain else 0, body + payload)
+
+    def route(self, topic, payload, properties=b""):
+        """Deliver a message to every matching subscriber; properties reach v5 subscribers only"""
+        packets = {}
+        with self.lock:
+            targets = [s for s in self.sessions
+                       if any(topic_matches(sub, topic) for sub in s.subscriptions)]
+            self.messages_routed += 1
+        for session in targets:
+            v5 = session.version >= MQTT_V5
+            if v5 not in packets:
+                packets[v5] = self._publish_packet(topic, payload, properties=properties if v5 else None)
+            try:
+                session.send(packets[v5])
+            except OSError:
+                pass
@@ -0,0 +1,3 @@
+"""Import-only stand-in for Pillow (see ../customtkinter)"""
+
+Image = ImageTk = ImageEnhance = None
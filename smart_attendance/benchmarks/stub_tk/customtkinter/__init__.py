@@ -0,0 +1,5 @@
+"""
+Import-only stand-in for customtkinter, for bench_startup's home rows on
+machines without a display toolkit. Nothing is drawn: gui.main_gui and
+gui.home_page only need the module to exist at import time.
+"""
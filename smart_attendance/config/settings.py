@@ -5,4 +5,12 @@ USERNAME = "smart_attednace_system"
 PASSWORD = "Smart#12345"
 
 train_path="/home/pi5/smart_attendance/core/working_dataset"
-model_path="/home/pi5/smart_attendance/core/lbph_model (4).xml"
+model_path="/home/pi5/smart_attendance/core/lbph_model (4).xml"  # or an .npz converted with python -m core.lbph_model
+journal_path="/home/pi5/smart_attendance/backend/attendance_journal.db"
+roster_path="/home/pi5/smart_attendance/backend/roster_cache.json"
+recognizer_backend="lbph"  # "embedding": a face-embedding network through cv2.dnn (core/embeddings.py); model_path is then its .npz of student vectors
+embedding_network="/home/pi5/smart_attendance/core/face_recognition_sface_2021dec.onnx"
+embedding_aligner="/home/pi5/smart_attendance/core/face_detection_yunet_2023mar.onnx"  # YuNet, aligns faces for the embedding network; "" = no alignment (less accurate)
+lbph_matcher="opencv"  # "numpy": predict with core/lbph_matcher.py, straight from an .npz model
+lbph_prototypes=0  # numpy matcher only: keep this many centroids per student instead of every photo (faster, approximate)
+profile_pipeline=False  # stage timing p50/p95/p99 (core/profiler.py); "overlay" also draws it on the camera frame
@@ -0,0 +1,269 @@
+"""
+Frame sources for the vision pipeline.
+
+A source yields Frame(image, gray, timestamp): `image` is the full-size
+colour frame used for display and high-resolution face crops, and `gray`
+is a smaller grayscale frame for detection, tracking and the motion gate.
+On the Pi both come from one capture: the main XRGB8888 stream and the Y
+plane of a YUV420 lores stream, which is a view into the lores buffer,
+so the detection path needs no colour conversion or copy. Box
+coordinates found on `gray` map to `image` by frame_scale(frame).
+
+Off the Pi the same pipeline runs from a V4L2/USB camera, a video file,
+a directory of images or a synthetic generator (see open_source), played
+back in real time or as fast as frames can be consumed.
+"""
+
+import os
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+Frame = namedtuple("Frame", "image gray timestamp")
+
+
+def frame_scale(frame):
+    """How many image pixels one gray pixel covers"""
+    return frame.image.shape[1] / frame.gray.shape[1]
+
+
+def y_plane(yuv420, size):
+    """Grayscale view of a YUV420 (I420) buffer: its first `height` rows"""
+    width, height = size
+    return yuv420[:height, :width]
+
+
+def equalize_lut(gray):
+    """cv2.equalizeHist as a lookup table, so the same curve can be applied to crops"""
+    cdf = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().cumsum()
+    first = cdf[np.flatnonzero(cdf)[0]]
+    span = max(1, cdf[-1] - first)
+    return np.clip(np.round((cdf - first) * (255.0 / span)), 0, 255).astype(np.uint8)
+
+
+def bgr_frame(bgr, lores_size=(400, 300)):
+    """Frame from a BGR image, with gray shrunk to lores_size (None = full size)"""
+    small = bgr if lores_size is None else cv2.resize(bgr, lores_size, interpolation=cv2.INTER_AREA)
+    return Frame(bgr, cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), time.monotonic())
+
+
+class Playback:
+    """Paces reads to fps in real time; fps None or 0 plays as fast as possible"""
+    def __init__(self, fps=None):
+        self.fps = fps
+        self.next_time = None
+
+    def wait(self):
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if self.next_time is not None and now < self.next_time:
+            time.sleep(self.next_time - now)
+            now = self.next_time
+        self.next_time = now + 1 / self.fps
+
+
+class FrameSource:
+    """Base class: start(), read() -> Frame or None when exhausted, stop()"""
+    def start(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class PicameraSource(FrameSource):
+    """
+    Pi camera with a main XRGB8888 stream and a YUV420 lores stream. If the
+    sensor refuses that configuration it falls back to its default preview
+    configuration and converts the main stream for `gray`.
+    """
+    def __init__(self, size=(800, 600), lores_size=(400, 300), buffer_count=2):
+        self.size = size
+        self.lores_size = lores_size
+        self.buffer_count = buffer_count
+        self.camera = None
+        self.has_lores = False
+
+    def start(self):
+        from picamera2 import Picamera2  # only on the Pi
+
+        self.camera = Picamera2()
+        try:
+            config = self.camera.create_preview_configuration(
+                main={"format": 'XRGB8888', "size": self.size},
+                lores={"format": 'YUV420', "size": self.lores_size},
+                buffer_count=self.buffer_count
+            )
+            self.camera.configure(config)
+            self.has_lores = True
+        except Exception as config_error:
+            print(f"Configuration error: {config_error}")
+            self.camera.configure(self.camera.create_preview_configuration())
+            self.has_lores = False
+        try:
+            self.camera.start()
+        except Exception:
+            self.stop()
+            raise
+
+    def read(self):
+        if not self.has_lores:
+            image = self.camera.capture_array()
+            return Frame(image, cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY), time.monotonic())
+        (image, lores), _ = self.camera.capture_arrays(["main", "lores"])
+        return Frame(image, y_plane(lores, self.lores_size), time.monotonic())
+
+    def stop(self):
+        if self.camera:
+            try:
+                self.camera.stop()
+            finally:
+                self.camera.close()
+                self.camera = None
+
+
+class VideoCaptureSource(FrameSource):
+    """
+    OpenCV VideoCapture: a V4L2/USB camera (device index or /dev/videoN) or
+    a video file. Files can be paced at their own frame rate (realtime)
+    and looped; a live camera paces itself.
+    """
+    def __init__(self, device, size=None, lores_size=(400, 300), realtime=False, loop=False):
+        self.device = device
+        self.size = size
+        self.lores_size = lores_size
+        self.realtime = realtime
+        self.loop = loop
+        self.capture = None
+        self.playback = Playback()
+
+    @property
+    def live(self):
+        return isinstance(self.device, int) or str(self.device).startswith("/dev/video")
+
+    def start(self):
+        self.capture = cv2.VideoCapture(self.device)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open video source {self.device}")
+        if self.live and self.size:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        if self.realtime and not self.live:
+            self.playback = Playback(self.capture.get(cv2.CAP_PROP_FPS) or 30)
+
+    def read(self):
+        self.playback.wait()
+        ok, bgr = self.capture.read()
+        if not ok and self.loop and not self.live:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, bgr = self.capture.read()
+        if not ok:
+            return None
+        if self.size and (bgr.shape[1], bgr.shape[0]) != tuple(self.size):
+            bgr = cv2.resize(bgr, self.size)
+        return bgr_frame(bgr, self.lores_size)
+
+    def stop(self):
+        if self.capture:
+            self.capture.release()
+            self.capture = None
+
+
+class ImageDirectorySource(FrameSource):
+    """Images of a directory in name order, at fps when realtime"""
+    EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+    def __init__(self, path, fps=30, realtime=False, loop=False, size=None, lores_size=(400, 300)):
+        self.path = path
+        self.size = size
+        self.lores_size = lores_size
+        self.loop = loop
+        self.playback = Playback(fps if realtime else None)
+        self.files = []
+        self.index = 0
+
+    def start(self):
+        self.files = sorted(os.path.join(self.path, name) for name in os.listdir(self.path)
+                            if name.lower().endswith(self.EXTENSIONS))
+        self.index = 0
+
+    def read(self):
+        while True:
+            if self.index >= len(self.files):
+                if not (self.loop and self.files):
+                    return None
+                self.index = 0
+            bgr = cv2.imread(self.files[self.index])
+            self.index += 1
+            if bgr is not None:
+                break
+        self.playback.wait()
+        if self.size and (bgr.shape[1], bgr.shape[0]) != tuple(self.size):
+            bgr = cv2.resize(bgr, self.size)
+        return bgr_frame(bgr, self.lores_size)
+
+
+class SyntheticYUVSource(FrameSource):
+    """
+    Stand-in for the Pi camera that produces the same two streams: a
+    4-channel main image and the Y plane of a YUV420 lores buffer. Frames
+    come from `frames` (BGR images, looped) or a generated moving square;
+    fps paces read() like a sensor would (None = as fast as possible) and
+    limit ends the stream after that many frames.
+    """
+    def __init__(self, frames=None, size=(800, 600), lores_size=(400, 300), fps=30, limit=None):
+        self.frames = frames
+        self.size = size
+        self.lores_size = lores_size
+        self.limit = limit
+        self.playback = Playback(fps)
+        self.index = 0
+
+    def start(self):
+        self.index = 0
+
+    def _scene(self, index):
+        width, height = self.size
+        frame = np.full((height, width, 3), 90, np.uint8)
+        x = int((width - 120) * (0.5 + 0.4 * np.sin(index / 30)))
+        cv2.rectangle(frame, (x, height // 3), (x + 120, height // 3 + 120), (200, 180, 160), -1)
+        return frame
+
+    def read(self):
+        if self.limit is not None and self.index >= self.limit:
+            return None
+        self.playback.wait()
+        if self.frames is not None:
+            bgr = self.frames[self.index % len(self.frames)]
+        else:
+            bgr = self._scene(self.index)
+        self.index += 1
+        image = cv2.cvtColor(cv2.resize(bgr, self.size), cv2.COLOR_BGR2BGRA)
+        lores = cv2.cvtColor(cv2.resize(bgr, self.lores_size, interpolation=cv2.INTER_AREA),
+                             cv2.COLOR_BGR2YUV_I420)
+        return Frame(image, y_plane(lores, self.lores_size), time.monotonic())
+
+
+def open_source(spec=None, realtime=False, loop=False, fps=30):
+    """
+    Source from a short description: None or "picamera" for the Pi camera,
+    "synthetic", a device index or /dev/videoN, an image directory, or a
+    video file. realtime paces recorded sources at their frame rate.
+    """
+    if spec is None or spec == "picamera":
+        return PicameraSource()
+    if spec == "synthetic":
+        return SyntheticYUVSource(fps=fps if realtime else None)
+    if isinstance(spec, int) or str(spec).isdigit():
+        return VideoCaptureSource(int(spec))
+    if str(spec).startswith("/dev/video"):
+        return VideoCaptureSource(spec)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps=fps, realtime=realtime, loop=loop)
+    return VideoCaptureSource(spec, realtime=realtime, loop=loop)
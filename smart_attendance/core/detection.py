@@ -0,0 +1,79 @@
+import cv2
+
+
+class FaceDetector:
+    """
+    Haar cascade face detection on an equalized grayscale frame.
+
+    With scale > 1 the cascade runs on a copy shrunk by that factor (with
+    min_size shrunk to match) and the boxes are mapped back to the full
+    frame, so callers still crop the face at full resolution. The cascade
+    cost falls roughly with the pixel count.
+    """
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(100, 100), scale=1):
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.scale = scale
+
+    def detect(self, gray):
+        """Face boxes (x, y, w, h) in full-frame coordinates, largest first"""
+        scale = self.scale
+        if scale > 1:
+            small = cv2.resize(gray, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+            min_size = (max(1, round(self.min_size[0] / scale)), max(1, round(self.min_size[1] / scale)))
+        else:
+            small, min_size = gray, self.min_size
+        faces = self.cascade.detectMultiScale(
+            small,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=min_size
+        )
+        if scale > 1:
+            height, width = gray.shape[:2]
+            faces = [_clip((round(x * scale), round(y * scale), round(w * scale), round(h * scale)), width, height)
+                     for (x, y, w, h) in faces]
+        return sorted((tuple(int(v) for v in face) for face in faces),
+                      key=lambda face: face[2] * face[3], reverse=True)
+
+
+def _clip(box, width, height):
+    x, y, w, h = box
+    x, y = max(0, x), max(0, y)
+    return x, y, min(w, width - x), min(h, height - y)
+
+
+def face_crop(image, box, scale, equalize):
+    """200x200 equalized grayscale face from the full-resolution image"""
+    x, y, w, h = (round(v * scale) for v in box)
+    face = image[y:y+h, x:x+w]
+    face = cv2.cvtColor(face, cv2.COLOR_BGRA2GRAY if face.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    # Equalize with the whole frame's curve (taken from the small gray frame), as
+    # the model was trained on crops of equalized frames
+    return cv2.resize(cv2.LUT(face, equalize), (200, 200))
+
+
+COLOR_MARGIN = 0.25  # of the box, on every side of a color_face_crop
+
+
+def color_face_crop(image, box, scale, equalize=None, margin=COLOR_MARGIN):
+    """
+    BGR face from the full-resolution image, not equalized, with `margin`
+    of the box around it on every side (padded where the box meets the
+    frame edge, so the face stays centred): the input of the embedding
+    backend, which aligns or trims it itself. `equalize` is ignored; it
+    is there to take face_crop's arguments.
+    """
+    x, y, w, h = (round(v * scale) for v in box)
+    dx, dy = round(w * margin), round(h * margin)
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = x - dx, y - dy, x + w + dx, y + h + dy
+    face = image[max(0, y0):min(height, y1), max(0, x0):min(width, x1)]
+    if face.shape[2] == 4:
+        face = cv2.cvtColor(face, cv2.COLOR_BGRA2BGR)
+    return cv2.copyMakeBorder(face, max(0, -y0), max(0, y1 - height), max(0, -x0), max(0, x1 - width),
+                              cv2.BORDER_REPLICATE)
@@ -0,0 +1,284 @@
+"""
+Face recognition with a face-embedding network run through cv2.dnn on the
+CPU, e.g. SFace (face_recognition_sface_2021dec.onnx from the OpenCV
+model zoo) or a MobileFaceNet ONNX export.
+
+The network maps a face crop to a fixed-length vector. A student is one
+vector: the normalized mean of their photos' unit embeddings. A face is
+matched against every student with one matrix-vector product of cosine
+similarities. The model file is an .npz of per-student embedding sums
+and photo counts. Enrolling new photos adds to those sums, so the rest of
+the model is not re-read or recomputed.
+
+Distances are reported as 100 * (1 - cosine similarity), so they read
+like LBPH distances: lower is closer. SFace's same-person threshold
+(cosine 0.363) becomes 64, under TrackVote's 70.
+
+The network sees colour faces the way it was trained on them: the
+recognizer crops the detected box from the colour frame with a margin
+(core.detection.color_face_crop, not equalized). With an aligner, YuNet
+(face_detection_yunet_2023mar.onnx from the same zoo, through
+cv2.FaceDetectorYN) finds five landmarks in that crop, and the face is
+warped onto the landmark template FaceRecognizerSF.alignCrop uses. Without
+one, or when YuNet finds no face, the Haar box itself is resized, which
+SFace tolerates less well.
+
+Build or update the student vectors from a dataset laid out like
+train_model.py's (one folder per student ID):
+    python -m core.embeddings --network sface.onnx --aligner yunet.onnx --dataset working_dataset --output embeddings.npz
+"""
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from core.detection import COLOR_MARGIN, color_face_crop
+
+FORMAT_VERSION = 1
+
+# Where FaceRecognizerSF.alignCrop puts the right eye, left eye, nose tip and
+# right and left mouth corners in a 112x112 face
+SFACE_LANDMARKS = np.array([[38.2946, 51.6963], [73.5318, 51.5014], [56.0252, 71.7366],
+                            [41.5493, 92.3655], [70.7299, 92.2041]], np.float32)
+
+
+class FaceAligner:
+    """Five face landmarks from OpenCV's YuNet detector (cv2.FaceDetectorYN)"""
+    def __init__(self, path, score_threshold=0.6):
+        self.path = path
+        self.detector = cv2.FaceDetectorYN.create(path, "", (320, 320), score_threshold)
+
+    def landmarks(self, image):
+        """5x2 landmarks (YuNet's order, as SFACE_LANDMARKS) of the largest face, or None"""
+        height, width = image.shape[:2]
+        self.detector.setInputSize((width, height))
+        _, faces = self.detector.detect(image)
+        if faces is None or not len(faces):
+            return None
+        face = max(faces, key=lambda f: f[2] * f[3])
+        return face[4:14].reshape(5, 2)
+
+
+def align_face(image, landmarks, size=(112, 112)):
+    """Warp a face onto the SFace landmark template (as FaceRecognizerSF.alignCrop); None if degenerate"""
+    template = SFACE_LANDMARKS * np.float32([size[0] / 112, size[1] / 112])
+    matrix, _ = cv2.estimateAffinePartial2D(np.asarray(landmarks, np.float32), template, method=cv2.LMEDS)
+    if matrix is None:
+        return None
+    return cv2.warpAffine(image, matrix, size)
+
+
+class EmbeddingNetwork:
+    """
+    A cv2.dnn face-embedding network; the defaults are SFace's
+    preprocessing. `aligner` (a FaceAligner or the path of a YuNet model)
+    aligns each face before it is embedded.
+    """
+    def __init__(self, path, config="", input_size=(112, 112), scale=1.0, mean=(0, 0, 0), swap_rb=True,
+                 aligner=None):
+        self.path = path
+        self.aligner = FaceAligner(aligner) if isinstance(aligner, str) else aligner
+        self.net = cv2.dnn.readNet(path, config)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = tuple(input_size)
+        self.scale = scale
+        self.mean = mean
+        self.swap_rb = swap_rb
+
+    def face_input(self, face, margin=COLOR_MARGIN):
+        """A color_face_crop (`margin` around the box) as the network's input image"""
+        if face.ndim == 2:
+            face = cv2.cvtColor(face, cv2.COLOR_GRAY2BGR)
+        if self.aligner is not None:
+            landmarks = self.aligner.landmarks(face)
+            aligned = align_face(face, landmarks, self.input_size) if landmarks is not None else None
+            if aligned is not None:
+                return aligned
+        height, width = face.shape[:2]
+        dy, dx = round(height * margin / (1 + 2 * margin)), round(width * margin / (1 + 2 * margin))
+        return cv2.resize(face[dy:height - dy, dx:width - dx], self.input_size)
+
+    def embed(self, faces):
+        """Unit-length embeddings (faces x dimensions) of color_face_crop faces"""
+        faces = [self.face_input(face) for face in faces]
+        blob = cv2.dnn.blobFromImages(faces, self.scale, self.input_size, self.mean, self.swap_rb, False)
+        self.net.setInput(blob)
+        vectors = self.net.forward().reshape(len(faces), -1).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingModel:
+    """Per-student sums of unit embeddings and photo counts; vectors() are the normalized means"""
+    def __init__(self, labels=(), sums=None, counts=(), network=""):
+        self.labels = np.asarray(labels, np.int32).ravel()
+        self.sums = np.zeros((0, 0), np.float32) if sums is None else np.asarray(sums, np.float32)
+        self.counts = np.asarray(counts, np.int32).ravel()
+        self.network = network  # file name of the network the vectors came from
+
+    def __len__(self):
+        return len(self.labels)
+
+    def vectors(self):
+        norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+        return self.sums / np.maximum(norms, 1e-12)
+
+    def enroll(self, label, embeddings):
+        """Add unit embeddings of one student's photos"""
+        embeddings = np.atleast_2d(np.asarray(embeddings, np.float32))
+        if not embeddings.size:
+            return
+        if not len(self.labels):
+            self.sums = np.zeros((0, embeddings.shape[1]), np.float32)
+        elif embeddings.shape[1] != self.sums.shape[1]:
+            raise ValueError(f"embeddings have {embeddings.shape[1]} dimensions, the model {self.sums.shape[1]}")
+        row = np.flatnonzero(self.labels == label)
+        if len(row):
+            self.sums[row[0]] += embeddings.sum(axis=0)
+            self.counts[row[0]] += len(embeddings)
+        else:
+            self.labels = np.append(self.labels, np.int32(label))
+            self.sums = np.vstack([self.sums, embeddings.sum(axis=0)])
+            self.counts = np.append(self.counts, np.int32(len(embeddings)))
+
+    def save(self, path):
+        """Write an .npz; replaced atomically like LBPHModel.save"""
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, version=np.array(FORMAT_VERSION), labels=self.labels, sums=self.sums,
+                     counts=self.counts, network=np.array(self.network))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if int(data["version"]) > FORMAT_VERSION:
+                raise ValueError(f"{path}: embedding format {int(data['version'])} is newer than this reader")
+            return cls(data["labels"], data["sums"], data["counts"], str(data["network"]))
+
+
+class EmbeddingRecognizer:
+    """predict(face) -> (label, distance) over one vector per student, like LBPHFaceRecognizer"""
+    def __init__(self, network, model, threshold=np.inf):
+        self.network = network
+        self.labels = model.labels
+        self.vectors = model.vectors()  # students x dimensions, unit rows
+        self.threshold = threshold
+
+    def __len__(self):
+        return len(self.labels)
+
+    crop = staticmethod(color_face_crop)  # how the pipeline and the worker pool cut faces for predict()
+
+    def predict_batch(self, faces):
+        """(label, distance) for each face, with one forward pass for all of them"""
+        if not len(faces):
+            return []
+        if not len(self.labels):
+            return [(-1, np.finfo(np.float64).max)] * len(faces)
+        similarities = self.network.embed(faces) @ self.vectors.T  # cosine, faces x students
+        best = similarities.argmax(axis=1)
+        predictions = []
+        for row, column in enumerate(best):
+            distance = 100.0 * (1.0 - float(similarities[row, column]))
+            if distance >= self.threshold:
+                predictions.append((-1, np.finfo(np.float64).max))
+            else:
+                predictions.append((int(self.labels[column]), distance))
+        return predictions
+
+    def predict(self, face):
+        return self.predict_batch([face])[0]
+
+
+_networks = {}
+
+
+def load_embedding_recognizer(path, network, config="", threshold=np.inf, aligner=None):
+    """Model loader for ModelManager and the worker pool: student vectors from `path`"""
+    key = (network, config, aligner)
+    if key not in _networks:  # the network file does not change with the student vectors
+        _networks[key] = EmbeddingNetwork(network, config, aligner=aligner)
+    return EmbeddingRecognizer(_networks[key], EmbeddingModel.load(path), threshold)
+
+
+def dataset_faces(dataset, since=0.0, detector=None):
+    """
+    (label, face, colour face) for each photo newer than `since`: the
+    200x200 equalized crop train_model.py makes for LBPH and the
+    color_face_crop of the same box for the embedding backend
+    """
+    if detector is None:
+        detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    for label_name in sorted(os.listdir(dataset)):
+        person_path = os.path.join(dataset, label_name)
+        if not label_name.isdigit() or not os.path.isdir(person_path):
+            continue
+        for image_file in sorted(os.listdir(person_path)):
+            image_path = os.path.join(person_path, image_file)
+            if os.path.getmtime(image_path) < since:
+                continue
+            color = cv2.imread(image_path)
+            if color is None:
+                continue
+            image = cv2.equalizeHist(cv2.cvtColor(color, cv2.COLOR_BGR2GRAY))
+            faces = detector.detectMultiScale(image, scaleFactor=1.1, minNeighbors=3, minSize=(40, 40),
+                                              flags=cv2.CASCADE_SCALE_IMAGE)
+            if len(faces):
+                x, y, w, h = faces[0]
+                yield (int(label_name), cv2.resize(image[y:y+h, x:x+w], (200, 200)),
+                       color_face_crop(color, (x, y, w, h), 1))
+
+
+def _enroll(model, network, batch):
+    if not batch:
+        return 0
+    embeddings = network.embed([color for _, _, color in batch])
+    labels = np.array([label for label, _, _ in batch])
+    for label in np.unique(labels):
+        model.enroll(label, embeddings[labels == label])
+    return len(batch)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll a dataset's new photos into an embedding model")
+    parser.add_argument("--network", required=True, help="face-embedding network (.onnx)")
+    parser.add_argument("--config", default="", help="network config, for formats that need one")
+    parser.add_argument("--aligner", help="YuNet face detector (.onnx) to align faces with; recommended")
+    parser.add_argument("--dataset", required=True, help="one folder of photos per student ID")
+    parser.add_argument("--output", required=True, help="student vectors (.npz), updated in place")
+    parser.add_argument("--batch", type=int, default=16, help="faces per forward pass")
+    args = parser.parse_args()
+
+    network = EmbeddingNetwork(args.network, args.config, aligner=args.aligner)
+    since = 0.0
+    if os.path.exists(args.output):
+        model = EmbeddingModel.load(args.output)
+        since = os.path.getmtime(args.output)
+        print(f"♻️ Updating {len(model)} students with photos newer than the model")
+    else:
+        model = EmbeddingModel(network=os.path.basename(args.network))
+
+    started = time.perf_counter()
+    batch, photos = [], 0
+    for item in dataset_faces(args.dataset, since):
+        batch.append(item)
+        if len(batch) == args.batch:
+            photos += _enroll(model, network, batch)
+            batch = []
+    photos += _enroll(model, network, batch)
+    if not photos:
+        print("⚠️ No new faces found.")
+        return
+    model.save(args.output)
+    print(f"✅ {photos} photos enrolled in {time.perf_counter() - started:.1f} s: "
+          f"{len(model)} students in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
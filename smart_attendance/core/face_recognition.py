@@ -1,160 +1,393 @@
-import os
 import threading
 import time
 import cv2
-from picamera2 import Picamera2
 import numpy as np
-from config.settings import train_path, model_path
-import queue
+from config.settings import model_path, recognizer_backend, lbph_matcher, lbph_prototypes, embedding_network, embedding_aligner
 import atexit
-from backend.api_client import *
-
-image_classes = os.listdir(train_path)
-sort_classes = np.sort(image_classes)
-print(sort_classes)
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from backend.rpc import get_rpc
+from backend.roster import get_roster
+from core.scan_filter import scan_filter
+from core.pipeline import LatestSlot, Stage, StageStats
+from core.detection import FaceDetector, face_crop
+from core.tracking import FaceTracks
+from core.voting import DecisionLatency, TrackVote
+from core.motion import MotionGate
+from core.camera import PicameraSource, equalize_lut, frame_scale
+from core.profiler import profiler
+from core.model_manager import ModelManager
+from core.recognizers import model_loader
+from core.workers import RecognitionPool
 
 class FaceRecognizer:
     def __init__(self):
-        self.queue = queue.Queue(maxsize=2)
-        self.event = threading.Event()
-        self.camera = None
+        self.queue = LatestSlot()  # rendered frames for the GUI, newest only
+        self.capture_slot = None
+        self.render_slot = None
+        self.stages = []
+        self.capture_stats = StageStats("capture")
+        self.max_capture_delay = 0.2
+        self.stats_interval = None  # seconds between pipeline stats prints; None = off
+        self.motion_gate = MotionGate()  # None = run detection even when nothing moves
+        self.idle_interval = 0.2  # seconds between frames while idle
+        self.idling = False
+        self.event = threading.Event()  # set while the current run goes; each start() makes a new one
+        self.source = None  # a core.camera source; the Pi camera unless start() is given one
         self.lock = threading.Lock()
         self.thread = None
         self.recognizer = None
-        self.face_cascade = None
-        self.last_label = None
-        self.last_time = time.time()
-        self.prediction_interval = 2
-        self.face_box = None
-        self.response_text = ""  # to hold check-out message from backend
-        self.last_sent_id = None  # prevent sending duplicate ID
-        self.last_response_time = 0
-        self.request_pending = False  # track if a request is in progress
-        self.response_received = True  # track if we've received a response
+        self.models = None  # ModelManager: reloads the model when the file changes
+        self.backend = recognizer_backend  # see core.recognizers
+        self.matcher = lbph_matcher  # LBPH: "numpy" predicts with core.lbph_matcher instead of OpenCV
+        self.prototypes = lbph_prototypes  # numpy matcher only: >0 = this many centroids per student
+        self.network = embedding_network  # embedding backend: the cv2.dnn network file
+        self.aligner = embedding_aligner  # embedding backend: YuNet model that aligns faces ("" = none)
+        self.detector = None
+        self.detection_scale = 2  # run the cascade on a copy this many times smaller than the main stream
+        self.face_min_size = (100, 100)  # smallest face to detect, in main-stream pixels
+        self.tracker_kind = "template"  # follow the face between detections; None = detect every frame
+        self.redetect_interval = 10
+        self.tracking = None
+        self.prediction_interval = 0.25  # seconds between votes while a face is undecided
+        self.vote_window = 5  # predictions a track votes over before it emits a student
+        self.decision_latency = DecisionLatency()
+        self.track_cooldown = 10  # seconds before a recognised face is predicted again
+        self.workers = 0  # >0: detect and recognize in this many processes (core.workers); 0 = in-process
+        self.pool = None
         atexit.register(self._cleanup)
 
     def _initialize_models(self):
         """Initialize face recognition models"""
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
-        self.recognizer.read(model_path)
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        )
+        if self.models is None:
+            self.models = ModelManager(model_path, on_swap=self._use_model, loader=self._model_loader())
+        self.recognizer = self.models.load()
+        self.models.watch()
+        self.detector = FaceDetector(scale=self.detection_scale)
+
+    def _model_loader(self):
+        """Reads the model file into something with predict(face) -> (label, distance)"""
+        return model_loader(self.backend, self.matcher, self.prototypes, self.network, aligner=self.aligner)
+
+    def preload(self):
+        """
+        Load the model and cascade ahead of start(), e.g. on a background
+        thread while the home page is shown, so the first frame does not
+        wait for them. start() waits for a preload that is still running.
+        """
+        with self.lock:
+            if not self.recognizer:
+                self._initialize_models()
+                self.detector.detect(np.zeros((300, 400), np.uint8))  # first cascade run allocates its buffers
+
+    def _use_model(self, recognizer):
+        """Swap in a reloaded model; the recognize stage picks it up at its next batch"""
+        self.recognizer = recognizer
+        if self.pool:
+            self.pool.reload_model()
+
+    def reload_model(self):
+        """Reload the model file in the background (e.g. after a student was enrolled)"""
+        if self.models:
+            self.models.reload()
 
     def _cleanup(self):
         """Clean up resources"""
         with self.lock:
-            if self.camera:
-                self.camera.stop()
-                self.camera.close()
-                self.camera = None
-            cv2.destroyAllWindows()
-
-    def _send_attendance_backend(self, student_id):
-        """Send attendance to backend and handle response"""
-        self.request_pending = True
-        self.response_received = False
+            if self.source:
+                self.source.stop()
+            try:
+                cv2.destroyAllWindows()
+            except cv2.error:
+                pass  # headless OpenCV build (benchmarks, off-Pi sources): no windows to close
+
+    def _send_attendance_backend(self, student_id, track):
+        """Send attendance to backend; the reply is shown on the face's track when it arrives"""
+        student = get_roster().lookup_student(student_id)
+        if student:
+            track.text = student.name  # optimistic, from the local roster
+        key = ("check-in", str(student_id))
         try:
-            send_student_data("check-in", student_id)
-            response = get_attendance_response("check-in", "4")
-            self.response_text = response
-            self.last_response_time = time.time()
-            self.last_sent_id = student_id
+            future = get_rpc().call("check-in", student_id)
         except Exception as e:
             print(f"Error sending attendance: {e}")
-            self.response_text = "Error sending attendance"
-        finally:
-            self.request_pending = False
-            self.response_received = True
+            track.text = "Error sending attendance"
+            scan_filter.forget(key)  # let the student's next recognition retry
+            return
+        future.add_done_callback(lambda f: self._on_attendance_response(f, track, student, key))
 
-    def _process_frame(self, frame):
-        """Process a single frame for face detection and recognition"""
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.equalizeHist(gray)
-        faces = self.face_cascade.detectMultiScale(
-            gray, 
-            scaleFactor=1.1, 
-            minNeighbors=5, 
-            minSize=(100, 100)
-        )
-        
+    def _on_attendance_response(self, future, track, student=None, key=None):
+        """Show the backend reply unless it agrees with the roster result already shown"""
+        try:
+            response = future.result()
+            if student is None or not get_roster().agrees(student, response):
+                track.text = response
+            return
+        except FutureTimeoutError:
+            print("⌛ No response received within timeout period.")
+            if student is None:
+                track.text = ""
+        except Exception as e:
+            print(f"Error sending attendance: {e}")
+            track.text = "Error sending attendance"
+        if key is not None:
+            scan_filter.forget(key)  # no confirmed reply: let the student's next recognition retry
+
+    def _detect(self, frame):
+        """Detect stage: equalize the source's grayscale frame and find (or track) every face"""
+        scale = frame_scale(frame)
+        self.detector.scale = max(1.0, self.detection_scale / scale)
+        self.detector.min_size = (round(self.face_min_size[0] / scale), round(self.face_min_size[1] / scale))
+        started = profiler.start()
+        equalize = equalize_lut(frame.gray)
+        gray = cv2.LUT(frame.gray, equalize)  # same as cv2.equalizeHist
+        profiler.stop("equalize", started)
+        if self.tracking is None:
+            self.tracking = FaceTracks(self.detector.detect, self.tracker_kind, self.redetect_interval)
+        started = profiler.start()
+        tracks = self.tracking.update(gray)
+        profiler.stop("detect/track", started)
+        return frame.image, scale, equalize, tracks
+
+    _face_crop = staticmethod(face_crop)
+
+    def _predict_batch(self, faces):
+        """(label, confidence) for each 200x200 face crop"""
+        # One model for the whole batch, even if a reload swaps it meanwhile
+        recognizer = self.recognizer
+        if hasattr(recognizer, "predict_batch"):
+            return recognizer.predict_batch(faces)
+        return [recognizer.predict(face) for face in faces]  # OpenCV's LBPH has no batch call
+
+    def _recognize(self, detected):
+        """Recognize stage: predict every face whose track is due, in one batch"""
+        image, scale, equalize, tracks = detected
         current_time = time.time()
 
-        if len(faces) > 0:
-            (x, y, w, h) = faces[0]
-            self.face_box = (x, y, w, h)
+        due = [track for track in tracks if current_time >= track.next_prediction]
+        if due:
+            started = profiler.start()
+            crop = getattr(self.recognizer, "crop", self._face_crop)  # the backend's input
+            crops = [crop(image, track.box, scale, equalize) for track in due]
+            profiler.stop("crop", started)
+            started = profiler.start()
+            predictions = self._predict_batch(crops)
+            profiler.stop("predict", started)
+            self._vote(due, predictions, current_time)
+        return self._snapshot(image, scale, tracks)
 
-            if (current_time - self.last_time > self.prediction_interval and 
-                not self.request_pending and 
-                self.response_received):
+    def _recognize_pooled(self, result):
+        """Recognize stage with worker processes: their boxes and predictions arrive in frame order"""
+        frame, boxes, predictions = result
+        tracks = self.tracking.update(boxes)
+        current_time = time.time()
+
+        due = [track for track in tracks if current_time >= track.next_prediction]
+        if due:
+            by_box = dict(zip(boxes, predictions))
+            self._vote(due, [by_box[track.box] for track in due], current_time)
+        return self._snapshot(frame.image, frame_scale(frame), tracks)
+
+    def _vote(self, due, predictions, current_time):
+        """Add each due track's prediction to its votes; publish the tracks that decided"""
+        for track, (label, confidence) in zip(due, predictions):
+            if track.votes is None:
+                track.votes = TrackVote(self.vote_window)
+            decided = track.votes.add(label, confidence)
+            if decided is not None:
+                frames, seconds = track.votes.latency()
+                self.decision_latency.record(frames, seconds)
+                track.votes.reset()
+                track.label = f"ID: {decided} ({confidence:.0f})"
+                track.identified = True
+                print(f"Track {track.id} ID: {decided} ({confidence:.0f}) after {frames} votes, {seconds * 1000:.0f} ms")
                 
-                face = gray[y:y+h, x:x+w]
-                face_resized = cv2.resize(face, (200, 200))
-
-                label, confidence = self.recognizer.predict(face_resized)
-                if confidence < 70:
-                    self.last_label = f"ID: {label} ({confidence:.0f})"
-                    print(f"ID: {label} ({confidence:.0f})")
-                    
-                    # Only send if we're not waiting for a response and it's a new ID or enough time has passed
-                    if (self.last_sent_id != label or 
-                        (current_time - self.last_response_time) > 5):
-                        threading.Thread(
-                            target=self._send_attendance_backend, 
-                            args=(label,), 
-                            daemon=True
-                        ).start()
-                else:
-                    self.last_label = "Unknown"
-                    print(f" {label} ({confidence:.0f})")
-                self.last_time = current_time
+                # Only send if this student is not in their cooldown; requests are
+                # correlated, so several can be in flight at once
+                if scan_filter.should_forward(("check-in", str(decided))):
+                    self._send_attendance_backend(decided, track)
+                track.next_prediction = current_time + self.track_cooldown
+            else:
+                # Still collecting evidence for this face
+                track.label = f"{label}? ({confidence:.0f})" if confidence < 70 else "Unknown"
+                track.identified = False
+                track.next_prediction = current_time + self.prediction_interval
+
+    @staticmethod
+    def _snapshot(image, scale, tracks):
+        """Boxes and labels for the render stage; the tracks keep moving on the detect thread"""
+        return image, [(tuple(round(v * scale) for v in track.box), track.identified, track.text or track.label)
+                       for track in tracks]
 
-        if self.face_box:
-            (x, y, w, h) = self.face_box
-            color = (0, 255, 0) if "ID" in (self.last_label or "") else (0, 0, 255)
+    def _render(self, recognized):
+        """Render stage: draw every tracked face with its own label"""
+        frame, faces = recognized
+        started = profiler.start()
+        for (x, y, w, h), identified, text in faces:
+            color = (0, 255, 0) if identified else (0, 0, 255)
             cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-            if self.response_text:
-                cv2.putText(frame, self.response_text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+            if text:
+                cv2.putText(frame, text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+        profiler.stop("draw", started)
         
-        return frame
+        return profiler.overlay(frame)
+
+    def _process_frame(self, frame):
+        """Process a single frame for face detection and recognition (all stages inline)"""
+        return self._render(self._recognize(self._detect(frame)))
+
+    def _build_stages(self):
+        detect_slot = LatestSlot()
+        recognize_slot = LatestSlot()
+        render_slot = LatestSlot()
+        self.capture_slot = detect_slot
+        self.render_slot = render_slot
+        if self.motion_gate:
+            self.motion_gate.reset()
+        self.detector.scale = self.detection_scale
+        self.tracking = None  # fresh tracks (and IDs) for every run
+        if self.workers:
+            # Worker processes detect and predict every frame; here their boxes
+            # are only matched to tracks and voted on. A fresh pool per run,
+            # closed when the run ends, so no result of an earlier session
+            # can still arrive in this one
+            self.pool = RecognitionPool(self.workers, model_path, self.detection_scale, self.face_min_size,
+                                        loader=self._model_loader())
+            self.tracking = FaceTracks(lambda boxes: boxes, tracker=None)
+            self.stages = [
+                Stage("detect", self.pool.submit, detect_slot, None, profiler),
+                Stage("recognize", self._recognize_pooled, self.pool.output, render_slot, profiler),
+                Stage("render", self._render, render_slot, self.queue, profiler),
+            ]
+            return
+        self.stages = [
+            Stage("detect", self._detect, detect_slot, recognize_slot, profiler),
+            Stage("recognize", self._recognize, recognize_slot, render_slot, profiler),
+            Stage("render", self._render, render_slot, self.queue, profiler),
+        ]
+
+    def _still(self, frame):
+        """
+        True while nothing has moved for a while and no face is being
+        tracked; the first moving frame goes straight to detection.
+        """
+        if not self.motion_gate:
+            return False
+        self.motion_gate.moving(frame.gray)
+        idle = self.motion_gate.idle() and not (self.tracking and self.tracking.visible())
+        if idle != self.idling:
+            print("💤 Camera idle, nothing moving" if idle else "👀 Motion, detection resumed")
+            self.idling = idle
+        return idle
 
-    def _run(self):
-        """Main camera capture and processing loop"""
+    def _capture_delay(self):
+        """
+        How long capture should idle after a frame: frames taken faster than
+        the slowest downstream stage can handle would only be dropped.
+        """
+        bottleneck = max(stage.stats.cost for stage in self.stages)
+        if self.pool and self.workers:
+            bottleneck = max(bottleneck, self.pool.bottleneck())
+        return min(self.max_capture_delay, max(0.0, bottleneck - self.capture_stats.cost))
+
+    def stats(self):
+        """Per-stage FPS, smoothed cost (ms), input queue depth and drops"""
+        stats = {"capture": self.capture_stats.snapshot()}
+        for stage in self.stages:
+            stats[stage.name] = stage.snapshot()
+        stats["output"] = {"queue": self.queue.qsize(), "dropped": self.queue.dropped}
+        stats["decisions"] = self.decision_latency.snapshot()
+        if self.motion_gate:
+            stats["motion"] = dict(self.motion_gate.counters, idle=self.idling)
+        if self.tracking:
+            stats["tracking"] = dict(self.tracking.counters, visible=len(self.tracking.visible()))
+        if self.models:
+            stats["model"] = self.models.stats()
+        if self.pool and self.workers:
+            stats["workers"] = self.pool.snapshot()
+        return stats
+
+    def _log_stats(self):
+        parts = []
+        for name, stage in self.stats().items():
+            part = name
+            if name == "decisions":
+                part = f"{stage['decisions']} decided in {stage['avg_frames']:.1f} votes/{stage['avg_ms']:.0f}ms"
+            if name == "motion":
+                part = f"{'idle' if stage['idle'] else 'active'}, {stage['wakeups']} wakeups"
+            if name == "tracking":
+                part = f"cascade on {stage['detections']}/{stage['frames']} frames, {stage['visible']} faces"
+            if name == "model":
+                part = f"model {stage['swaps']} reloads ({stage['load_ms']:.0f}ms last)"
+            if "fps" in stage:
+                part += f" {stage['fps']:.1f}fps/{stage['ms']:.1f}ms"
+            if "queue" in stage:
+                part += f" q{stage['queue']} d{stage['dropped']}"
+            parts.append(part)
+        print("📊 Pipeline: " + " | ".join(parts))
+
+    def _run(self, running):
+        """
+        Capture loop; detection, recognition and rendering run on their own
+        stages. `running` is this run's event: a run that stop() left still
+        winding down only ever clears its own, never the next session's.
+        """
+        stages, pool = [], None
         try:
             with self.lock:
                 if not self.recognizer:
                     self._initialize_models()
                 
-                self.camera = Picamera2()
-                config = self.camera.create_preview_configuration(
-                    main={"format": 'XRGB8888', "size": (800, 600)},
-                    buffer_count=2
-                )
-                self.camera.configure(config)
-                self.camera.start()
-                frame_counter = 0
-            while self.event.is_set():
-                frame = self.camera.capture_array()
-                frame_counter += 1
-                if frame_counter % 3 != 0:  # Process every 3rd frame only
-                    continue
-                processed_frame = self._process_frame(frame)
-                
-                if not self.queue.full():
-                    self.queue.put(processed_frame)
-                
-                time.sleep(0.08)  # ~50 FPS
+                self.source = self.source or PicameraSource()
+                self.source.start()
+                self._build_stages()
+                self.capture_stats = StageStats("capture")
+                stages = self.stages
+                pool = self.pool if self.workers else None
+                for stage in stages:
+                    stage.start(running)
+            last_log = time.monotonic()
+            while running.is_set():
+                started = time.perf_counter()
+                frame = self.source.read()
+                if frame is None:
+                    break  # a recorded source ran out
+                self.capture_stats.record(started)
+                if profiler.enabled:
+                    profiler.add("capture", time.perf_counter() - started)
+
+                if self._still(frame):
+                    # Empty hallway: skip detection and just keep the preview alive
+                    self.render_slot.put((frame.image, []))
+                    delay = self.idle_interval
+                else:
+                    self.capture_slot.put(frame)  # drops the previous frame if detection is busy
+                    delay = self._capture_delay()
+
+                if self.stats_interval and time.monotonic() - last_log > self.stats_interval:
+                    self._log_stats()
+                    last_log = time.monotonic()
+                if delay:
+                    time.sleep(delay)
 
         except Exception as e:
             print(f"Camera error: {e}")
         finally:
-            self._cleanup()
+            running.clear()
+            for stage in stages:
+                stage.join(timeout=0.5)
+            if pool:
+                pool.close()  # stops its workers and frees their shared memory
+            if running is self.event:
+                self._cleanup()  # otherwise stop() already cleaned up and a new run owns the source
 
-    def start(self):
-        """Start face recognition"""
+    def start(self, source=None):
+        """Start face recognition, on the Pi camera unless another core.camera source is given"""
         if not self.event.is_set():
+            if source is not None:
+                self.source = source
+            self.event = threading.Event()
             self.event.set()
-            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread = threading.Thread(target=self._run, args=(self.event,), daemon=True)
             self.thread.start()
 
     def stop(self):
@@ -163,8 +396,7 @@ class FaceRecognizer:
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=0.5)
         self._cleanup()
-        with self.queue.mutex:
-            self.queue.queue.clear()
+        self.queue.clear()
 
 # Global instance
 face_recognizer = FaceRecognizer()
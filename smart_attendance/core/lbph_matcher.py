@@ -0,0 +1,156 @@
+"""
+LBPH prediction in NumPy, served straight from an LBPHModel's arrays.
+
+OpenCV's LBPHFaceRecognizer.predict computes the face's LBP histogram and
+then compares it with every training histogram in turn (chi-square,
+HISTCMP_CHISQR_ALT). LBPHMatcher computes the same histogram, bit for
+bit, and scores the whole gallery with array operations, using
+
+    2 * sum((g - q)^2 / (g + q)) = 2 * (sum(g) + sum(q) - 4 * sum(g * q / (g + q)))
+
+so only the bins where the query is non-zero are read (about half of
+them for a face), and the last sum is a matrix-vector product per chunk
+of those bins. The gallery is kept bins x samples in the model's
+whole-count encoding (uint8, a quarter of OpenCV's float32).
+
+prototypes=k reduces each student to at most k k-means centroids of their
+photos' histograms, so the gallery has k rows per student instead of one
+per photo. Faster, but no longer identical to OpenCV.
+"""
+
+import math
+
+import numpy as np
+
+from core.lbph_model import LBPHModel
+
+
+def lbp_histogram(face, radius=1, neighbors=8, grid_x=8, grid_y=8):
+    """OpenCV's LBPH spatial histogram of a grayscale face (same float32 values)"""
+    src = np.asarray(face, np.float32)
+    height, width = src.shape[0] - 2 * radius, src.shape[1] - 2 * radius
+    center = src[radius:radius + height, radius:radius + width]
+    codes = np.zeros((height, width), np.int32)
+    epsilon = np.finfo(np.float32).eps
+    one = np.float32(1)
+    for n in range(neighbors):
+        # Sample point and bilinear weights, rounded as OpenCV's elbp does
+        x = np.float32(radius * math.cos(2.0 * math.pi * n / neighbors))
+        y = np.float32(-radius * math.sin(2.0 * math.pi * n / neighbors))
+        fx, fy, cx, cy = math.floor(x), math.floor(y), math.ceil(x), math.ceil(y)
+        tx, ty = x - np.float32(fx), y - np.float32(fy)
+        w1, w2, w3, w4 = (one - tx) * (one - ty), tx * (one - ty), (one - tx) * ty, tx * ty
+
+        def shifted(dy, dx):
+            return src[radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        codes += ((t > center) | (np.abs(t - center) < epsilon)).astype(np.int32) << n
+
+    cell_w, cell_h = width // grid_x, height // grid_y
+    patterns = 1 << neighbors
+    cells = (codes[:cell_h * grid_y, :cell_w * grid_x]
+             .reshape(grid_y, cell_h, grid_x, cell_w).transpose(0, 2, 1, 3).reshape(grid_y * grid_x, -1))
+    bins = cells + np.arange(grid_y * grid_x)[:, None] * patterns
+    counts = np.bincount(bins.ravel(), minlength=grid_y * grid_x * patterns)
+    return counts.astype(np.float32) * np.float32(1.0 / (cell_w * cell_h))
+
+
+def chi_square(histograms, query):
+    """OpenCV's HISTCMP_CHISQR_ALT between each row of `histograms` and `query`, densely"""
+    histograms = np.asarray(histograms, np.float32)
+    total = histograms + query
+    terms = np.divide((histograms - query) ** 2, total, out=np.zeros_like(total), where=total > 0)
+    return 2 * terms.sum(axis=-1, dtype=np.float64)
+
+
+def _prototypes(histograms, labels, k, iterations=10):
+    """(centroids, labels): at most k chi-square k-means centroids per label"""
+    centroids, centroid_labels = [], []
+    for label in np.unique(labels):
+        rows = np.asarray(histograms[labels == label], np.float32)
+        if len(rows) <= k:
+            centers = rows
+        else:
+            centers = rows[np.linspace(0, len(rows) - 1, k).round().astype(int)]  # spread over the photos
+            for _ in range(iterations):
+                nearest = np.stack([chi_square(rows, center) for center in centers]).argmin(axis=0)
+                moved = np.stack([rows[nearest == c].mean(axis=0) if (nearest == c).any() else centers[c]
+                                  for c in range(k)])
+                if np.array_equal(moved, centers):
+                    break
+                centers = moved
+        centroids.append(centers)
+        centroid_labels += [label] * len(centers)
+    return np.vstack(centroids), np.array(centroid_labels, np.int32)
+
+
+class LBPHMatcher:
+    """Drop-in for LBPHFaceRecognizer.predict() over an LBPHModel"""
+    def __init__(self, model, prototypes=0, chunk=256):
+        self.radius, self.neighbors = model.radius, model.neighbors
+        self.grid_x, self.grid_y = model.grid_x, model.grid_y
+        self.threshold = model.threshold
+        self.prototypes = prototypes
+        self.chunk = chunk  # gallery rows (bins) per array operation
+        if prototypes:
+            histograms, self.labels = _prototypes(model.histograms(), model.labels, prototypes)
+            gallery, self.scale = histograms, np.float32(1)
+        else:
+            self.labels = model.labels
+            if model.quantization != "counts":
+                try:
+                    model = model.quantized("counts")
+                except ValueError:
+                    pass  # lossy float16/uint8 histograms: match on floats
+            if model.quantization == "counts":
+                gallery, self.scale = model.stored, model.scales[0]
+            else:
+                gallery, self.scale = model.histograms(), np.float32(1)
+        self.gallery = np.ascontiguousarray(np.asarray(gallery).T)  # bins x samples
+        self.row_sums = self.gallery.sum(axis=0, dtype=np.float64) * self.scale
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def load(cls, path, prototypes=0):
+        """Matcher for an .npz written by LBPHModel or a model saved by OpenCV"""
+        model = LBPHModel.load(path) if path.endswith(".npz") else LBPHModel.read_xml(path)
+        return cls(model, prototypes)
+
+    def histogram(self, face):
+        return lbp_histogram(face, self.radius, self.neighbors, self.grid_x, self.grid_y)
+
+    def distances(self, histogram):
+        """Chi-square distance from one query histogram to every gallery row"""
+        bins = np.flatnonzero(histogram)
+        query = histogram[bins] / self.scale  # in the gallery's units
+        if self.gallery.dtype != np.float32:
+            query = np.round(query)
+        query = query.astype(np.float32)
+        # sum(g * q / (g + q)) = sum(q) - q^2 . 1 / (g + q): one matrix-vector product per chunk
+        inverse = np.zeros(self.gallery.shape[1])
+        for start in range(0, len(bins), self.chunk):
+            q = query[start:start + self.chunk]
+            rows = np.add(self.gallery[bins[start:start + self.chunk]], q[:, None], dtype=np.float32)
+            np.reciprocal(rows, out=rows)
+            inverse += (q * q) @ rows
+        shared = query.sum(dtype=np.float64) - inverse
+        distances = 2 * (self.row_sums + histogram.sum(dtype=np.float64) - 4 * float(self.scale) * shared)
+        return np.maximum(distances, 0)  # rounding can take an exact match just under zero
+
+    def predict(self, face):
+        """(label, distance) as LBPHFaceRecognizer.predict: (-1, DBL_MAX) if nothing is under the threshold"""
+        if not len(self.labels):
+            return -1, np.finfo(np.float64).max
+        distances = self.distances(self.histogram(face))
+        best = int(distances.argmin())
+        if distances[best] >= self.threshold:
+            return -1, np.finfo(np.float64).max
+        return int(self.labels[best]), float(distances[best])
+
+
+def load_matcher(path, prototypes=0):
+    """Model loader for ModelManager and the worker pool (see load_recognizer)"""
+    return LBPHMatcher.load(path, prototypes)
@@ -0,0 +1,206 @@
+"""
+Compact binary container for LBPH models.
+
+OpenCV saves an LBPH model as XML text, one float per histogram bin
+(16384 per training photo with the default 8x8 grid), so the file runs
+to megabytes per student and takes seconds to parse. LBPHModel keeps the
+same histograms, labels and parameters in an uncompressed .npz whose
+histogram matrix is memory-mapped on load:
+
+    float32  as stored by OpenCV
+    float16  half the size, lossy
+    counts   OpenCV's histograms are bin counts divided by the cell's pixel
+             count, so they are stored as whole counts (uint8, or uint16 if
+             a bin exceeds 255) and one scale: lossless (default)
+    uint8    each histogram scaled to 0..255 by its own maximum, lossy
+
+A model loads back as arrays for a custom matcher (histograms()) or as an
+OpenCV recognizer (to_recognizer(), through a base64 FileStorage file,
+which OpenCV parses about twice as fast as its XML text).
+
+Convert a model trained by train_model.py:
+    python -m core.lbph_model lbph_model.xml lbph_model.npz
+"""
+
+import argparse
+import os
+import tempfile
+import zipfile
+
+import cv2
+import numpy as np
+
+QUANTIZATIONS = ("float32", "float16", "counts", "uint8")
+FORMAT_VERSION = 1
+
+
+def _mmap_member(path, name):
+    """Memory-map an array stored uncompressed in an .npz (np.load would read it whole)"""
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(name + ".npy")
+        if info.compress_type != zipfile.ZIP_STORED:
+            return None
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        name_length = int.from_bytes(local_header[26:28], "little")
+        extra_length = int.from_bytes(local_header[28:30], "little")
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                       else np.lib.format.read_array_header_2_0)
+        shape, fortran_order, dtype = read_header(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+class LBPHModel:
+    """Histograms (one row per training photo), labels and parameters of an LBPH model"""
+    def __init__(self, histograms, labels, radius=1, neighbors=8, grid_x=8, grid_y=8, threshold=np.inf,
+                 quantization="float32", scales=None):
+        self.stored = histograms  # as stored, possibly quantized
+        self.labels = np.asarray(labels, np.int32).ravel()
+        self.radius = int(radius)
+        self.neighbors = int(neighbors)
+        self.grid_x = int(grid_x)
+        self.grid_y = int(grid_y)
+        self.threshold = float(threshold)
+        self.quantization = quantization
+        self.scales = scales  # dequantization: one scale (counts) or one per row (uint8)
+
+    def __len__(self):
+        return len(self.labels)
+
+    @classmethod
+    def from_recognizer(cls, recognizer):
+        histograms = recognizer.getHistograms()
+        histograms = np.vstack(histograms) if len(histograms) else np.zeros((0, 0), np.float32)
+        return cls(histograms.astype(np.float32, copy=False), recognizer.getLabels(),
+                   recognizer.getRadius(), recognizer.getNeighbors(), recognizer.getGridX(),
+                   recognizer.getGridY(), recognizer.getThreshold())
+
+    @classmethod
+    def read_xml(cls, path):
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(path)
+        return cls.from_recognizer(recognizer)
+
+    def histograms(self, dtype=np.float32):
+        """Dequantized histograms as one (samples x bins) matrix"""
+        stored = self.stored
+        if self.quantization in ("float32", "float16"):
+            return np.asarray(stored, dtype=dtype)
+        if self.quantization == "counts":
+            return (np.asarray(stored, np.float32) * self.scales[0]).astype(dtype, copy=False)
+        return (np.asarray(stored, np.float32) * self.scales[:, None]).astype(dtype, copy=False)
+
+    def quantized(self, quantization):
+        """Copy of this model stored with another quantization"""
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+        histograms = self.histograms()
+        scales = None
+        if quantization == "float32":
+            stored = histograms
+        elif quantization == "float16":
+            stored = histograms.astype(np.float16)
+        elif quantization == "counts":
+            positive = histograms[histograms > 0]
+            scale = np.float32(positive.min()) if positive.size else np.float32(1)
+            counts = np.round(histograms / scale)
+            if not np.array_equal(counts.astype(np.float32) * scale, histograms):
+                raise ValueError("histograms are not whole bin counts; use float16 or uint8")
+            stored = counts.astype(np.uint8 if counts.max(initial=0) <= 255 else np.uint16)
+            scales = np.array([scale], np.float32)
+        else:
+            row_max = histograms.max(axis=1, initial=0)
+            scales = np.where(row_max > 0, row_max / 255, 1).astype(np.float32)
+            stored = np.round(histograms / scales[:, None]).astype(np.uint8)
+        return LBPHModel(stored, self.labels, self.radius, self.neighbors, self.grid_x, self.grid_y,
+                         self.threshold, quantization, scales)
+
+    def save(self, path, quantization="counts"):
+        """Write an uncompressed .npz (so the histograms can be memory-mapped)"""
+        model = self if quantization is None or quantization == self.quantization else self.quantized(quantization)
+        params = np.array([model.radius, model.neighbors, model.grid_x, model.grid_y], np.int32)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, version=np.array(FORMAT_VERSION), quantization=np.array(model.quantization),
+                     histograms=model.stored, labels=model.labels, params=params,
+                     threshold=np.array(model.threshold),
+                     scales=model.scales if model.scales is not None else np.zeros(0, np.float32))
+        os.replace(temp_path, path)  # readers (the model watcher) never see a partial file
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Model from an .npz written by save(); the histograms stay on disk if mmap"""
+        with np.load(path) as data:
+            if int(data["version"]) > FORMAT_VERSION:
+                raise ValueError(f"{path}: model format {int(data['version'])} is newer than this reader")
+            quantization = str(data["quantization"])
+            labels = data["labels"]
+            radius, neighbors, grid_x, grid_y = (int(v) for v in data["params"])
+            threshold = float(data["threshold"])
+            scales = data["scales"] if data["scales"].size else None
+            histograms = _mmap_member(path, "histograms") if mmap else None
+            if histograms is None:
+                histograms = data["histograms"]
+        return cls(histograms, labels, radius, neighbors, grid_x, grid_y, threshold, quantization, scales)
+
+    def write_opencv(self, path, base64=True):
+        """Save in OpenCV's own format (.xml/.yml), readable by recognizer.read()"""
+        flags = cv2.FILE_STORAGE_WRITE | (cv2.FILE_STORAGE_BASE64 if base64 else 0)
+        storage = cv2.FileStorage(path, flags)
+        storage.startWriteStruct("opencv_lbphfaces", cv2.FILE_NODE_MAP)
+        storage.write("threshold", self.threshold)
+        storage.write("radius", self.radius)
+        storage.write("neighbors", self.neighbors)
+        storage.write("grid_x", self.grid_x)
+        storage.write("grid_y", self.grid_y)
+        storage.startWriteStruct("histograms", cv2.FILE_NODE_SEQ)
+        for histogram in self.histograms():
+            storage.write("", histogram.reshape(1, -1))
+        storage.endWriteStruct()
+        storage.write("labels", self.labels.reshape(-1, 1))
+        storage.startWriteStruct("labelsInfo", cv2.FILE_NODE_SEQ)
+        storage.endWriteStruct()
+        storage.endWriteStruct()
+        storage.release()
+
+    def to_recognizer(self):
+        """An OpenCV LBPHFaceRecognizer holding these histograms"""
+        handle, path = tempfile.mkstemp(suffix=".yml")
+        os.close(handle)
+        try:
+            self.write_opencv(path)
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.read(path)
+            return recognizer
+        finally:
+            os.remove(path)
+
+def load_recognizer(path):
+    """OpenCV LBPH recognizer from an XML/YAML model or an .npz written by LBPHModel"""
+    if path.endswith(".npz"):
+        return LBPHModel.load(path).to_recognizer()
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(path)
+    return recognizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an OpenCV LBPH model to the binary .npz format")
+    parser.add_argument("source", help="model saved by OpenCV (.xml/.yml)")
+    parser.add_argument("target", help=".npz to write")
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="counts")
+    args = parser.parse_args()
+
+    model = LBPHModel.read_xml(args.source)
+    model.save(args.target, args.quantization)
+    print(f"✅ {len(model)} histograms: {os.path.getsize(args.source) / 1e6:.1f} MB -> "
+          f"{os.path.getsize(args.target) / 1e6:.1f} MB ({args.quantization})")
+
+
+if __name__ == "__main__":
+    main()
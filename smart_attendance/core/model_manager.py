@@ -0,0 +1,117 @@
+"""
+Hot-swappable recognition model.
+
+ModelManager owns the recognition model file (read by one of the loaders
+of core.recognizers): it loads it once, then reloads it on a background
+thread when the file changes on disk (polled with os.stat) or when
+reload() is called, e.g. on a "model-updated" control message. The new
+recognizer is built completely before it is handed to on_swap, so the
+camera keeps predicting with the old one until then and never waits for
+a load. A load that fails keeps the old model.
+
+A file counts as changed once its size and mtime differ from the loaded
+copy and have stayed the same for one poll, so a model that is still
+being written is not picked up half way.
+"""
+
+import os
+import threading
+import time
+
+from core.lbph_model import load_recognizer
+
+
+class ModelManager:
+    def __init__(self, path, on_swap=None, loader=load_recognizer, poll_interval=2.0, nice=10):
+        self.path = path
+        self.on_swap = on_swap  # called with each newly loaded model (on the loading thread)
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.nice = nice  # niceness of the reload thread (Linux)
+        self.model = None
+        self.signature = None  # (mtime_ns, size) of the file the model was read from
+        self.lock = threading.Lock()
+        self.loading = False
+        self.pending = False  # another reload was asked for while loading
+        self.stop_event = threading.Event()
+        self.watcher = None
+        self.counters = {"loads": 0, "swaps": 0, "failures": 0}
+        self.last_load_seconds = 0.0
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        """(model, signature) read from path; raises on failure"""
+        signature = self._stat()
+        started = time.perf_counter()
+        model = self.loader(self.path)
+        self.last_load_seconds = time.perf_counter() - started
+        self.counters["loads"] += 1
+        return model, signature
+
+    def load(self):
+        """Load synchronously (first use) and return the model"""
+        self.model, self.signature = self._load()
+        return self.model
+
+    def reload(self):
+        """Load the file again on a background thread and swap it in when done"""
+        with self.lock:
+            if self.loading:
+                self.pending = True
+                return
+            self.loading = True
+        threading.Thread(target=self._reload_loop, name="model-reload", daemon=True).start()
+
+    def _reload_loop(self):
+        # Parsing a large model is seconds of CPU (OpenCV releases the GIL for it);
+        # run it at a lower priority so camera threads sharing its core go first
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.nice)
+        except (AttributeError, OSError):
+            pass  # not Linux, or not allowed
+        while True:
+            try:
+                model, signature = self._load()
+                self.model, self.signature = model, signature
+                self.counters["swaps"] += 1
+                print(f"🔄 Recognition model reloaded in {self.last_load_seconds:.2f} s")
+                if self.on_swap:
+                    self.on_swap(model)
+            except Exception as e:
+                self.counters["failures"] += 1
+                print(f"❌ Model reload failed, keeping the current model: {e}")
+            with self.lock:
+                if not self.pending:
+                    self.loading = False
+                    return
+                self.pending = False
+
+    def watch(self):
+        """Start polling the model file for changes (once)"""
+        if self.watcher and self.watcher.is_alive():
+            return
+        self.stop_event.clear()
+        self.watcher = threading.Thread(target=self._watch_loop, name="model-watch", daemon=True)
+        self.watcher.start()
+
+    def _watch_loop(self):
+        seen = requested = self.signature
+        while not self.stop_event.wait(self.poll_interval):
+            signature = self._stat()
+            # Changed since the last load, and settled since the last poll
+            if signature is not None and signature == seen and signature not in (self.signature, requested):
+                requested = signature
+                self.reload()
+            seen = signature
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return dict(self.counters, load_ms=round(self.last_load_seconds * 1000, 1))
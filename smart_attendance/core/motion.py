@@ -0,0 +1,67 @@
+"""
+Motion gate for the check-in camera: tells the pipeline when the hallway
+has been still long enough to stop running detection.
+
+Each frame is shrunk to a thumbnail (80x60 by default), blurred and
+compared against a running-average background. A frame moves when more
+than min_changed of the thumbnail pixels differ from the background by
+more than pixel_threshold grey levels. The gate goes idle after
+idle_after seconds without motion and wakes on the first frame that
+moves.
+"""
+
+import time
+
+import cv2
+
+
+class MotionGate:
+    def __init__(self, size=(80, 60), pixel_threshold=18, min_changed=0.004, idle_after=5.0,
+                 learning_rate=0.05):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.idle_after = idle_after
+        self.learning_rate = learning_rate
+        self.background = None
+        self.last_motion = time.monotonic()
+        self.counters = {"frames": 0, "moving": 0, "wakeups": 0}
+        self.was_idle = False
+
+    def reset(self):
+        self.background = None
+        self.last_motion = time.monotonic()
+        self.was_idle = False
+
+    def _thumbnail(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0).astype("float32")
+
+    def moving(self, frame, now=None):
+        """Feed a frame (BGR/BGRA or gray); True if it differs from the background"""
+        now = time.monotonic() if now is None else now
+        thumbnail = self._thumbnail(frame)
+        self.counters["frames"] += 1
+        if self.background is None:
+            self.background = thumbnail
+            self.last_motion = now
+            return True
+        diff = cv2.absdiff(thumbnail, self.background)
+        changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 1, cv2.THRESH_BINARY)[1])
+        cv2.accumulateWeighted(thumbnail, self.background, self.learning_rate)
+        moved = changed > self.min_changed * thumbnail.size
+        if moved:
+            self.counters["moving"] += 1
+            self.last_motion = now
+        return moved
+
+    def idle(self, now=None):
+        """True once nothing has moved for idle_after seconds"""
+        now = time.monotonic() if now is None else now
+        idle = now - self.last_motion > self.idle_after
+        if self.was_idle and not idle:
+            self.counters["wakeups"] += 1
+        self.was_idle = idle
+        return idle
@@ -0,0 +1,154 @@
+"""
+Building blocks for the staged camera pipeline.
+
+Stages run on their own threads and are joined by LatestSlot hand-offs
+that never block the producer: a full slot drops its oldest item, so a
+slow stage always works on the newest frame and a fast one never waits
+for it. Every stage keeps a StageStats with its rolling FPS and smoothed
+per-item cost, which is what the capture loop paces itself by.
+
+Slots remember when each item was put, so a stage can report how long
+its input waited (the hand-off) to a core.profiler.Profiler.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+
+class LatestSlot:
+    """
+    Bounded latest-value hand-off between two stages (drop-oldest).
+
+    Also answers the queue.Queue calls the GUI already makes on
+    face_recognizer.queue (empty, get, get_nowait, full, qsize).
+    """
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.puts = 0
+        self.dropped = 0
+        self.waited = 0.0  # seconds the last item taken sat in the slot
+
+    def put(self, item):
+        """Store item, dropping the oldest one if the slot is full; never blocks"""
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append((time.perf_counter(), item))
+            self.puts += 1
+            self.cond.notify()
+
+    def get(self, block=True, timeout=None):
+        with self.cond:
+            if block and not self.items:
+                self.cond.wait_for(lambda: self.items, timeout)
+            if not self.items:
+                raise queue.Empty
+            put_at, item = self.items.popleft()
+            self.waited = time.perf_counter() - put_at
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def empty(self):
+        return not self.items
+
+    def full(self):
+        return len(self.items) >= self.maxsize
+
+    def qsize(self):
+        return len(self.items)
+
+    def clear(self):
+        with self.cond:
+            self.items.clear()
+
+
+class StageStats:
+    """Items handled, rolling FPS and smoothed per-item cost of one stage"""
+    def __init__(self, name, window=2.0, alpha=0.2):
+        self.name = name
+        self.window = window
+        self.alpha = alpha
+        self.count = 0
+        self.cost = 0.0  # exponentially smoothed seconds per item
+        self.stamps = deque()
+        self.started = time.perf_counter()
+
+    def record(self, started, finished=None):
+        finished = time.perf_counter() if finished is None else finished
+        elapsed = finished - started
+        self.cost = elapsed if self.count == 0 else self.cost + self.alpha * (elapsed - self.cost)
+        self.count += 1
+        self.stamps.append(finished)
+        self._prune(finished)
+
+    def _prune(self, now):
+        stamps = self.stamps
+        while stamps and now - stamps[0] > self.window:
+            stamps.popleft()
+
+    def fps(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self._prune(now)
+        span = min(self.window, now - self.started)
+        return len(self.stamps) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        return {"fps": round(self.fps(), 1), "ms": round(self.cost * 1000, 2), "count": self.count}
+
+
+class Stage:
+    """
+    Thread that takes items from source, runs fn on them and puts every
+    non-None result into sink. Items fn could not keep up with have
+    already been dropped by the source slot. With a profiler, the time
+    each item waited in the source slot is recorded as "<name> handoff".
+    """
+    def __init__(self, name, fn, source, sink=None, profiler=None):
+        self.name = name
+        self.fn = fn
+        self.source = source
+        self.sink = sink
+        self.profiler = profiler
+        self.stats = StageStats(name)
+        self.thread = None
+
+    def start(self, running):
+        """Run until the running event is cleared"""
+        self.stats = StageStats(self.name)
+        self.thread = threading.Thread(target=self._run, args=(running,), name=f"{self.name}-stage", daemon=True)
+        self.thread.start()
+
+    def join(self, timeout=None):
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def _run(self, running):
+        while running.is_set():
+            try:
+                item = self.source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if self.profiler and self.profiler.enabled:
+                self.profiler.add(f"{self.name} handoff", self.source.waited)
+            started = time.perf_counter()
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                print(f"❌ {self.name} stage error: {e}")
+                continue
+            self.stats.record(started)
+            if result is not None and self.sink is not None:
+                self.sink.put(result)
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        stats["queue"] = self.source.qsize()
+        stats["dropped"] = self.source.dropped
+        return stats
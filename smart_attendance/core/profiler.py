@@ -0,0 +1,120 @@
+"""
+Hot-path timing for the vision pipeline.
+
+Sections of the pipeline (capture, equalize, detect, crop, predict, draw,
+the hand-offs between stages and the GUI render) report their durations
+to the global `profiler`, which keeps the last `window` samples of each
+in a rolling window and reports p50/p95/p99 from it. With the profiler
+disabled start() returns None and stop() returns at once, so the calls
+stay in place on production devices.
+
+Enable it with `profile_pipeline` in config/settings.py (True, or
+"overlay" to also draw the table on the camera frame), or at run time:
+SIGUSR2 toggles it and SIGUSR1 prints the table.
+"""
+
+import signal
+import time
+from collections import deque
+
+from config.settings import profile_pipeline
+
+
+class Profiler:
+    def __init__(self, window=512, enabled=False, overlay=False, overlay_refresh=0.5):
+        self.window = window
+        self.enabled = enabled
+        self.overlay_enabled = overlay
+        self.overlay_refresh = overlay_refresh  # seconds between overlay table updates
+        self.samples = {}
+        self.overlay_lines = []
+        self.overlay_at = 0.0
+
+    def enable(self, overlay=False):
+        self.enabled = True
+        self.overlay_enabled = overlay
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.samples = {}
+        self.overlay_lines = []
+
+    def start(self):
+        """Timestamp to hand to stop(), or None while disabled"""
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, name, started):
+        if started is not None:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        """Record a duration measured elsewhere"""
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples.setdefault(name, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    def snapshot(self):
+        """{section: {count, p50, p95, p99, max}} in ms over each rolling window"""
+        import numpy as np
+
+        stats = {}
+        for name, samples in list(self.samples.items()):
+            values = np.fromiter(list(samples), float)
+            if not len(values):
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+            stats[name] = {"count": len(values), "p50": round(p50, 2), "p95": round(p95, 2),
+                           "p99": round(p99, 2), "max": round(values.max() * 1000, 2)}
+        return stats
+
+    def report(self):
+        lines = [f"{'section':<18}{'n':>5}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  ms"]
+        for name, stats in self.snapshot().items():
+            lines.append(f"{name:<18}{stats['count']:>5}{stats['p50']:>8.2f}{stats['p95']:>8.2f}"
+                         f"{stats['p99']:>8.2f}{stats['max']:>8.2f}")
+        return "\n".join(lines)
+
+    def dump(self):
+        print(f"⏱️ Pipeline profile ({'on' if self.enabled else 'off'}):\n{self.report()}")
+
+    def overlay(self, image):
+        """Draw the p50/p95/p99 table in the frame's top-left corner (if the overlay is on)"""
+        if not (self.enabled and self.overlay_enabled):
+            return image
+        import cv2
+
+        now = time.monotonic()
+        if now - self.overlay_at > self.overlay_refresh:
+            self.overlay_lines = [f"{name[:12]:<12} {s['p50']:6.1f} {s['p95']:6.1f} {s['p99']:6.1f}"
+                                  for name, s in self.snapshot().items()]
+            self.overlay_at = now
+        y = 20
+        for line in ["section       p50    p95    p99"] + self.overlay_lines:
+            cv2.putText(image, line, (10, y), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 0, 0), 3)
+            cv2.putText(image, line, (10, y), cv2.FONT_HERSHEY_PLAIN, 1.0, (255, 255, 255), 1)
+            y += 16
+        return image
+
+    def install_signals(self, dump=signal.SIGUSR1, toggle=signal.SIGUSR2):
+        """Dump on `dump` and switch profiling on/off on `toggle` (main thread only)"""
+        def on_dump(signum, frame):
+            self.dump()
+
+        def on_toggle(signum, frame):
+            if self.enabled:
+                self.disable()
+            else:
+                self.enable(overlay=self.overlay_enabled)
+            print(f"⏱️ Pipeline profiling {'on' if self.enabled else 'off'}")
+
+        try:
+            signal.signal(dump, on_dump)
+            signal.signal(toggle, on_toggle)
+        except ValueError:
+            print("⚠️ Profiler signals can only be installed from the main thread")
+
+
+profiler = Profiler(enabled=bool(profile_pipeline), overlay=profile_pipeline == "overlay")
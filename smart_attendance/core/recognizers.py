@@ -0,0 +1,43 @@
+"""
+Recognizer backends. Each backend is a model loader: loader(path) reads
+the model file at `path` into an object with
+
+    predict(face) -> (label, distance)      lower distance = closer match
+    predict_batch(faces)                    optional, for one call per batch
+
+where label is -1 when nothing is close enough. `face` is the 200x200
+equalized grayscale crop of core.detection.face_crop, unless the object
+has its own crop(image, box, scale, equalize) with face_crop's arguments
+(the embedding backend takes colour faces).
+Loaders are picklable so the worker pool (core.workers) can run them in
+its processes, and ModelManager reloads through them when the file
+changes.
+
+    lbph       OpenCV's LBPHFaceRecognizer (matcher="opencv") or
+               core.lbph_matcher (matcher="numpy"); model: train_model.py's
+               XML or a core.lbph_model .npz
+    embedding  a face-embedding network through cv2.dnn (core.embeddings),
+               on faces aligned by `aligner` (a YuNet model) if given;
+               model: the .npz of student vectors written by
+               python -m core.embeddings
+"""
+
+from functools import partial
+
+BACKENDS = ("lbph", "embedding")
+
+
+def model_loader(backend="lbph", matcher="opencv", prototypes=0, network=None, network_config="", aligner=None):
+    """The loader of one backend with its options"""
+    if backend == "lbph":
+        if matcher == "numpy":
+            from core.lbph_matcher import load_matcher
+            return partial(load_matcher, prototypes=prototypes)
+        from core.lbph_model import load_recognizer
+        return load_recognizer
+    if backend == "embedding":
+        if not network:
+            raise ValueError("the embedding backend needs a network file (embedding_network in config.settings)")
+        from core.embeddings import load_embedding_recognizer
+        return partial(load_embedding_recognizer, network=network, config=network_config, aligner=aligner or None)
+    raise ValueError(f"unknown recognizer backend {backend!r}, expected one of {BACKENDS}")
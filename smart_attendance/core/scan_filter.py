@@ -0,0 +1,60 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ScanSuppressor:
+    """
+    Per-student cooldown index shared by the RFID and face paths.
+
+    A scan is forwarded the first time a key (method, student) is seen and
+    then suppressed until its cooldown runs out. Entries are kept in an
+    OrderedDict in forwarding order; with one cooldown for every key that
+    is also expiry order, so expired entries are always at the front and
+    are dropped in O(1) each. max_entries bounds memory (least recently
+    forwarded first).
+    """
+    def __init__(self, cooldown=10.0, max_entries=4096):
+        self.cooldown = cooldown
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.expiries = OrderedDict()  # key -> monotonic expiry time
+        self.forwarded = 0
+        self.suppressed = 0
+
+    def _expire(self, now):
+        expiries = self.expiries
+        while expiries:
+            key, expiry = next(iter(expiries.items()))
+            if expiry > now:
+                break
+            expiries.popitem(last=False)
+
+    def should_forward(self, key, now=None):
+        """True if the scan should be published; starts the key's cooldown"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self._expire(now)
+            if key in self.expiries:
+                self.suppressed += 1
+                return False
+            self.expiries[key] = now + self.cooldown
+            if len(self.expiries) > self.max_entries:
+                self.expiries.popitem(last=False)
+            self.forwarded += 1
+            return True
+
+    def forget(self, key):
+        """Allow the next scan for key through (e.g. after a failed send)"""
+        with self.lock:
+            self.expiries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            self._expire(time.monotonic())
+            return {"forwarded": self.forwarded, "suppressed": self.suppressed,
+                    "tracked": len(self.expiries)}
+
+
+# Global instance
+scan_filter = ScanSuppressor()
@@ -0,0 +1,189 @@
+"""
+Detect-then-track: run the Haar cascade once, then follow each face box
+with a cheap tracker and only detect again every redetect_interval
+frames or when a tracker loses confidence.
+
+Trackers:
+    template  normalized cross-correlation of the detected face in a small
+              search window around the last box (plain OpenCV, always there)
+    kcf       cv2.TrackerKCF (opencv-contrib)
+    mosse     cv2.legacy.TrackerMOSSE (opencv-contrib)
+"""
+
+import cv2
+
+
+class TemplateTracker:
+    """Follows the face patch captured at detection time within a search window"""
+    def __init__(self, search_margin=0.5):
+        self.search_margin = search_margin
+        self.template = None
+        self.box = None
+
+    def init(self, gray, box):
+        x, y, w, h = box
+        self.template = gray[y:y+h, x:x+w].copy()
+        self.box = box
+
+    def update(self, gray):
+        """(ok, box, confidence); confidence is the correlation peak in [-1, 1]"""
+        x, y, w, h = self.box
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        if x1 - x0 < w or y1 - y0 < h:
+            return False, self.box, 0.0
+        scores = cv2.matchTemplate(gray[y0:y1, x0:x1], self.template, cv2.TM_CCOEFF_NORMED)
+        _, confidence, _, (dx, dy) = cv2.minMaxLoc(scores)
+        self.box = (x0 + dx, y0 + dy, w, h)
+        return True, self.box, confidence
+
+
+class OpenCVTracker:
+    """Adapter for the OpenCV tracker objects, which report success but no score"""
+    def __init__(self, factory, color=False):
+        self.factory = factory
+        self.color = color  # KCF's features need three channels
+        self.tracker = None
+
+    def _image(self, gray):
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) if self.color else gray
+
+    def init(self, gray, box):
+        self.tracker = self.factory()
+        self.tracker.init(self._image(gray), tuple(int(v) for v in box))
+
+    def update(self, gray):
+        ok, box = self.tracker.update(self._image(gray))
+        box = tuple(int(round(v)) for v in box)
+        return ok, box, 1.0 if ok else 0.0
+
+
+def _opencv_factory(kind):
+    if kind == "kcf":
+        return getattr(cv2, "TrackerKCF_create", None)
+    if kind == "mosse":
+        legacy = getattr(cv2, "legacy", None)
+        return getattr(legacy, "TrackerMOSSE_create", None) if legacy else None
+    return None
+
+
+def create_tracker(kind):
+    """Tracker by name; raises ValueError if this OpenCV build lacks it"""
+    if kind == "template":
+        return TemplateTracker()
+    factory = _opencv_factory(kind)
+    if factory is None:
+        raise ValueError(f"Unknown or unavailable tracker: {kind}")
+    return OpenCVTracker(factory, color=kind == "kcf")
+
+
+def available_trackers():
+    return ["template"] + [kind for kind in ("kcf", "mosse") if _opencv_factory(kind)]
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / (aw * ah + bw * bh - inter)
+
+
+class Track:
+    """One face followed across frames, with its own prediction timer and overlay text"""
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.tracker = None
+        self.misses = 0  # detections in a row that did not find this face
+        self.next_prediction = 0.0  # time.time() when this face is due for recognition
+        self.label = None  # e.g. "ID: 7 (54)" or "Unknown"
+        self.identified = False
+        self.text = ""  # roster name or backend reply for this face
+        self.votes = None  # recent predictions, see core.voting
+
+
+class FaceTracks:
+    """
+    Detect-then-track for every face in view. update() returns the tracks
+    visible in a frame. Detections are matched to existing tracks by box
+    overlap so a face keeps its track ID; a track survives max_misses
+    detections without a match before it is dropped. Between detections
+    each track's box comes from its own tracker (tracker=None detects on
+    every frame).
+    """
+    def __init__(self, detect, tracker="template", redetect_interval=10, min_confidence=0.6,
+                 max_misses=2, match_iou=0.3):
+        self.detect = detect
+        self.kind = tracker
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+        self.max_misses = max_misses
+        self.match_iou = match_iou
+        self.tracks = []
+        self.next_id = 1
+        self.since_detect = 0
+        self.counters = {"frames": 0, "detections": 0, "tracked": 0, "lost": 0, "tracks": 0}
+
+    def reset(self):
+        self.tracks = []
+
+    def visible(self):
+        return [track for track in self.tracks if track.misses == 0]
+
+    def update(self, gray):
+        self.counters["frames"] += 1
+        visible = self.visible()
+        if self.kind and visible and self.since_detect < self.redetect_interval:
+            for track in visible:
+                ok, box, confidence = track.tracker.update(gray)
+                if not ok or confidence < self.min_confidence:
+                    self.counters["lost"] += 1
+                    break
+                track.box = box
+            else:
+                self.since_detect += 1
+                self.counters["tracked"] += 1
+                return visible
+        return self._detect(gray)
+
+    def _detect(self, gray):
+        self.counters["detections"] += 1
+        self.since_detect = 0
+        faces = self.detect(gray)
+
+        # Greedy matching, best overlap first
+        pairs = sorted(((iou(track.box, face), t, f) for t, track in enumerate(self.tracks)
+                        for f, face in enumerate(faces)), reverse=True)
+        matched_tracks, matched_faces = set(), set()
+        for overlap, t, f in pairs:
+            if overlap < self.match_iou:
+                break
+            if t in matched_tracks or f in matched_faces:
+                continue
+            matched_tracks.add(t)
+            matched_faces.add(f)
+            self.tracks[t].box = faces[f]
+            self.tracks[t].misses = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        for f, face in enumerate(faces):
+            if f not in matched_faces:
+                self.tracks.append(Track(self.next_id, face))
+                self.next_id += 1
+                self.counters["tracks"] += 1
+
+        visible = self.visible()
+        if self.kind:
+            for track in visible:
+                track.tracker = create_tracker(self.kind)
+                track.tracker.init(gray, track.box)
+        return visible
@@ -0,0 +1,85 @@
+"""
+Per-track evidence accumulation: a face is only reported as a student once
+its recent predictions agree, so one noisy frame cannot publish the wrong
+student.
+
+Each prediction is a vote for its label weighted by how far its LBPH
+distance is under the acceptance threshold (a prediction over the
+threshold is a vote for "unknown"). A track decides early once a label
+holds `decisive` of the weight with at least min_votes votes, or when the
+window is full and one label has a strict majority.
+"""
+
+import time
+from collections import deque
+
+
+class TrackVote:
+    """Sliding window of the last `window` predictions for one track"""
+    def __init__(self, window=5, min_votes=2, decisive=0.8, threshold=70, unknown_weight=15):
+        self.window = window
+        self.min_votes = min_votes
+        self.decisive = decisive
+        self.threshold = threshold
+        self.unknown_weight = unknown_weight
+        self.votes = deque(maxlen=window)
+        self.frames = 0  # predictions since the last decision
+        self.started = None
+
+    def add(self, label, distance, now=None):
+        """Add a prediction; returns the decided label or None while undecided"""
+        now = time.perf_counter() if now is None else now
+        if self.frames == 0:
+            self.started = now
+        self.frames += 1
+        if distance < self.threshold:
+            self.votes.append((label, self.threshold - distance))
+        else:
+            self.votes.append((None, self.unknown_weight))
+
+        scores, counts = {}, {}
+        for voted, weight in self.votes:
+            scores[voted] = scores.get(voted, 0.0) + weight
+            counts[voted] = counts.get(voted, 0) + 1
+        total = sum(scores.values())
+        top = max(scores, key=scores.get)
+        if top is None:
+            return None
+        if counts[top] >= self.min_votes and scores[top] >= self.decisive * total:
+            return top
+        if len(self.votes) == self.window and counts[top] * 2 > self.window:
+            return top
+        return None
+
+    def latency(self, now=None):
+        """(predictions, seconds) since the first vote of the current decision"""
+        now = time.perf_counter() if now is None else now
+        return self.frames, (now - self.started) if self.started is not None else 0.0
+
+    def reset(self):
+        self.votes.clear()
+        self.frames = 0
+        self.started = None
+
+
+class DecisionLatency:
+    """How many predictions and how long tracks needed to settle on a student"""
+    def __init__(self):
+        self.count = 0
+        self.frames = 0
+        self.seconds = 0.0
+        self.max_frames = 0
+        self.max_seconds = 0.0
+
+    def record(self, frames, seconds):
+        self.count += 1
+        self.frames += frames
+        self.seconds += seconds
+        self.max_frames = max(self.max_frames, frames)
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        count = self.count or 1
+        return {"decisions": self.count, "avg_frames": round(self.frames / count, 2),
+                "max_frames": self.max_frames, "avg_ms": round(self.seconds / count * 1000, 1),
+                "max_ms": round(self.max_seconds * 1000, 1)}
@@ -0,0 +1,335 @@
+"""
+Detection and recognition in a pool of worker processes, so the vision
+work is spread over every core instead of sharing one Python thread (and
+the GIL) with Tk, MQTT and the RFID poller.
+
+Each worker loads the cascade and the LBPH model once. Frames reach the
+workers through a ring of shared-memory slots (the main image and the
+grayscale detection frame are copied in, never pickled); only the slot
+number and shapes go through the task queue, and only boxes and
+predictions come back. Results are put into `output` in the order the
+frames were submitted. When every slot is busy, submit() drops the frame,
+like the LatestSlot hand-offs of the in-process pipeline.
+
+When the model file changes, each worker reads it again on a background
+thread and keeps predicting with the model it has until the new one is
+ready, as ModelManager does in the main process, so a hot swap never
+stalls the pool. A worker that cannot load the model at startup reports
+it and exits; one whose reload fails keeps the old model. A worker that
+dies is started again, and the frame it was working on is skipped so
+its slot is freed and later results are not held back.
+
+Workers are started with the "spawn" method: forking a process that
+already runs camera, MQTT and Tk threads is not safe.
+"""
+
+import atexit
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.pipeline import LatestSlot, StageStats
+
+PoolResult = namedtuple("PoolResult", "frame boxes predictions")
+
+
+def detect_and_predict(detector, recognizer, image, gray, detection_scale, face_min_size):
+    """Boxes (gray coordinates) and (label, distance) for every face in one frame"""
+    import cv2
+
+    from core.camera import equalize_lut
+    from core.detection import face_crop
+
+    scale = image.shape[1] / gray.shape[1]
+    detector.scale = max(1.0, detection_scale / scale)
+    detector.min_size = (round(face_min_size[0] / scale), round(face_min_size[1] / scale))
+    equalize = equalize_lut(gray)
+    boxes = detector.detect(cv2.LUT(gray, equalize))
+    crop = getattr(recognizer, "crop", face_crop)  # the backend's input (see core.recognizers)
+    predictions = [tuple(recognizer.predict(crop(image, box, scale, equalize))) for box in boxes]
+    return boxes, predictions
+
+
+class _WorkerModel:
+    """A worker's recognizer; reloads run on a background thread and swap in when done"""
+    def __init__(self, index, loader, model_path, generation):
+        self.index = index
+        self.loader = loader
+        self.model_path = model_path
+        self.generation = generation
+        self.loaded = generation.value
+        self.recognizer = loader(model_path.value.decode())
+        self.loading = None
+
+    def current(self):
+        """The recognizer to use now; starts a reload if the main process asked for one"""
+        if self.loading is None and self.generation.value != self.loaded:
+            self.loaded = self.generation.value
+            self.loading = threading.Thread(target=self._reload, name="model-reload", daemon=True)
+            self.loading.start()
+        return self.recognizer
+
+    def _reload(self):
+        try:
+            self.recognizer = self.loader(self.model_path.value.decode())
+        except Exception as e:
+            print(f"⚠️ Recognition worker {self.index} could not reload the model, keeping the old one: {e}")
+        finally:
+            self.loading = None
+
+
+def _worker_main(index, model_path, generation, busy, slot_names, tasks, results, detection_scale, face_min_size,
+                 loader):
+    import cv2
+
+    from core.detection import FaceDetector
+    from core.lbph_model import load_recognizer
+
+    cv2.setNumThreads(1)  # the pool is the parallelism; OpenCV threads would only oversubscribe
+    loader = loader or load_recognizer
+    detector = FaceDetector()
+    try:
+        model = _WorkerModel(index, loader, model_path, generation)
+    except Exception as e:
+        results.put(("failed", index, f"{type(e).__name__}: {str(e).strip()}"))
+        return
+    memory = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    results.put(("ready", index))
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, image_shape, gray_shape = task
+            busy[index] = seq  # so the pool can skip this frame if the worker dies on it
+            recognizer = model.current()
+            started = time.perf_counter()
+            image = np.ndarray(image_shape, np.uint8, buffer=memory[slot].buf)
+            gray = np.ndarray(gray_shape, np.uint8, buffer=memory[slot].buf, offset=image.nbytes)
+            try:
+                boxes, predictions = detect_and_predict(detector, recognizer, image, gray,
+                                                        detection_scale, face_min_size)
+            except Exception as e:
+                print(f"❌ Recognition worker error: {e}")
+                boxes, predictions = [], []
+            results.put((seq, slot, boxes, predictions, time.perf_counter() - started))
+            busy[index] = -1
+    finally:
+        for shm in memory:
+            shm.close()
+
+
+class RecognitionPool:
+    """
+    `workers` processes fed from `slots` shared-memory frame slots (two
+    per worker by default, so each can have one frame queued). Created
+    lazily by the first submit(), which sizes the slots to that frame.
+    `loader` reads the model in each worker (load_recognizer if None); it
+    must be picklable, e.g. a module-level function or a partial of one.
+    `failed` maps the index of each worker that could not load the model
+    to its error; those workers are not restarted.
+    """
+    def __init__(self, workers, model_path, detection_scale=2, face_min_size=(100, 100), slots=None,
+                 loader=None):
+        self.workers = workers
+        self.slot_count = slots or 2 * workers
+        self.detection_scale = detection_scale
+        self.face_min_size = face_min_size
+        self.loader = loader
+        self.context = mp.get_context("spawn")
+        self.model_path = self.context.Array("c", 1024)
+        self.model_path.value = model_path.encode()
+        self.generation = self.context.Value("i", 0)
+        self.busy = self.context.Array("i", [-1] * workers, lock=False)  # seq each worker is on, -1 idle
+        self.output = LatestSlot(maxsize=2)  # PoolResults in frame order
+        self.stats = StageStats("workers")  # submit to result: time to result
+        self.work_stats = StageStats("worker")  # detect + predict inside a worker
+        self.processes = []
+        self.memory = []
+        self.free = queue.Queue()
+        self.pending = {}  # seq -> (frame, slot, submitted at)
+        self.done = {}  # finished out of order, waiting for earlier frames; None = skipped
+        self.next_seq = 0
+        self.next_out = 0
+        self.dropped = 0
+        self.lost = 0  # frames skipped because their worker died
+        self.restarts = 0
+        self.closing = False
+        self.lock = threading.Lock()
+        self.collector = None
+        self.tasks = None
+        self.results = None
+        self.frame_bytes = 0
+        self.ready = set()  # indexes of the workers that have loaded their models
+        self.failed = {}  # worker index -> why it could not load the model
+        self.check_interval = 0.5  # seconds between checks for dead workers
+
+    @property
+    def started(self):
+        return bool(self.processes)
+
+    def start(self, frame):
+        """Allocate slots sized for frames like `frame` and start the workers"""
+        self.frame_bytes = frame.image.nbytes + frame.gray.nbytes
+        self.memory = [shared_memory.SharedMemory(create=True, size=self.frame_bytes)
+                       for _ in range(self.slot_count)]
+        for slot in range(self.slot_count):
+            self.free.put(slot)
+        self.tasks = self.context.Queue()
+        self.results = self.context.Queue()
+        self.closing = False
+        self.processes = [self._spawn(index) for index in range(self.workers)]
+        self.collector = threading.Thread(target=self._collect, name="pool-collect", daemon=True)
+        self.collector.start()
+        atexit.register(self.close)
+
+    def _spawn(self, index):
+        self.busy[index] = -1
+        process = self.context.Process(
+            target=_worker_main, daemon=True,
+            args=(index, self.model_path, self.generation, self.busy, [shm.name for shm in self.memory],
+                  self.tasks, self.results, self.detection_scale, self.face_min_size, self.loader))
+        process.start()
+        return process
+
+    def submit(self, frame):
+        """Hand a Frame to the workers; False (frame dropped) if every slot is busy"""
+        if not self.started:
+            self.start(frame)
+        if frame.image.nbytes + frame.gray.nbytes > self.frame_bytes:
+            raise ValueError("frame larger than the pool's shared-memory slots")
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        buffer = self.memory[slot].buf
+        image = np.ndarray(frame.image.shape, np.uint8, buffer=buffer)
+        gray = np.ndarray(frame.gray.shape, np.uint8, buffer=buffer, offset=image.nbytes)
+        image[...] = frame.image
+        gray[...] = frame.gray
+        with self.lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending[seq] = (frame, slot, time.perf_counter())
+        self.tasks.put((seq, slot, frame.image.shape, frame.gray.shape))
+        return True
+
+    def _collect(self):
+        """Release slots as results arrive and emit them in submission order"""
+        checked = time.monotonic()
+        while True:
+            if time.monotonic() - checked > self.check_interval:
+                self._check_workers()
+                checked = time.monotonic()
+            try:
+                item = self.results.get(timeout=self.check_interval)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            if item[0] == "ready":
+                self.ready.add(item[1])
+                continue
+            if item[0] == "failed":
+                self.failed[item[1]] = item[2]
+                print(f"❌ Recognition worker {item[1]} could not load the model: {item[2]}")
+                continue
+            seq, slot, boxes, predictions, seconds = item
+            with self.lock:
+                if seq < self.next_out or seq in self.done:
+                    continue  # already skipped when its worker died; the slot was freed then
+                self.free.put(slot)
+                self.done[seq] = (boxes, predictions)
+                self._emit()
+            finished = time.perf_counter()
+            self.work_stats.record(finished - seconds, finished)
+
+    def _emit(self):
+        """Put finished results into output in frame order (called with the lock held)"""
+        while self.next_out in self.done:
+            result = self.done.pop(self.next_out)
+            frame, _, submitted = self.pending.pop(self.next_out)
+            self.next_out += 1
+            if result is None:
+                continue
+            self.stats.record(submitted)
+            self.output.put(PoolResult(frame, *result))
+
+    def _check_workers(self):
+        """Skip the frame of every worker that died on it and start a new worker in its place"""
+        for index, process in enumerate(self.processes):
+            if self.closing or process.is_alive() or index in self.failed:
+                continue
+            seq = self.busy[index]
+            print(f"❌ Recognition worker {index} died (exit code {process.exitcode}), restarting it")
+            with self.lock:
+                if seq >= self.next_out and seq in self.pending and seq not in self.done:
+                    self.free.put(self.pending[seq][1])
+                    self.done[seq] = None
+                    self.lost += 1
+                    self._emit()
+            self.ready.discard(index)
+            self.restarts += 1
+            self.processes[index] = self._spawn(index)
+
+    def wait_ready(self, timeout=None):
+        """True once every worker has loaded the cascade and model; False if one could not"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while len(self.ready) < self.workers:
+            if self.failed:
+                return False
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def reload_model(self, model_path=None):
+        """Have every worker read the model again before its next frame"""
+        if model_path:
+            self.model_path.value = model_path.encode()
+        with self.generation.get_lock():
+            self.generation.value += 1
+
+    def bottleneck(self):
+        """Seconds per frame the pool sustains with every worker busy"""
+        return self.work_stats.cost / self.workers
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        stats.update(workers=self.workers, busy=self.slot_count - self.free.qsize(), dropped=self.dropped,
+                     worker_ms=round(self.work_stats.cost * 1000, 2), failed=len(self.failed),
+                     restarts=self.restarts, lost=self.lost)
+        return stats
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if not self.started:
+            return
+        self.closing = True  # workers exiting now are not restarted
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.results.put(None)
+        self.collector.join(timeout=1)
+        for shm in self.memory:
+            shm.close()
+            shm.unlink()
+        self.processes, self.memory = [], []
+        self.free = queue.Queue()
+        self.next_out = self.next_seq  # results still in flight are gone
+        self.ready = set()
+        self.failed = {}
+        self.pending.clear()
+        self.done.clear()
+        self.output.clear()
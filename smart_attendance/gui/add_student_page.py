@@ -3,7 +3,6 @@ from gui.styles import *
 import os
 import threading
 import cv2
-from picamera2 import Picamera2
 import shutil
 from time import sleep
 import subprocess
@@ -12,6 +11,7 @@ import psutil
 from PIL import Image, ImageTk, ImageEnhance
 import numpy as np
 from config.settings import MOUNTED_DATASET_PATH
+from core.camera import PicameraSource
 
 class CameraManager:
     """
@@ -90,15 +90,11 @@ class CameraManager:
     def test_camera_availability():
         """Test if the camera is available and working"""
         try:
-            # Try to initialize the camera
-            picam = Picamera2()
-            # Configure with minimal settings
-            config = picam.create_preview_configuration()
-            picam.configure(config)
-            # Start and immediately stop
-            picam.start()
+            # Start and immediately stop the camera
+            source = PicameraSource()
+            source.start()
             sleep(0.1)
-            picam.close()
+            source.stop()
             return True, "Camera is available"
         except Exception as e:
             return False, f"Camera test failed: {str(e)}"
@@ -112,8 +108,8 @@ class PhotoCaptureSession:
     processing, and uploading to the destination folder.
     """
     def __init__(self, student_id, status_label, preview_label, 
-                 foreground_frame, camera_container):
-        """Initialize a new photo capture session."""
+                 foreground_frame, camera_container, source=None):
+        """Initialize a new photo capture session (on the Pi camera unless a core.camera source is given)."""
         self.student_id = student_id
         self.status_label = status_label
         self.preview_label = preview_label
@@ -133,7 +129,8 @@ class PhotoCaptureSession:
         self.auto_capture_enabled = False
         
         # Components
-        self.picam2 = None
+        self.source = source
+        self.pi_camera = source is None  # camera resets and availability tests only apply to the Pi camera
         self.capture_btn = None
         self.cancel_btn = None
         self.student_dir = None
@@ -154,9 +151,10 @@ class PhotoCaptureSession:
             self._setup_directory()
             
             # Reset camera resources first
-            success, reset_results = CameraManager.reset_camera()
-            if not success:
-                self._update_status(f"⚠️ Camera reset issue: {reset_results[0]}")
+            if self.pi_camera:
+                success, reset_results = CameraManager.reset_camera()
+                if not success:
+                    self._update_status(f"⚠️ Camera reset issue: {reset_results[0]}")
             
             # Initialize camera with retry mechanism
             if not self._initialize_camera_with_retry():
@@ -216,7 +214,7 @@ class PhotoCaptureSession:
             self._update_status(f"📷 Initializing camera (attempt {attempt}/{max_attempts})...")
             
             # Test camera availability first
-            available, message = CameraManager.test_camera_availability()
+            available, message = CameraManager.test_camera_availability() if self.pi_camera else (True, "")
             if not available:
                 self._update_status(f"⚠️ Camera test failed (attempt {attempt}): {message}")
                 
@@ -232,7 +230,8 @@ class PhotoCaptureSession:
             
             # If initialization failed, reset and try again
             self._update_status(f"⚠️ Retrying camera initialization ({attempt}/{max_attempts})...")
-            CameraManager.reset_camera()
+            if self.pi_camera:
+                CameraManager.reset_camera()
             sleep(delay_between_attempts)
         
         self._update_status("❌ Failed to initialize camera after multiple attempts")
@@ -241,45 +240,29 @@ class PhotoCaptureSession:
     def _initialize_camera(self):
         """Initialize the camera for capturing photos."""
         try:
-            # Create a new Picamera2 instance
-            self.picam2 = Picamera2()
-            
-            # Create and apply a configuration with more deliberate settings and error handling
-            try:
-                preview_config = self.picam2.create_preview_configuration(
-                    main={"format": 'XRGB8888', "size": self.camera_size},
-                    buffer_count=4  # Increase buffer for smoother preview
-                )
-                self.picam2.configure(preview_config)
-            except Exception as config_error:
-                print(f"Configuration error: {config_error}")
-                # Try with default configuration as fallback
-                self.picam2.configure(self.picam2.create_preview_configuration())
+            if self.pi_camera:
+                # A new Pi camera source, with extra buffers for a smoother preview
+                self.source = PicameraSource(self.camera_size, buffer_count=4)
             
             # Start the camera with explicit error handling
             try:
-                self.picam2.start()
+                self.source.start()
             except Exception as start_error:
                 print(f"Camera start error: {start_error}")
-                # Clean up and re-raise to trigger retry
-                if self.picam2:
-                    self.picam2.close()
-                    self.picam2 = None
                 raise start_error
             
             # Allow camera to warm up and verify it's working
-            sleep(1.5)
+            if self.pi_camera:
+                sleep(1.5)
             
             # Try to capture a test frame to ensure camera is working
             try:
-                test_frame = self.picam2.capture_array()
-                if test_frame is None or test_frame.size == 0:
+                test_frame = self.source.read()
+                if test_frame is None or test_frame.image.size == 0:
                     raise ValueError("Camera returned empty frame")
             except Exception as capture_error:
                 print(f"Test capture error: {capture_error}")
-                if self.picam2:
-                    self.picam2.close()
-                    self.picam2 = None
+                self._close_camera()
                 raise capture_error
                 
             return True
@@ -309,7 +292,9 @@ class PhotoCaptureSession:
                 def capture_with_timeout():
                     nonlocal frame
                     try:
-                        frame = self.picam2.capture_array()
+                        captured = self.source.read()
+                        if captured is not None:
+                            frame = captured.image
                     except Exception as e:
                         print(f"Frame capture error: {e}")
                 
@@ -579,10 +564,9 @@ class PhotoCaptureSession:
     
     def _close_camera(self):
         """Close the camera safely."""
-        if self.picam2:
+        if self.source:
             try:
-                self.picam2.close()
-                self.picam2 = None
+                self.source.stop()
             except Exception as e:
                 print(f"Error closing camera: {e}")
     
@@ -632,7 +616,7 @@ class PhotoCaptureSession:
         self._update_status(f"❌ {message[:50]}")
 
 
-def capture_photos(student_id, status_label, preview_label, foreground_frame, camera_container):
+def capture_photos(student_id, status_label, preview_label, foreground_frame, camera_container, source=None):
     """
     Captures a series of photos for student identification and stores them.
     
@@ -642,13 +626,14 @@ def capture_photos(student_id, status_label, preview_label, foreground_frame, ca
         preview_label (CTkLabel): Label for displaying camera preview
         foreground_frame (CTkFrame): The form frame to hide during capture
         camera_container (CTkFrame): The container for camera preview
+        source (FrameSource): Camera to use instead of the Pi camera (see core.camera)
     """
     # Pre-emptively reset camera resources before creating session
     status_label.configure(text="🔄 Checking camera resources...")
     
     # Run camera reset in a separate thread to avoid UI freezing
     def prepare_camera():
-        success, messages = CameraManager.reset_camera()
+        success, messages = CameraManager.reset_camera() if source is None else (True, [])
         status_label.after(0, lambda: status_label.configure(
             text="📷 Starting camera session..." if success else f"⚠️ {messages[0][:50]}"
         ))
@@ -659,7 +644,8 @@ def capture_photos(student_id, status_label, preview_label, foreground_frame, ca
             status_label, 
             preview_label, 
             foreground_frame, 
-            camera_container
+            camera_container,
+            source
         )
         session.start()
     
@@ -1,11 +1,16 @@
 import customtkinter as ctk
 from gui.styles import *
 from backend.api_client import *
+from backend.rpc import get_rpc
+from backend.control import ALL_DEVICES, get_control_plane
+from backend.roster import get_roster
 import threading
 import queue
 from time import sleep
 from core.rfid_reader import read_card
 from core.face_recognition import *
+from core.scan_filter import scan_filter
+from core.profiler import profiler
 from PIL import Image, ImageTk
 # Use threading events instead of global flags
 
@@ -13,13 +18,12 @@ stop_threads = threading.Event()
 stop_rfid = threading.Event()
 rfid_queue = queue.Queue()  # Queue for safely updating the GUI
 camera_opened = threading.Event()
+control_handler = None  # the page's control-plane handler, replaced on each visit
 
 
 def update_session(root, session_label ,foreground_frame):
     """ Continuously listens for session updates """
-    for session_type in start_listening("+"):
-        if stop_threads.is_set():
-            break
+    for session_type in get_control_plane().listen(ALL_DEVICES, stop_threads):
         root.after(0, lambda: update_label(root, session_label, session_type , foreground_frame))
 
 
@@ -45,6 +49,9 @@ def update_label(root, session_label, session_type,foreground_frame):
         # Explicitly lower the foreground frame
         root.after(150, lambda: foreground_frame.lower())
 
+    elif session_type == "model-updated":
+        face_recognizer.reload_model()  # swapped in without stopping the camera
+
     elif session_type in ("end-check-out", "end-check-in"):
         face_recognizer.stop()  # Force-stop camera
         session_label.configure(text=f"🚪 Session: {session_type.replace('-', ' ').title()}", text_color=PRIMARY_COLOR)
@@ -53,13 +60,23 @@ def update_label(root, session_label, session_type,foreground_frame):
 
 
 
-def send_and_receive_attendance(root, method, card_id, session_label):
+def scan_key(method, card_id, student=None):
+    """scan_filter key of a tap: the student if the roster knows the card, else the card"""
+    return (method, student.student_id if student else card_id)
+
+
+def send_and_receive_attendance(root, method, card_id, session_label, student=None):
     try:
-        send_student_data(method, card_id)  # Send to backend
-        response = get_attendance_response(method, "4")  # Replace "4" with your device_id if needed
+        response = get_rpc().request(method, card_id)  # Correlated, so taps can overlap
+        if response is None:
+            scan_filter.forget(scan_key(method, card_id, student))  # timed out: the next tap retries
 
         def update_ui():
-            if response:
+            if student and (response is None or get_roster().agrees(student, response)):
+                # Keep the optimistic roster result; the journal delivers it if we're offline
+                suffix = "" if response else " (queued)"
+                session_label.configure(text=f"✅ {student.name}{suffix}", text_color=SECONDARY_COLOR)
+            elif response:
                 session_label.configure(text=f"✅ {response}", text_color=SECONDARY_COLOR)
             else:
                 session_label.configure(text="⚠️ No response", text_color="red")
@@ -69,6 +86,7 @@ def send_and_receive_attendance(root, method, card_id, session_label):
 
     except Exception as e:
         print("❌ Error in send_and_receive_attendance:", e)
+        scan_filter.forget(scan_key(method, card_id, student))  # the next tap retries
 
 
 
@@ -89,14 +107,22 @@ def process_rfid_queue(root, session_label):
     """ Processes RFID data from the queue and triggers attendance logic in a thread """
     while not rfid_queue.empty():
         card_id = rfid_queue.get()
+
+        # A card left on the reader is read every 0.5 s; publish it once per cooldown
+        student = get_roster().lookup_tag(card_id)
+        if not scan_filter.should_forward(scan_key("check-out", card_id, student)):
+            continue
         
-        # Optional: update UI immediately with UID
-        session_label.configure(text=f"📌 Card ID: {card_id}\n⏳ Sending to server...", text_color=SECONDARY_COLOR)
+        # Update UI immediately: the student's name from the local roster if known
+        if student:
+            session_label.configure(text=f"✅ {student.name}", text_color=SECONDARY_COLOR)
+        else:
+            session_label.configure(text=f"📌 Card ID: {card_id}\n⏳ Sending to server...", text_color=SECONDARY_COLOR)
         
         # Start background thread to send and receive
         threading.Thread(
             target=send_and_receive_attendance, 
-            args=(root, "check-out", card_id, session_label),
+            args=(root, "check-out", card_id, session_label, student),
             daemon=True
         ).start()
 
@@ -113,15 +139,19 @@ def process_face_recognition_queue(root, camera_label, foreground_frame):
     try:
         if not face_recognizer.queue.empty():
             frame = face_recognizer.queue.get()
+            if profiler.enabled:
+                profiler.add("gui handoff", face_recognizer.queue.waited)
             
             # Only show camera if we're in check-out mode (stop_rfid is set)
             if stop_rfid.is_set():  # Check-out mode
+                started = profiler.start()
                 # Resize frame to fit the camera_label
                 frame = cv2.resize(frame, (camera_label.winfo_width(), camera_label.winfo_height()))
                 img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
                 imgtk = ImageTk.PhotoImage(image=img)
                 camera_label.imgtk = imgtk
                 camera_label.configure(image=imgtk)
+                profiler.stop("gui render", started)
                 foreground_frame.lower()  # Show camera
             else:
                 camera_label.configure(image=None)
@@ -137,10 +167,21 @@ def process_face_recognition_queue(root, camera_label, foreground_frame):
 
 
 
+def release_control_handler():
+    """Drop the previous page's control-plane handler so visits don't pile up"""
+    global control_handler
+    if control_handler:
+        get_control_plane().unregister(ALL_DEVICES, control_handler)
+        control_handler = None
+
+
 def create_attendance_page(root, switch_page):
+    global control_handler
     stop_threads.clear()
     stop_rfid.set()
     face_recognizer.stop()
+    get_roster()  # warm-start the roster cache from disk before the first scan
+    get_rpc()  # journal flusher and reply listener, if startup has not started them yet
 
     ctk.set_appearance_mode("dark")
     root.configure(bg=BACKGROUND_COLOR)
@@ -200,6 +241,7 @@ def create_attendance_page(root, switch_page):
     back_button = ctk.CTkButton(foreground_frame, text="Back to Home", font=FONT_MEDIUM, fg_color="#444444", hover_color="#555555", corner_radius=BUTTON_CORNER_RADIUS, border_width=0, width=150, height=35, command=lambda: [
         stop_threads.set(),
         stop_rfid.set(),
+        release_control_handler(),
         face_recognizer.stop(),
         foreground_frame.lift(),
         camera_label.configure(image=None),
@@ -212,9 +254,12 @@ def create_attendance_page(root, switch_page):
     root.after(200, lambda: camera_container.lower())
     root.after(250, lambda: foreground_frame.lift())
 
-    # Start MQTT listener in background thread, queue actions to GUI
+    # Route control actions from the shared control plane to the GUI queue
     action_queue = queue.Queue()
-    threading.Thread(target=lambda: [action_queue.put(action) for action in start_listening("+")], daemon=True).start()
+    release_control_handler()
+    control_handler = get_control_plane().register(
+        ALL_DEVICES, lambda device_id, action, payload: action_queue.put(action)
+    )
 
     def listen_loop():
         if not stop_threads.is_set():
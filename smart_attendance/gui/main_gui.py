@@ -1,10 +1,28 @@
+import threading
 import customtkinter as ctk
 from gui.home_page import create_home_page
-from gui.attendance_page import create_attendance_page
-from gui.add_student_page import create_add_student_page
+from core.profiler import profiler
+
+
+def preload_vision():
+    """Import the camera/vision stack and load the model while the home page is up"""
+    try:
+        from core.face_recognition import face_recognizer
+        face_recognizer.preload()
+    except Exception as e:
+        print(f"⚠️ Vision preload failed, it will load when the camera starts: {e}")
+
+def start_delivery():
+    """Open the offline journal and start its flusher, so check-ins journaled before a restart are sent now"""
+    try:
+        from backend.rpc import get_rpc
+        get_rpc()
+    except Exception as e:
+        print(f"⚠️ Journal flusher did not start, it will start with the first scan: {e}")
 
 def main():
     
+    profiler.install_signals()  # kill -USR1 <pid> prints stage timings, -USR2 toggles them
     root = ctk.CTk()
     root.title("Smart Attendance System")
     root.geometry("600x400")
@@ -19,12 +37,18 @@ def main():
         if page == "home":
             create_home_page(root, switch_page)
         elif page == "attendance":
+            from gui.attendance_page import create_attendance_page  # pulls in OpenCV and the recognizer
             create_attendance_page(root, switch_page)
         elif page == "add_student":
+            from gui.add_student_page import create_add_student_page
             create_add_student_page(root, switch_page)
 
     # Start on home page
     switch_page("home")
+    # Once the home page is drawn, get the recognizer ready and deliver any
+    # journaled check-ins in the background
+    root.after(100, lambda: threading.Thread(target=preload_vision, daemon=True).start())
+    root.after(100, lambda: threading.Thread(target=start_delivery, daemon=True).start())
 
     root.mainloop()
 
@@ -1,14 +1,21 @@
+import argparse
 import os
+import sys
 import cv2
 import numpy as np
 import time
 from datetime import datetime
 import gc  # Garbage collector for memory management
 
+# The attendance app's settings, so the model is written where its model watcher reads it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "smart_attendance"))
+from config.settings import model_path, recognizer_backend
+from core.lbph_model import LBPHModel, load_recognizer
+
 # Constants
 # TRAIN_PATH = "working_dataset" 
 TRAIN_PATH="/home/pi5/face-dataset/graduation_project/working_dataset" # rclone mount point
-MODEL_PATH = "/home/pi5/smart_attendance/train_model/lbph_model.xml"
+MODEL_PATH = model_path  # OpenCV XML, or an .npz (core/lbph_model.py)
 LAST_TRAIN_FILE = "/home/pi5/smart_attendance/train_model/last_model_train_time.txt"
 
 # Load face cascade
@@ -129,8 +136,12 @@ def batch_process_data(last_train_time, batch_size=50):
     else:
         return np.array([]), np.array([], dtype=np.int32)
 
-def train_model():
+def train_model(model_path=MODEL_PATH):
     """Train the LBPH face recognition model with optimized data loading"""
+    if recognizer_backend != "lbph":
+        print(f"⚠️ The app uses the {recognizer_backend} backend; enroll with python -m core.embeddings instead.")
+        return
+
     last_train_time = get_last_train_time()
     faces, labels = batch_process_data(last_train_time)
     
@@ -150,20 +161,28 @@ def train_model():
     )
     
     # Update existing model if available
-    if os.path.exists(MODEL_PATH):
+    if os.path.exists(model_path):
         try:
-            model.read(MODEL_PATH)
+            existing = load_recognizer(model_path)
             print("♻️ Loading existing model for update...")
-            model.update(faces, labels)
+            existing.update(faces, labels)
+            model = existing
         except:
             print("⚠️ Couldn't update existing model. Training new one...")
             model.train(faces, labels)
     else:
         model.train(faces, labels)
     
-    # Save model and timestamp
-    model.save(MODEL_PATH)
-    print(f"✅ Model saved: {MODEL_PATH}")
+    # Save model and timestamp; write a temporary file and rename it so the
+    # attendance app's model watcher never reads a half-written model
+    if model_path.endswith(".npz"):
+        LBPHModel.from_recognizer(model).save(model_path)  # renames its own temporary file
+    else:
+        root, ext = os.path.splitext(model_path)
+        temp_path = root + ".tmp" + ext  # keep the extension: OpenCV picks the format from it
+        model.save(temp_path)
+        os.replace(temp_path, model_path)
+    print(f"✅ Model saved: {model_path}")
     save_train_time()
     
     # Clean up
@@ -171,4 +190,6 @@ def train_model():
     gc.collect()
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train or update the LBPH model with new dataset photos")
+    parser.add_argument("--model", default=MODEL_PATH, help="model file (default: model_path in config/settings.py)")
+    train_model(parser.parse_args().model)